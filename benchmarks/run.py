@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmarks for the orpy client, run against a local fake Orchestrator.
+
+Run them with::
+
+    python benchmarks/run.py --deployments 1000 --page-size 50 --latency 0.005
+
+Results can be stored with ``--output`` and used as a baseline for later
+runs with ``--baseline``, in which case the run fails if any benchmark is
+slower than the baseline by more than ``--tolerance``.
+"""
+
+import argparse
+from concurrent import futures
+import json
+import statistics
+import subprocess  # nosec
+import sys
+import time
+import tracemalloc
+
+from orpy.client import base
+from orpy.client import client
+from orpy.tests import fakes
+
+
+class Results(object):
+    """Collect benchmark results."""
+
+    def __init__(self):
+        """Initialize the results."""
+        self.results = {}
+
+    def add(self, name, value, unit, higher_is_better=True):
+        """Record the result of a benchmark."""
+        self.results[name] = {
+            "value": value,
+            "unit": unit,
+            "higher_is_better": higher_is_better,
+        }
+
+    def compare(self, baseline, tolerance):
+        """Compare the results with a baseline.
+
+        :returns: List of ``(name, value, baseline value)`` for the
+                  benchmarks that regressed more than the tolerance.
+        """
+        regressions = []
+        for name, result in sorted(self.results.items()):
+            old = baseline.get(name)
+            if not old or not old["value"]:
+                continue
+            ratio = result["value"] / float(old["value"])
+            if not result["higher_is_better"]:
+                ratio = 1 / ratio if ratio else float("inf")
+            if ratio < 1 - tolerance:
+                regressions.append((name, result["value"], old["value"]))
+        return regressions
+
+    def print_table(self, stream=sys.stdout):
+        """Print the results as a table."""
+        width = max(len(name) for name in self.results)
+        for name, result in sorted(self.results.items()):
+            stream.write(
+                "%s  %12.3f %s\n" % (name.ljust(width), result["value"], result["unit"])
+            )
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    ret = func(*args, **kwargs)
+    return time.perf_counter() - start, ret
+
+
+def bench_list(cli, results, repeat):
+    """Measure the throughput of a full deployment listing."""
+    times = []
+    for _ in range(repeat):
+        elapsed, deployments = _timed(cli.deployments.list)
+        times.append(elapsed)
+    best = min(times)
+    results.add("list.items_per_second", len(deployments) / best, "items/s")
+    results.add("list.wall_time", best, "s", higher_is_better=False)
+    stats = cli.transfer_stats
+    results.add(
+        "list.bytes_received_per_item",
+        stats.received / float(repeat * len(deployments)),
+        "bytes",
+        higher_is_better=False,
+    )
+
+
+def bench_pagination(cli, results, page_sizes, repeat):
+    """Measure the wall time of a full listing for several page sizes."""
+    for size in page_sizes:
+        times = [
+            _timed(cli.deployments.list, params={"size": size})[0]
+            for _ in range(repeat)
+        ]
+        results.add(
+            "pagination.size_%d.wall_time" % size,
+            min(times),
+            "s",
+            higher_is_better=False,
+        )
+
+
+def bench_show(cli, results, uuids):
+    """Measure the throughput of showing deployments."""
+    elapsed, _ = _timed(lambda: [cli.deployments.show(uuid) for uuid in uuids])
+    results.add("show.per_second", len(uuids) / elapsed, "requests/s")
+
+
+def bench_concurrent_show(cli, results, uuids, threads):
+    """Measure the throughput of showing deployments from several threads."""
+    with futures.ThreadPoolExecutor(max_workers=threads) as ex:
+        elapsed, _ = _timed(lambda: list(ex.map(cli.deployments.show, uuids)))
+    results.add(
+        "show.concurrent_%d_threads.per_second" % threads,
+        len(uuids) / elapsed,
+        "requests/s",
+    )
+
+
+def bench_create(cli, results, count):
+    """Measure the throughput of creating deployments."""
+    elapsed, _ = _timed(
+        lambda: [cli.deployments.create(fakes.TEMPLATE) for _ in range(count)]
+    )
+    results.add("create.per_second", count / elapsed, "requests/s")
+
+
+def bench_memory(orchestrator, results):
+    """Measure the memory used by each Deployment and Resource object."""
+    raw = json.dumps(list(orchestrator.deployments.values()))
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objs = [base.Deployment(d) for d in json.loads(raw)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    results.add("memory.per_deployment", (after - before) / len(objs), "bytes")
+
+    raw = json.dumps([r for rs in orchestrator.resources.values() for r in rs])
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objs = [base.Resource(r) for r in json.loads(raw)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    results.add("memory.per_resource", (after - before) / len(objs), "bytes")
+
+
+def bench_startup(results, repeat):
+    """Measure the startup time of the command line interface."""
+    cmd = [sys.executable, "-m", "orpy.shell", "--version"]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(  # nosec
+            cmd,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    results.add("cli.startup_time", statistics.median(times), "s", False)
+
+
+def parse_args(argv):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deployments", type=int, default=500, help="Inventory size.")
+    parser.add_argument(
+        "--resources", type=int, default=3, help="Resources per deployment."
+    )
+    parser.add_argument(
+        "--page-size", type=int, default=10, help="Default server page size."
+    )
+    parser.add_argument(
+        "--pagination-sizes",
+        default="10,50,100,500",
+        help="Comma separated page sizes to request in the pagination benchmark.",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="Latency (in seconds) added by the server to every request.",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=100,
+        help="Number of requests for the show and create benchmarks.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=8,
+        help="Number of threads sharing the client in the concurrent benchmark.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Repetitions of each benchmark."
+    )
+    parser.add_argument(
+        "--no-startup",
+        action="store_true",
+        help="Skip the CLI startup benchmark.",
+    )
+    parser.add_argument("--json", action="store_true", help="Output JSON.")
+    parser.add_argument("--output", help="Store the results in this JSON file.")
+    parser.add_argument("--baseline", help="Compare with the results in this file.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed regression with respect to the baseline (0.2 is 20%%).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=sys.argv[1:]):
+    """Run the benchmarks."""
+    args = parse_args(argv)
+    results = Results()
+
+    orchestrator = fakes.FakeOrchestrator(
+        deployments=args.deployments,
+        resources=args.resources,
+        page_size=args.page_size,
+        latency=args.latency,
+    )
+    with orchestrator:
+        cli = client.OrpyClient(orchestrator.url, token="benchmark")
+        uuids = list(orchestrator.deployments)[: args.requests]
+
+        cli.transfer_stats.reset()
+        bench_list(cli, results, args.repeat)
+        sizes = [int(s) for s in args.pagination_sizes.split(",") if s]
+        bench_pagination(cli, results, sizes, args.repeat)
+        bench_show(cli, results, uuids)
+        bench_concurrent_show(cli, results, uuids, args.threads)
+        bench_create(cli, results, args.requests)
+        bench_memory(orchestrator, results)
+    if not args.no_startup:
+        bench_startup(results, args.repeat)
+
+    if args.json:
+        json.dump(results.results, sys.stdout, indent=4, sort_keys=True)
+        sys.stdout.write("\n")
+    else:
+        results.print_table()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results.results, f, indent=4, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = results.compare(baseline, args.tolerance)
+        for name, value, old in regressions:
+            sys.stderr.write(
+                "REGRESSION %s: %.3f (baseline %.3f)\n" % (name, value, old)
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,11 +15,16 @@
 # under the License.
 
 import argparse
+import datetime
+import json
 
 from cliff import command
 from cliff import lister
 from cliff import show
 
+from orpy.client import deployments
+from orpy.client import multi
+from orpy.client import tosca
 from orpy import utils
 
 
@@ -50,9 +55,16 @@ class DeploymentList(lister.Lister):
 
     # TODO(aloga): implement filters
 
+    multi_orchestrator = True
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(DeploymentList, self).get_parser(prog_name)
+        return utils.add_pagination_arguments(parser)
+
     def take_action(self, parsed_args):
         """Execute command."""
-        ret = self.app.client.deployments.list()
+        ret = self.app.client.deployments.list(**utils.pagination_kwargs(parsed_args))
 
         columns = (
             "uuid",
@@ -62,6 +74,8 @@ class DeploymentList(lister.Lister):
             "createdBy",
             "cloudProviderName",
         )
+        if isinstance(self.app.client, multi.MultiOrpyClient):
+            columns = ("orchestrator",) + columns
 
         values = [
             utils.get_item_properties(s, columns, mixed_case_fields=columns)
@@ -71,9 +85,129 @@ class DeploymentList(lister.Lister):
         return columns, values
 
 
+class DeploymentWatch(command.Command):
+    """Watch deployments, showing only their state transitions.
+
+    The list of deployments is polled periodically, and a line is printed
+    whenever a deployment is created, deleted or changes its status.
+    """
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(DeploymentWatch, self).get_parser(prog_name)
+        parser.add_argument(
+            "--interval",
+            metavar="<seconds>",
+            type=int,
+            default=30,
+            help="Seconds to wait between polls (Default: 30).",
+        )
+        parser.add_argument(
+            "--initial",
+            action="store_true",
+            default=False,
+            help="Show a 'created' event for the existing deployments.",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            default=False,
+            help="Print each event as a JSON document, one per line.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute command."""
+        events = self.app.client.deployments.watch(
+            interval=parsed_args.interval, initial=parsed_args.initial
+        )
+        for event in events:
+            now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            if parsed_args.json:
+                d = event.to_dict()
+                d["time"] = now
+                line = json.dumps(d)
+            else:
+                line = "%s %s %s %s -> %s" % (
+                    now,
+                    event.event,
+                    event.uuid,
+                    event.previousStatus,
+                    event.status,
+                )
+            self.app.stdout.write(line + "\n")
+            self.app.stdout.flush()
+
+
+class DeploymentStats(lister.Lister):
+    """Show the number of deployments per status, provider and creation time.
+
+    Deployments are counted as the listing is received, without keeping them
+    in memory. Use --count to get only the total number of deployments, with
+    a single request.
+    """
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(DeploymentStats, self).get_parser(prog_name)
+        parser.add_argument(
+            "--by",
+            metavar="<field>",
+            action="append",
+            default=None,
+            help="Deployment field to count the values of, can be repeated. "
+            "Nested fields can be given with dots, e.g. createdBy.subject "
+            "(Default: %s)." % ", ".join(deployments.SUMMARY_FIELDS),
+        )
+        parser.add_argument(
+            "--period",
+            choices=("year", "month", "day", "none"),
+            default="month",
+            help="Period used to count the deployments per creation time "
+            "(Default: month).",
+        )
+        parser.add_argument(
+            "--page-size",
+            metavar="<items>",
+            type=int,
+            default=None,
+            help="Number of deployments to request per page.",
+        )
+        parser.add_argument(
+            "--count",
+            action="store_true",
+            default=False,
+            help="Only show the total number of deployments.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute command."""
+        columns = ("field", "value", "count")
+        if parsed_args.count:
+            return columns, [("total", "", self.app.client.deployments.count())]
+
+        period = None if parsed_args.period == "none" else parsed_args.period
+        summary = self.app.client.deployments.summary(
+            fields=parsed_args.by or deployments.SUMMARY_FIELDS,
+            period=period,
+            page_size=parsed_args.page_size,
+        )
+
+        values = [("total", "", summary["total"])]
+        for field, counts in summary["counts"].items():
+            for value, count in sorted(counts.items(), key=lambda i: -i[1]):
+                values.append((field, value, count))
+        for created, count in summary["created"].items():
+            values.append(("creationTime", created, count))
+        return columns, values
+
+
 class DeploymentShow(show.ShowOne):
     """Show details about an existing deployment."""
 
+    multi_orchestrator = True
+
     def get_parser(self, prog_name):
         """Return parser for the command."""
         parser = super(DeploymentShow, self).get_parser(prog_name)
@@ -180,6 +314,14 @@ class DeploymentCreate(show.ShowOne):
             "allocated in the last try (Default: True, "
             "accepts boolean values).",
         )
+        parser.add_argument(
+            "--skip-validation",
+            dest="validate",
+            action="store_false",
+            default=True,
+            help="Do not check the template and the parameters locally "
+            "before sending them to the orchestrator.",
+        )
 
         parser.add_argument(
             "filename", metavar="<template file>", help="TOSCA template file."
@@ -206,10 +348,54 @@ class DeploymentCreate(show.ShowOne):
                 max_providers_retry=parsed_args.max_retries,
                 keep_last_attemp=parsed_args.keep_last,
                 parameters=parsed_args.parameters,
+                validate=parsed_args.validate,
             )
         return self.dict2columns(d.to_dict())
 
 
+class DeploymentValidate(show.ShowOne):
+    """Check a TOSCA template and its parameters locally.
+
+    The template must be valid YAML, and the parameters are checked against
+    the inputs declared in the template: they must be declared, all the
+    required inputs must have a value and values must be of the right type.
+    The orchestrator is not contacted.
+    """
+
+    auth_required = False
+    client_required = False
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(DeploymentValidate, self).get_parser(prog_name)
+
+        parser.add_argument(
+            "filename", metavar="<template file>", help="TOSCA template file."
+        )
+        parser.add_argument(
+            "parameters",
+            metavar="<parameter>=<value>",
+            nargs="*",
+            action=KeyValueAction,
+            help="Input parameter for the deployment in the "
+            "form <parameter>=<value>. Can be specified "
+            "several times.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute command."""
+        with open(parsed_args.filename, "r") as f:
+            template = tosca.validate(f.read(), parsed_args.parameters)
+        d = {
+            "template": parsed_args.filename,
+            "sha256": template.sha256,
+            "inputs": ", ".join(sorted(template.inputs)),
+            "valid": True,
+        }
+        return self.dict2columns(d)
+
+
 class DeploymentUpdate(show.ShowOne):
     """Update an existing deployment."""
 
@@ -238,6 +424,31 @@ class DeploymentUpdate(show.ShowOne):
             "allocated in the last try (Default: True, "
             "accepts boolean values).",
         )
+        parser.add_argument(
+            "--skip-validation",
+            dest="validate",
+            action="store_false",
+            default=True,
+            help="Do not check the template and the parameters locally "
+            "before sending them to the orchestrator.",
+        )
+        parser.add_argument(
+            "--skip-unchanged",
+            action="store_true",
+            default=False,
+            help="Do not update the deployment if neither the template nor "
+            "the parameters change. Parameters are only known if the last "
+            "update was done from this host with this option and the "
+            "deployment has not changed since then, otherwise the deployment "
+            "is always updated.",
+        )
+        parser.add_argument(
+            "--diff",
+            action="store_true",
+            default=False,
+            help="Show what the update would change, without updating the "
+            "deployment.",
+        )
 
         parser.add_argument(
             "uuid", metavar="<deployment uuid>", help="Deployment UUID to update."
@@ -259,12 +470,39 @@ class DeploymentUpdate(show.ShowOne):
     def take_action(self, parsed_args):
         """Execute command."""
         with open(parsed_args.filename, "r") as f:
-            d = self.app.client.deployments.update(
-                uuid=parsed_args.uuid,
-                template=f.read(),
-                callback_url=parsed_args.callback,
-                max_providers_retry=parsed_args.max_retries,
-                keep_last_attemp=parsed_args.keep_last,
-                parameters=parsed_args.parameters,
+            template = f.read()
+
+        if parsed_args.diff:
+            if parsed_args.validate:
+                tosca.validate(template, parsed_args.parameters)
+            diff = self.app.client.deployments.diff(
+                parsed_args.uuid, template, parsed_args.parameters
             )
+            return self.dict2columns(_format_changes(diff))
+
+        d = self.app.client.deployments.update(
+            uuid=parsed_args.uuid,
+            template=template,
+            callback_url=parsed_args.callback,
+            max_providers_retry=parsed_args.max_retries,
+            keep_last_attemp=parsed_args.keep_last,
+            parameters=parsed_args.parameters,
+            validate=parsed_args.validate,
+            skip_unchanged=parsed_args.skip_unchanged,
+        )
         return self.dict2columns(d.to_dict())
+
+
+def _format_changes(diff):
+    if diff.parameters_known:
+        parameters = "\n".join(
+            "%s: %s -> %s" % (name, json.dumps(old), json.dumps(new))
+            for name, (old, new) in diff.parameters.items()
+        )
+    else:
+        parameters = "unknown (not updated from this host with --skip-unchanged)"
+    return {
+        "changed": diff.changed,
+        "template": "".join(diff.template_diff).rstrip("\n") or "unchanged",
+        "parameters": parameters or "unchanged",
+    }
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from cliff import command
+
+from orpy.client import export
+from orpy import utils
+
+
+class Export(command.Command):
+    """Export the inventory of deployments to CSV, JSON lines or Parquet.
+
+    Deployments are written page by page as they are received, so that
+    memory does not grow with the size of the inventory. Nested values are
+    written as JSON documents in CSV and Parquet files.
+    """
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(Export, self).get_parser(prog_name)
+        parser.add_argument(
+            "-o",
+            "--output",
+            metavar="<file>",
+            default="-",
+            help="File to write the export to (Default: the standard output).",
+        )
+        parser.add_argument(
+            "--format",
+            choices=export.FORMATS,
+            default=None,
+            help="Export format. Parquet needs the pyarrow package (Default: "
+            "guessed from the output file extension, or csv).",
+        )
+        parser.add_argument(
+            "--compression",
+            metavar="<codec>",
+            default=None,
+            help="Compression of the export: %s or none for CSV and JSON "
+            "lines, %s for Parquet (Default: guessed from the output file "
+            "extension, snappy for Parquet)."
+            % (
+                ", ".join(sorted(export.COMPRESSIONS)),
+                ", ".join(export.PARQUET_COMPRESSIONS),
+            ),
+        )
+        parser.add_argument(
+            "--column",
+            metavar="<field>",
+            dest="columns",
+            action="append",
+            default=None,
+            help="Deployment field to export, can be repeated. Nested fields "
+            "can be given with dots, e.g. createdBy.subject (Default: all the "
+            "fields, except the links and the outputs).",
+        )
+        parser.add_argument(
+            "--resources",
+            action="store_true",
+            default=False,
+            help="Export the resources of each deployment too.",
+        )
+        parser.add_argument(
+            "--outputs",
+            action="store_true",
+            default=False,
+            help="Export the outputs of the deployments too.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            metavar="<requests>",
+            type=int,
+            default=8,
+            help="Number of deployments to get the resources of concurrently "
+            "when using --resources (Default: 8).",
+        )
+        return utils.add_pagination_arguments(parser)
+
+    def take_action(self, parsed_args):
+        """Execute command."""
+        fmt, compression = export.guess_format(parsed_args.output)
+        fmt = parsed_args.format or fmt or export.CSV
+        if parsed_args.compression is not None:
+            compression = parsed_args.compression
+        if compression == "none" and fmt != export.PARQUET:
+            compression = None
+        elif fmt == export.PARQUET and parsed_args.compression is None:
+            compression = None
+
+        writer = export.get_writer(
+            fmt, parsed_args.output, compression, stdout=self.app.stdout
+        )
+        exporter = export.Exporter(
+            self.app.client,
+            fields=parsed_args.columns,
+            resources=parsed_args.resources,
+            outputs=parsed_args.outputs,
+            concurrency=parsed_args.concurrency,
+            **utils.pagination_kwargs(parsed_args)
+        )
+        with writer:
+            exporter.write(writer)
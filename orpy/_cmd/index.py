@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from cliff import lister
+from cliff import show
+
+from orpy.client import index
+from orpy import utils
+
+
+def _add_index_argument(parser):
+    parser.add_argument(
+        "--index-file",
+        metavar="<path>",
+        dest="index_file",
+        default=utils.env("ORPY_INDEX_FILE", default=None),
+        help="Path of the local index database. Defaults to the "
+        "ORPY_INDEX_FILE environment variable, or to a file in the orpy "
+        "cache directory (one per orchestrator URL).",
+    )
+
+
+def _get_index(app, parsed_args):
+    if parsed_args.index_file:
+        return index.Index(app.client, path=parsed_args.index_file)
+    return app.client.index
+
+
+class IndexSync(show.ShowOne):
+    """Synchronize the local index of deployments and resources.
+
+    Only the deployments that changed since the last synchronization (and
+    their resources) are fetched from the orchestrator, unless --full is used.
+    """
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(IndexSync, self).get_parser(prog_name)
+        _add_index_argument(parser)
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            default=False,
+            help="Do a full synchronization, removing from the index the "
+            "deployments that no longer exist.",
+        )
+        parser.add_argument(
+            "--no-resources",
+            dest="resources",
+            action="store_false",
+            default=True,
+            help="Do not index deployment resources.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute command."""
+        idx = _get_index(self.app, parsed_args)
+        d = idx.sync(full=parsed_args.full, resources=parsed_args.resources)
+        d["index"] = idx.path
+        return self.dict2columns(d)
+
+
+class IndexQuery(lister.Lister):
+    """Query the local index of deployments and resources.
+
+    The index must have been populated before with the 'sync' command. No
+    requests are done to the orchestrator.
+    """
+
+    auth_required = False
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(IndexQuery, self).get_parser(prog_name)
+        _add_index_argument(parser)
+        parser.add_argument(
+            "--status", default=None, help="Filter deployments by status."
+        )
+        parser.add_argument(
+            "--provider",
+            default=None,
+            help="Filter deployments by cloud provider name.",
+        )
+        parser.add_argument(
+            "--created-by",
+            metavar="<subject>",
+            dest="created_by",
+            default=None,
+            help="Filter deployments by the subject of their creator.",
+        )
+        parser.add_argument(
+            "--since",
+            metavar="<time>",
+            default=None,
+            help="Only deployments created after this time. Accepts ISO 8601 "
+            "dates and times or relative times like '7d' or '12h'.",
+        )
+        parser.add_argument(
+            "--until",
+            metavar="<time>",
+            default=None,
+            help="Only deployments created before this time.",
+        )
+        parser.add_argument(
+            "--limit",
+            metavar="<limit>",
+            type=int,
+            default=None,
+            help="Maximum number of deployments to show.",
+        )
+        parser.add_argument(
+            "--resources",
+            action="store_true",
+            default=False,
+            help="List the resources of the matching deployments instead.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute command."""
+        idx = _get_index(self.app, parsed_args)
+        ret = idx.deployments(
+            status=parsed_args.status,
+            provider=parsed_args.provider,
+            created_by=parsed_args.created_by,
+            created_after=parsed_args.since,
+            created_before=parsed_args.until,
+            limit=parsed_args.limit,
+        )
+
+        if parsed_args.resources:
+            columns = (
+                "deploymentUuid",
+                "uuid",
+                "state",
+                "toscaNodeType",
+                "toscaNodeName",
+                "creationTime",
+            )
+            ret = [r for d in ret for r in idx.resources(deployment_uuid=d.uuid)]
+        else:
+            columns = (
+                "uuid",
+                "status",
+                "task",
+                "creationTime",
+                "createdBy",
+                "cloudProviderName",
+            )
+
+        values = [
+            utils.get_item_properties(s, columns, mixed_case_fields=columns)
+            for s in ret
+        ]
+
+        return columns, values
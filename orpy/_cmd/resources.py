@@ -14,27 +14,52 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import itertools
+
 from cliff import lister
 from cliff import show
+import six
 
+from orpy.client import multi
+from orpy import exceptions
 from orpy import utils
 
 
 class ResourcesList(lister.Lister):
     """List Resources for a given deployment."""
 
+    multi_orchestrator = True
+
     def get_parser(self, prog_name):
         """Return parser for the command."""
         parser = super(ResourcesList, self).get_parser(prog_name)
         parser.add_argument(
-            "uuid", metavar="<deployment uuid>", help="Deployment UUID to show."
+            "uuid",
+            metavar="<deployment uuid>",
+            nargs="?",
+            default=None,
+            help="Deployment UUID to show.",
         )
-        return parser
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            default=False,
+            help="List the resources of all the deployments, instead of a "
+            "single one. Results are streamed as they are gathered, therefore "
+            "they are not sorted.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            metavar="<requests>",
+            type=int,
+            default=8,
+            help="Number of deployments to query concurrently when using "
+            "--all (Default: 8).",
+        )
+        return utils.add_pagination_arguments(parser)
 
     def take_action(self, parsed_args):
         """Execute command."""
-        ret = self.app.client.resources.list(parsed_args.uuid)
-
         columns = (
             "uuid",
             "state",
@@ -44,10 +69,78 @@ class ResourcesList(lister.Lister):
             "requiredBy",
         )
 
-        values = [
+        if parsed_args.all:
+            if parsed_args.uuid:
+                raise exceptions.InvalidUsageError(
+                    "Cannot use --all together with a deployment UUID."
+                )
+            if parsed_args.page_size or parsed_args.start_page is not None:
+                raise exceptions.InvalidUsageError(
+                    "Cannot use --page-size or --start-page together with --all."
+                )
+            ret = self.app.client.resources.list_all(
+                concurrency=parsed_args.concurrency
+            )
+            if parsed_args.limit is not None:
+                ret = itertools.islice(ret, parsed_args.limit)
+            columns = ("deploymentUuid",) + columns
+        elif parsed_args.uuid:
+            ret = self.app.client.resources.list(
+                parsed_args.uuid, **utils.pagination_kwargs(parsed_args)
+            )
+        else:
+            raise exceptions.InvalidUsageError(
+                "Either a deployment UUID or --all must be specified."
+            )
+        if isinstance(self.app.client, multi.MultiOrpyClient):
+            columns = ("orchestrator",) + columns
+
+        values = (
             utils.get_item_properties(s, columns, mixed_case_fields=columns)
             for s in ret
-        ]
+        )
+
+        return columns, values
+
+
+class ResourcesTree(lister.Lister):
+    """Show the dependency tree of the resources of a deployment.
+
+    Resources are shown starting from the ones that do not depend on any
+    other resource, followed (indented) by the resources that depend on them.
+    """
+
+    def get_parser(self, prog_name):
+        """Return parser for the command."""
+        parser = super(ResourcesTree, self).get_parser(prog_name)
+        parser.add_argument(
+            "uuid", metavar="<deployment uuid>", help="Deployment UUID to show."
+        )
+        parser.add_argument(
+            "--node",
+            metavar="<resource uuid or node name>",
+            default=None,
+            help="Only show this resource and the resources that depend on it.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute command."""
+        g = self.app.client.resources.graph(parsed_args.uuid)
+
+        if parsed_args.node is not None and parsed_args.node not in g:
+            raise exceptions.NotFoundError(
+                "Resource '%s' not found in deployment" % parsed_args.node
+            )
+
+        columns = ("toscaNodeName", "uuid", "state", "toscaNodeType")
+
+        values = []
+        for depth, resource in g.walk(parsed_args.node):
+            row = utils.get_item_properties(
+                resource, columns, mixed_case_fields=columns
+            )
+            values.append(("  " * depth + six.text_type(row[0]),) + row[1:])
 
         return columns, values
 
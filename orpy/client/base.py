@@ -101,6 +101,12 @@ class Deployment(BaseObject):
     pass
 
 
+class DeploymentEvent(BaseObject):
+    """Object that represents a change in a deployment."""
+
+    pass
+
+
 class Resource(BaseObject):
     """Object that represents a Resource."""
 
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Circuit breaker to fail fast when the Orchestrator is not healthy."""
+
+import collections
+import threading
+import time
+
+from orpy import exceptions
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker(object):
+    """Circuit breaker for the requests done to the Orchestrator.
+
+    The breaker keeps track of the outcome of the last ``window`` requests.
+    A request is considered failed if it could not be done (e.g. connection
+    errors or timeouts), if the Orchestrator answered with a server error
+    (5xx) or if it took longer than ``slow_threshold`` seconds (if set).
+
+    Once ``failure_threshold`` failures are recorded in the window, the
+    circuit opens and every request fails immediately with
+    orpy.exceptions.CircuitOpenError, without touching the network. After
+    ``reset_timeout`` seconds the circuit becomes half-open: the next request
+    first runs the probe (if any, e.g. a GET on ``./info``) and, if it
+    succeeds, the circuit is closed again; otherwise it is open for another
+    ``reset_timeout`` seconds. Only one thread probes at a time, the rest
+    keep failing fast meanwhile.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=5,
+        reset_timeout=30,
+        window=20,
+        slow_threshold=None,
+        probe=True,
+    ):
+        """Initialize the circuit breaker.
+
+        :param int failure_threshold: Number of failures in the window that
+                                      opens the circuit.
+        :param float reset_timeout: Seconds to wait before probing again.
+        :param int window: Number of recent requests to take into account.
+        :param float slow_threshold: Requests slower than this (in seconds)
+                                     are considered as failures.
+        :param probe: Callable used to check whether the Orchestrator is back,
+                      it must raise an exception if it is not. If True (the
+                      default), the probe provided by the client is used
+                      (i.e. a GET on the ``./info`` endpoint). If None, the
+                      first request after the timeout is used as probe.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_threshold = slow_threshold
+        self.probe = probe
+
+        self._lock = threading.Lock()
+        self._results = collections.deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        """Get the current state of the circuit."""
+        with self._lock:
+            if self._state == OPEN and self._retry_in() <= 0:
+                return HALF_OPEN
+            return self._state
+
+    def _retry_in(self):
+        return self._opened_at + self.reset_timeout - time.monotonic()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    def _fail_fast(self):
+        raise exceptions.CircuitOpenError(retry_in=max(0, int(self._retry_in())))
+
+    def before_request(self, default_probe=None):
+        """Check whether a request can be done.
+
+        :param default_probe: Probe to use if the breaker was created with
+                              ``probe=True``.
+        :raises orpy.exceptions.CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._probing or self._retry_in() > 0:
+                self._fail_fast()
+            self._state = HALF_OPEN
+            self._probing = True
+
+        probe = self.probe
+        if probe is True:
+            probe = default_probe
+        if not probe:
+            # The request itself is the probe, its result will be recorded
+            return
+
+        try:
+            probe()
+        except Exception:
+            with self._lock:
+                self._probing = False
+                self._open()
+                self._fail_fast()
+        with self._lock:
+            self._probing = False
+            self._close()
+
+    def _close(self):
+        self._state = CLOSED
+        self._results.clear()
+
+    def record(self, success, elapsed=None):
+        """Record the outcome of a request.
+
+        :param bool success: Whether the request succeeded.
+        :param float elapsed: Time taken by the request, in seconds.
+        """
+        if success and self.slow_threshold is not None and elapsed is not None:
+            success = elapsed <= self.slow_threshold
+
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if success:
+                    self._close()
+                else:
+                    self._open()
+                return
+
+            self._results.append(success)
+            failures = self._results.count(False)
+            if self._state == CLOSED and failures >= self.failure_threshold:
+                self._open()
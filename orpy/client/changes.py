@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Detection of the changes that a deployment update would apply.
+
+Templates are compared once normalized (i.e. parsed, so that comments,
+formatting and key order are not taken into account), and parameters once
+converted to the types of the template inputs and completed with their
+default values.
+
+The Orchestrator returns the template of a deployment, but not the
+parameters it was deployed with. The parameters of the last update done
+from this host are therefore recorded (along with the template, to avoid
+fetching it again while the deployment does not change) under the orpy
+cache directory (only when asked to, as they usually contain credentials).
+They are only taken into account while the deployment has the update time
+returned by that update, or the one it gets when the Orchestrator completes
+that update, i.e. while it has not been updated again (e.g. from another
+host). An update done from another host with the same template before the
+completed update is first seen here goes unnoticed.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+
+import yaml
+
+from orpy.client import tosca
+from orpy import exceptions
+from orpy import utils
+
+_TRUE = ("true", "yes", "on", "1")
+
+# Status of a deployment once the Orchestrator has applied an update
+UPDATE_COMPLETE = "UPDATE_COMPLETE"
+
+
+def normalize_template(template):
+    """Get the canonical form of a template.
+
+    :param str template: The TOSCA template.
+    :returns: The template as indented JSON, with sorted keys. Templates
+              that cannot be parsed are returned as they are.
+    :rtype: str
+    """
+    try:
+        data = tosca.parse(template).data
+    except exceptions.TemplateValidationError:
+        return template
+    return json.dumps(data, sort_keys=True, indent=2, default=str)
+
+
+def _coerce(type_, value):
+    if not isinstance(value, str):
+        return value
+    try:
+        if type_ == "integer":
+            return int(value)
+        if type_ == "float":
+            return float(value)
+        if type_ == "boolean":
+            return value.lower() in _TRUE
+        if type_ in ("map", "list"):
+            return yaml.safe_load(value)
+    except (ValueError, yaml.YAMLError):
+        pass
+    return value
+
+
+def normalize_parameters(parameters, template=None):
+    """Get the canonical form of the parameters of a template.
+
+    :param dict parameters: The input parameters.
+    :param str template: The TOSCA template. If given (and valid), values
+                         are converted to the types of the inputs, and the
+                         default values of the inputs are added.
+    :rtype: dict
+    """
+    parameters = dict(parameters or {})
+    try:
+        inputs = tosca.parse(template).inputs if template is not None else {}
+    except exceptions.TemplateValidationError:
+        inputs = {}
+
+    ret = {}
+    for name, definition in inputs.items():
+        if isinstance(definition, dict) and "default" in definition:
+            ret[name] = definition["default"]
+    for name, value in parameters.items():
+        definition = inputs.get(name)
+        type_ = definition.get("type") if isinstance(definition, dict) else None
+        ret[name] = _coerce(type_, value)
+    # Round trip through JSON, to compare them with the recorded ones
+    return json.loads(json.dumps(ret, default=str))
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Changes(object):
+    """Changes that an update would apply to a deployment."""
+
+    def __init__(self, template_diff, parameters, parameters_known, deployment=None):
+        """Initialize the changes.
+
+        :param list template_diff: Lines of the unified diff between the
+                                   current and the new (normalized)
+                                   templates, empty if they are the same.
+        :param dict parameters: Changed parameters, as a mapping of their
+                                name to a ``(current, new)`` tuple.
+        :param bool parameters_known: Whether the current parameters are
+                                      known. If not, the update is always
+                                      considered as a change.
+        :param orpy.client.base.Deployment deployment: The current
+                                                        deployment.
+        """
+        self.template_diff = template_diff
+        self.parameters = parameters
+        self.parameters_known = parameters_known
+        self.deployment = deployment
+
+    @property
+    def changed(self):
+        """Whether the update would change anything."""
+        return bool(self.template_diff or self.parameters or not self.parameters_known)
+
+    def __bool__(self):
+        """Whether the update would change anything."""
+        return self.changed
+
+    def to_dict(self):
+        """Get the changes as a dictionary."""
+        return {
+            "changed": self.changed,
+            "template": "".join(self.template_diff),
+            "parameters": dict(self.parameters),
+            "parameters_known": self.parameters_known,
+        }
+
+
+def compare(current_template, current_parameters, template, parameters):
+    """Compare the current and the new template and parameters.
+
+    :param str current_template: The current (normalized) template.
+    :param dict current_parameters: The current (normalized) parameters, or
+                                    None if they are not known.
+    :param str template: The new template.
+    :param dict parameters: The new parameters.
+    :rtype: Changes
+    """
+    new_template = normalize_template(template)
+    template_diff = list(
+        difflib.unified_diff(
+            current_template.splitlines(True),
+            new_template.splitlines(True),
+            "current",
+            "new",
+        )
+    )
+
+    changed = {}
+    if current_parameters is not None:
+        new_parameters = normalize_parameters(parameters, template)
+        for name in sorted(set(current_parameters) | set(new_parameters)):
+            old, new = current_parameters.get(name), new_parameters.get(name)
+            if old != new:
+                changed[name] = (old, new)
+    return Changes(template_diff, changed, current_parameters is not None)
+
+
+class UpdateStore(object):
+    """Records of the deployment updates done from this host."""
+
+    def __init__(self, url, path=None):
+        """Initialize the store.
+
+        :param str url: The Orchestrator URL.
+        :param str path: Directory to store the records in. If not set, a
+                         directory inside the orpy cache directory is used,
+                         one per Orchestrator URL.
+        """
+        if path is None:
+            digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]  # nosec
+            path = utils.cache_dir("updates", digest)
+        self.path = path
+
+    def _file(self, uuid):
+        digest = hashlib.sha1(uuid.encode("utf-8")).hexdigest()  # nosec
+        return os.path.join(self.path, "%s.json" % digest)
+
+    def load(self, uuid):
+        """Load the record of a deployment, or an empty dictionary."""
+        try:
+            with open(self._file(uuid)) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save(self, uuid, record):
+        """Store the record of a deployment, replacing the previous one."""
+        path = self._file(uuid)
+        tmp = "%s.%s.tmp" % (path, os.getpid())
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp, path)
+
+    def template(self, uuid, update_time):
+        """Get the recorded template of a deployment, if it is up to date.
+
+        :param str uuid: The UUID of the deployment.
+        :param str update_time: The current update time of the deployment.
+        :returns: The normalized template, or None.
+        """
+        record = self.load(uuid)
+        if record.get("update_time") == update_time:
+            return record.get("template")
+        return None
+
+    def parameters(self, uuid, template, update_time, status=None):
+        """Get the recorded parameters of a deployment.
+
+        The Orchestrator changes the update time of a deployment again when
+        it completes an update. The first time the deployment is found in
+        ``UPDATE_COMPLETE`` after the recorded update, its new update time
+        is recorded, and the parameters are valid until it changes again.
+
+        :param str uuid: The UUID of the deployment.
+        :param str template: The current normalized template.
+        :param str update_time: The current update time of the deployment.
+        :param str status: The current status of the deployment.
+        :returns: The normalized parameters, or None if they are not known
+                  for this template or the deployment was modified after
+                  they were recorded.
+        """
+        record = self.load(uuid)
+        if record.get("parameters_template") != _digest(template):
+            return None
+        recorded = record.get("parameters_update_time")
+        if recorded is None:
+            return None
+        if recorded != update_time:
+            if record.get("parameters_completed") or status != UPDATE_COMPLETE:
+                return None
+            record.update(
+                {"parameters_update_time": update_time, "parameters_completed": True}
+            )
+            self.save(uuid, record)
+        return record.get("parameters")
+
+    def record_template(self, uuid, template, update_time):
+        """Record the current template of a deployment.
+
+        :param str uuid: The UUID of the deployment.
+        :param str template: The normalized template.
+        :param str update_time: The update time of the deployment.
+        """
+        record = self.load(uuid)
+        record.update({"template": template, "update_time": update_time})
+        self.save(uuid, record)
+
+    def record_update(self, uuid, template, parameters, update_time):
+        """Record an update of a deployment.
+
+        :param str uuid: The UUID of the deployment.
+        :param str template: The template of the update.
+        :param dict parameters: The parameters of the update.
+        :param str update_time: The update time returned by the Orchestrator.
+        """
+        normalized = normalize_template(template)
+        self.save(
+            uuid,
+            {
+                "template": normalized,
+                "update_time": update_time,
+                "parameters": normalize_parameters(parameters, template),
+                "parameters_template": _digest(normalized),
+                "parameters_update_time": update_time,
+                "parameters_completed": False,
+            },
+        )
+
+    def forget(self, uuid):
+        """Remove the record of a deployment, if any.
+
+        :param str uuid: The UUID of the deployment.
+        """
+        try:
+            os.remove(self._file(uuid))
+        except OSError:
+            pass
@@ -18,9 +18,10 @@
 
 import copy
 import datetime
-import hashlib
 import json
 import logging
+import threading
+import time
 import uuid
 import warnings
 
@@ -28,11 +29,19 @@ import requests
 import six
 from six.moves.urllib import parse
 
+from orpy.client import compression
 from orpy.client import config
 from orpy.client import deployments
+from orpy.client import endpoints
+from orpy.client import httplog
+from orpy.client import index
 from orpy.client import info
+from orpy.client import ratelimit
 from orpy.client import resources
+from orpy.client import singleflight
+from orpy.client import tracing
 from orpy import exceptions
+from orpy import profiling
 from orpy import version
 
 
@@ -83,14 +92,71 @@ class OrpyClient(object):
 
     If you do not pass any of these when creating the client, but you want
     to setup them afterwards, you can do so with the set_authentication method.
+
+    Concurrent identical GET and HEAD requests done through the same client
+    (e.g. several threads showing the same deployment at the same time) are
+    coalesced into a single HTTP request, whose result is shared by all the
+    callers. This can be disabled with the coalesce parameter.
+
+    In order to stay below the Orchestrator quotas, a
+    orpy.client.ratelimit.RateLimiter object can be passed in the
+    rate_limiter parameter, so that requests are throttled on the client side.
+
+    If the Orchestrator is unhealthy, requests can be made to fail fast by
+    passing a orpy.client.breaker.CircuitBreaker object in the circuit_breaker
+    parameter. Combine it with a timeout, so that hung connections are
+    detected as failures.
+
+    If you have several redundant Orchestrator instances, you can pass a list
+    of URLs instead of a single one. Requests will be sent to the healthy
+    instance with the lowest latency, failing over transparently to the next
+    one on connection errors (see orpy.client.endpoints.EndpointPool).
+
+    The interactions with the Orchestrator can be recorded to a cassette
+    file and replayed later without touching the network, passing a
+    orpy.client.transport.RecordingTransport or
+    orpy.client.transport.ReplayTransport object in the transport parameter.
+
+    Compressed responses (gzip, deflate and, if the brotli or zstandard
+    modules are installed, br and zstd) are always accepted. Request bodies
+    (e.g. large TOSCA templates) can be compressed with gzip too by setting
+    the compress_requests parameter, if the Orchestrator (or the proxy in
+    front of it) supports it. The bytes transferred and saved are counted in
+    the transfer_stats attribute (see orpy.client.compression.TransferStats).
+
+    With debug enabled, requests and responses are logged as lazily formatted
+    records (see orpy.client.httplog), with sensitive values redacted and the
+    bodies truncated to debug_body_limit characters.
+
+    The client is thread safe, and a single client should be shared by all
+    the threads of a process: each thread uses its own requests session, but
+    connections are pooled and reused across all of them (up to pool_size
+    per Orchestrator instance), and access tokens are cached and renewed by
+    one thread at a time.
     """
 
     def __init__(
-        self, url, oidc_agent=None, token=None, oidc_session=None, debug=False
+        self,
+        url,
+        oidc_agent=None,
+        token=None,
+        oidc_session=None,
+        debug=False,
+        coalesce=True,
+        rate_limiter=None,
+        circuit_breaker=None,
+        timeout=None,
+        check_interval=60,
+        transport=None,
+        compress_requests=None,
+        pool_size=10,
+        metrics=None,
+        tracer=None,
     ):
         """Initialize of OrpyClient object.
 
-        :param str url: Orchestrator URL
+        :param url: Orchestrator URL, or list of URLs of redundant
+                    Orchestrator instances.
         :param orpy.oidc.OpenIDConnectAgent oidc_agent: OpenID Connect agent
                                                         object to use for
                                                         fetching access tokens.
@@ -99,17 +165,54 @@ class OrpyClient(object):
                                                             fetching the token.
         :param str token: OpenID Connect access token to use for auth.
         :param bool debug: whether to enable debug logging
+        :param bool coalesce: whether to coalesce concurrent identical GET
+                              and HEAD requests into a single one.
+        :param orpy.client.ratelimit.RateLimiter rate_limiter: rate limiter
+                                                               to throttle
+                                                               requests.
+        :param orpy.client.breaker.CircuitBreaker circuit_breaker: circuit
+                                                                   breaker to
+                                                                   use.
+        :param timeout: default timeout (in seconds) for the requests, either
+                        a number or a (connect, read) tuple.
+        :param float check_interval: seconds between health checks of the
+                                     Orchestrator instances, when several
+                                     URLs are used.
+        :param requests.adapters.BaseAdapter transport: transport to mount on
+                                                        the session for all
+                                                        the requests.
+        :param int compress_requests: compress with gzip the request bodies
+                                      of at least this size (in bytes). By
+                                      default bodies are not compressed.
+        :param int pool_size: maximum number of connections to keep open
+                              to each Orchestrator instance, shared by all
+                              the threads using the client.
+        :param orpy.client.metrics.ClientMetrics metrics: metrics object to
+                                                          record the requests
+                                                          in.
+        :param orpy.client.tracing.Tracer tracer: tracer to send the spans of
+                                                  the operations to. By
+                                                  default spans are
+                                                  discarded.
         """
-        self.url = url + "/"
+        if isinstance(url, six.string_types):
+            url = [url]
+        self.endpoints = endpoints.EndpointPool(
+            [u.rstrip("/") + "/" for u in url],
+            probe=self._probe,
+            check_interval=check_interval,
+        )
 
         self.set_authentication(token=token, agent=oidc_agent, session=oidc_session)
 
         self.http_debug = debug
+        self.debug_body_limit = httplog.BODY_LIMIT
 
         self._deployments = deployments.Deployments(self)
         self._resources = resources.Resources(self)
         self._info = info.Info(self)
         self._config = config.Config(self)
+        self._index = index.Index(self)
 
         self._logger = logging.getLogger(__name__)
 
@@ -127,7 +230,27 @@ class OrpyClient(object):
                 rql.setLevel(logging.WARNING)
 
         self._json = _JSONEncoder()
-        self.session = requests.Session()
+        self._local = threading.local()
+        self._session = None
+        if transport is None:
+            transport = requests.adapters.HTTPAdapter(
+                pool_connections=len(self.endpoints), pool_maxsize=pool_size
+            )
+        self.transport = transport
+        bind = getattr(transport, "bind", None)
+        if bind is not None:
+            # Let record/replay transports match paths relative to our URLs
+            for url in self.urls:
+                bind(url)
+
+        self._singleflight = singleflight.SingleFlight() if coalesce else None
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self.compress_requests = compress_requests
+        self.transfer_stats = compression.TransferStats()
+        self.metrics = metrics
+        self.tracer = tracer if tracer is not None else tracing.NOOP
 
     def set_authentication(self, token=None, agent=None, session=None):
         """Set OIDC authentication options.
@@ -166,6 +289,38 @@ class OrpyClient(object):
                 "oidc-agent object, an oidc-session object or an access token."
             )
 
+    @property
+    def session(self):
+        """Get the requests session to use in the current thread.
+
+        Each thread gets its own requests.Session object, but all of them
+        share the same transport, and therefore the same pool of connections.
+        """
+        if self._session is not None:
+            return self._session
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.transport)
+            session.mount("https://", self.transport)
+            self._local.session = session
+        return session
+
+    @session.setter
+    def session(self, session):
+        """Use the given session in all the threads."""
+        self._session = session
+
+    @property
+    def url(self):
+        """Get the base URL of the Orchestrator instance in use."""
+        return self.endpoints.select().url
+
+    @property
+    def urls(self):
+        """Get the base URLs of all the Orchestrator instances."""
+        return [e.url for e in self.endpoints.endpoints]
+
     @property
     def token(self):
         """Get an access token to interact with the Orchestrator."""
@@ -173,9 +328,11 @@ class OrpyClient(object):
 
         token = self._token
         if self.oidc_agent is not None:
-            token = self.oidc_agent.get_token()["access_token"]
+            with profiling.phase("token"), self.tracer.span("token"):
+                token = self.oidc_agent.get_token()["access_token"]
         elif self.oidc_session is not None:
-            token = self.oidc_session.get_token()["access_token"]
+            with profiling.phase("token"), self.tracer.span("token"):
+                token = self.oidc_session.get_token()["access_token"]
         return token
 
     @property
@@ -205,6 +362,15 @@ class OrpyClient(object):
         """
         return self._config
 
+    @property
+    def index(self):
+        """Interface to the local index of deployments and resources.
+
+        :return: Local index interface.
+        :rtype: orpy.client.index.Index
+        """
+        return self._index
+
     @property
     def info(self):
         """Interface to query for Orchestrator information.
@@ -241,149 +407,314 @@ class OrpyClient(object):
 
         :returns: The response to the request.
         """
-        method = method.lower()
-
-        kwargs.setdefault("headers", kwargs.get("headers", {}))
-
-        kwargs["headers"]["User-Agent"] = "orpy-%s" % version.user_agent
-        kwargs["headers"]["Accept"] = "application/json"
+        if self._singleflight is not None and method.lower() in ("get", "head"):
+            key = json.dumps(
+                [method.lower(), url, authenticated, kwargs],
+                sort_keys=True,
+                default=repr,
+            )
+            (resp, content), shared = self._singleflight.do(
+                key, self._request, url, method, authenticated, payload, **kwargs
+            )
+            if shared:
+                # Every caller gets its own copy, as callers may modify it
+                content = copy.deepcopy(content)
+            return resp, content
 
-        if authenticated and self.token is not None:
-            kwargs["headers"]["Authorization"] = "Bearer" + self.token
+        return self._request(url, method, authenticated, payload, **kwargs)
 
-        if payload is not None:
-            kwargs["headers"].setdefault("Content-Type", "application/json")
-            kwargs["data"] = self._json.encode(payload)
+    def _request(self, url, method, authenticated, payload, **kwargs):
+        pages = self.iter_pages(
+            url, method, authenticated=authenticated, payload=payload, **kwargs
+        )
+        resp, content, page = next(pages)
 
-        url = parse.urljoin(self.url, url)
+        # If the content is a list we may be paginating, therefore we need to
+        # append the rest of the pages to the "contents"
+        if isinstance(content, list):
+            for resp, next_content, page in pages:
+                content.extend(next_content)
 
-        self._http_log_req(method, url, kwargs)
+        return resp, content
 
-        resp = self.session.request(method, url, **kwargs)
+    def iter_pages(self, url, method="GET", authenticated=True, payload=None, **kwargs):
+        """Send an HTTP request, lazily following the pagination links.
 
-        self._http_log_resp(resp)
+        This method accepts the same arguments as :py:meth:`.request()`, but
+        instead of draining all the pages it returns a generator that yields
+        a ``(response, content, page)`` tuple for each of the pages, fetching
+        the next page only when it is requested. Callers that only need part
+        of a listing can therefore stop early, avoiding the rest of round
+        trips. ``page`` contains the pagination metadata returned by the
+        Orchestrator (i.e. ``size``, ``totalElements``, ``totalPages`` and
+        ``number``), or None if the response is not paginated.
 
-        if resp.status_code >= 400:
-            try:
-                body = resp.json()
-            except json.decoder.JSONDecodeError:
-                body = resp.text
-            raise exceptions.from_response(resp, body, url, method)
+        :returns: A generator of ``(response, content, page)`` tuples.
+        """
+        method = method.lower()
 
-        do_pagination = False
+        # Do not modify the headers passed by the caller, they may be shared
+        kwargs["headers"] = dict(kwargs.get("headers") or {})
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
 
-        try:
-            content = resp.json().get("content", resp.json())
-        except Exception:
-            do_pagination = True
-            content = resp.text
+        kwargs["headers"]["User-Agent"] = "orpy-%s" % version.user_agent
+        kwargs["headers"]["Accept"] = "application/json"
+        kwargs["headers"].setdefault("Accept-Encoding", compression.ACCEPT_ENCODING)
 
-        while not do_pagination:
-            curr, next_, last = self._get_links_from_response(resp)
+        token = self.token if authenticated else None
+        if token is not None:
+            kwargs["headers"]["Authorization"] = "Bearer" + token
 
-            # If we have curr, next and last this means that we are paginating
-            # therefore we need to append to the "contents"
-            if all([curr, next_, last]) and curr != last:
-                self._http_log_req(method, next_, kwargs)
-                resp = self.session.request(method, next_, **kwargs)
-                self.http_log_resp(resp)
-                next_content = resp.json().get("content", [])
-                content.extend(next_content)
+        if payload is not None:
+            kwargs["headers"].setdefault("Content-Type", "application/json")
+            data = self._json.encode(payload).encode("utf-8")
+            threshold = self.compress_requests
+            if threshold is not None and len(data) >= threshold:
+                kwargs["headers"]["Content-Encoding"] = "gzip"
+                kwargs["data"] = compression.compress(data)
+                self.transfer_stats.record_request(len(kwargs["data"]), len(data))
             else:
-                do_pagination = True
+                kwargs["data"] = data
+                self.transfer_stats.record_request(len(data))
 
-        return resp, content
+        resp, body = self._send(method, url, kwargs, payload=payload)
 
-    def _get_links_from_response(self, response):
-        d = {}
-        for link in response.json().get("links", []):
-            d[link["rel"]] = link["href"]
-        return d.get("self"), d.get("next"), d.get("last")
+        if isinstance(body, dict):
+            content = body.get("content", body)
+        else:
+            content = resp.text
 
-    def _http_log_req(self, method, url, kwargs):
-        """Log a HTTP request."""
-        if not self.http_debug:
-            return
+        yield resp, content, self._get_page(body)
 
-        string_parts = ["curl -g -i"]
+        while isinstance(body, dict):
+            curr, next_, last = self._get_links(body)
 
-        if not kwargs.get("verify", True):
-            string_parts.append(" --insecure")
+            # If we have curr, next and last this means that we are paginating
+            if not (all([curr, next_, last]) and curr != last):
+                break
 
-        string_parts.append(" '%s'" % url)
-        string_parts.append(" -X %s" % method)
+            # The next link already contains the query parameters
+            kwargs.pop("params", None)
+            resp, body = self._send(method, next_, kwargs)
+            yield resp, body.get("content", []), self._get_page(body)
 
-        headers = copy.deepcopy(kwargs["headers"])
-        self._redact(headers, ["Authorization"])
-        # because dict ordering changes from 2 to 3
-        keys = sorted(headers.keys())
-        for name in keys:
-            value = headers[name]
-            header = ' -H "%s: %s"' % (name, value)
-            string_parts.append(header)
+    def list_items(
+        self, url, page_size=None, max_items=None, start_page=None, **kwargs
+    ):
+        """Get a paginated listing, yielding its items one by one.
+
+        Pages are fetched lazily (see :py:meth:`.iter_pages()`), and no more
+        pages are requested once ``max_items`` items have been yielded. If
+        ``max_items`` is set but ``page_size`` is not, the page size is set to
+        ``max_items`` so that a single request is needed.
+
+        :param str url: Path or fully qualified URL of the listing.
+        :param int page_size: Number of items to request per page. If not
+                              set, the Orchestrator default is used.
+        :param int max_items: Maximum number of items to return.
+        :param int start_page: Number of the first page to get (starting at
+                               0).
+        :param kwargs: Other arguments passed to :py:meth:`.iter_pages()`.
+
+        :returns: A generator of items (i.e. dictionaries).
+        """
+        pages = self.list_pages(url, page_size, max_items, start_page, **kwargs)
+        try:
+            for content in pages:
+                for item in content:
+                    yield item
+        finally:
+            pages.close()
+
+    def list_pages(
+        self, url, page_size=None, max_items=None, start_page=None, **kwargs
+    ):
+        """Get a paginated listing, yielding the items of each page at once.
 
-        if "data" in kwargs:
-            data = json.loads(kwargs["data"])
-            string_parts.append(" -d '%s'" % json.dumps(data))
-        self._logger.debug("REQ: %s" % "".join(string_parts))
+        This method accepts the same arguments as :py:meth:`.list_items()`,
+        but yields the list of items of each page, so that callers can
+        process the items in bulk (e.g. see :py:mod:`orpy.client.columns`).
+        The last page is truncated so that at most ``max_items`` items are
+        returned.
 
-    def _http_log_resp(self, resp):
-        """Log a HTTP response."""
-        if not self.http_debug:
+        :returns: A generator of lists of items (i.e. dictionaries).
+        """
+        if max_items is not None and max_items <= 0:
             return
-
-        if resp.text and resp.status_code != 400:
+        if page_size is None:
+            page_size = max_items
+
+        params = dict(kwargs.pop("params", None) or {})
+        if page_size is not None:
+            params["size"] = page_size
+        if start_page is not None:
+            params["page"] = start_page
+        if params:
+            kwargs["params"] = params
+
+        pages = self.iter_pages(url, "GET", **kwargs)
+        count = 0
+        try:
+            for resp, content, page in pages:
+                if max_items is not None and count + len(content) >= max_items:
+                    yield content[: max_items - count]
+                    return
+                count += len(content)
+                yield content
+        finally:
+            pages.close()
+
+    def _send(self, method, url, kwargs, payload=None):
+        """Send a single HTTP request, returning the response and its JSON body."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(ratelimit.classify(method))
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request(default_probe=self._probe)
+
+        tried = []
+        while True:
+            endpoint = self.endpoints.select(exclude=tried)
+            url, rebased = self.endpoints.resolve(url, endpoint)
+
+            if self._log_http():
+                self._logger.debug(
+                    "REQ: %s",
+                    httplog.Request(
+                        method, url, kwargs, payload, self.debug_body_limit
+                    ),
+                )
+
+            span = self.tracer.start_span(
+                "HTTP %s" % method.upper(),
+                **{
+                    "http.method": method.upper(),
+                    "http.url": url,
+                    "orpy.attempt": len(tried) + 1,
+                },
+            )
+            start = time.monotonic()
+            try:
+                with profiling.phase("http", method=method.upper(), url=url) as d:
+                    resp = self.session.request(method, url, **kwargs)
+                    d["status"] = resp.status_code
+            except requests.exceptions.ConnectionError as e:
+                span.record_error(e)
+                span.end()
+                self.endpoints.mark_failed(endpoint)
+                tried.append(endpoint)
+                # Only retry non idempotent requests if they were not sent
+                can_retry = method not in ("post", "patch") or isinstance(
+                    e, requests.exceptions.ConnectTimeout
+                )
+                if self.metrics is not None:
+                    self.metrics.observe_request(
+                        method, url, "error", time.monotonic() - start
+                    )
+                if rebased and can_retry and len(tried) < len(self.endpoints):
+                    self._logger.debug("Failing over, %s is not available", url)
+                    if self.metrics is not None:
+                        self.metrics.observe_retry(method, url)
+                    continue
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(False)
+                raise
+            except (
+                requests.exceptions.RequestException,
+                exceptions.CassetteMissError,
+            ) as e:
+                span.record_error(e)
+                span.end()
+                if self.metrics is not None:
+                    self.metrics.observe_request(
+                        method, url, "error", time.monotonic() - start
+                    )
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(False)
+                raise
+            break
+
+        elapsed = time.monotonic() - start
+        self.endpoints.mark_served(endpoint)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(resp.status_code < 500, elapsed)
+        if self.metrics is not None:
+            self.metrics.observe_request(method, url, resp.status_code, elapsed)
+
+        received = self._record_transfer(resp)
+
+        with profiling.phase("decode") as details:
             try:
-                body = json.loads(resp.text)
-                self._redact(body, ["access", "token", "id"])
+                body = resp.json()
             except ValueError:
                 body = None
-        else:
-            body = None
-
-        self._logger.debug(
-            "RESP: [%(status)s] %(headers)s\nRESP BODY: " "%(text)s\n",
-            {
-                "status": resp.status_code,
-                "headers": resp.headers,
-                "text": json.dumps(body),
-            },
+            page = self._get_page(body)
+            if page:
+                details["page"] = page.get("number")
+                span.set_attribute("orpy.page", page.get("number"))
+                if self.metrics is not None:
+                    self.metrics.observe_page(method, url)
+
+        span.set_attribute("http.status_code", resp.status_code)
+        span.set_attribute(
+            "http.request_content_length", len(kwargs.get("data") or b"")
         )
+        span.set_attribute("http.response_content_length", received)
+        span.end()
+
+        if self._log_http():
+            self._logger.debug(
+                "RESP: %s", httplog.Response(resp, body, self.debug_body_limit)
+            )
+
+        if resp.status_code >= 400:
+            if body is None:
+                body = resp.text
+            raise exceptions.from_response(resp, body, url, method)
 
-    def _redact(self, target, path, text=None):
-        """Replace the value of a key in `target`.
-
-        The key can be at the top level by specifying a list with a single
-        key as the path. Nested dictionaries are also supported by passing a
-        list of keys to be navigated to find the one that should be replaced.
-        In this case the last one is the one that will be replaced.
-
-        :param dict target: the dictionary that may have a key to be redacted;
-                            modified in place
-        :param list path: a list representing the nested structure in `target`
-                          that should be redacted; modified in place
-        :param string text: optional text to use as a replacement for the
-                            redacted key. if text is not specified, the
-                            default text will be sha1 hash of the value being
-                            redacted
+        return resp, body
+
+    def _record_transfer(self, resp):
+        """Count the bytes of a response body, as received and decoded.
+
+        :returns: The number of bytes received.
         """
-        key = path.pop()
+        decoded = len(resp.content or b"")
+        if not decoded:
+            return 0
+        tell = getattr(resp.raw, "tell", None)
+        received = tell() if tell is not None else decoded
+        self.transfer_stats.record_response(received or decoded, decoded)
+        return received or decoded
+
+    def _probe(self, url=None):
+        """Check whether the Orchestrator is healthy."""
+        if url is None:
+            url = self.url
+        resp = self.session.get(
+            parse.urljoin(url, "./info"),
+            headers={"Accept": "application/json"},
+            timeout=self.timeout or 10,
+        )
+        resp.raise_for_status()
 
-        # move to the most nested dict
-        for p in path:
-            try:
-                target = target[p]
-            except KeyError:
-                return
-
-        if key in target:
-            if text:
-                target[key] = text
-            elif target[key] is not None:
-                # because in python3 byte string handling is ... ug
-                value = target[key].encode("utf-8")
-                sha1sum = hashlib.sha1(value)  # nosec
-                target[key] = "{SHA1}%s" % sha1sum.hexdigest()
+    @staticmethod
+    def _get_page(body):
+        if isinstance(body, dict) and "content" in body:
+            return body.get("page")
+        return None
+
+    @staticmethod
+    def _get_links(body):
+        d = {}
+        for link in body.get("links", []):
+            d[link["rel"]] = link["href"]
+        return d.get("self"), d.get("next"), d.get("last")
+
+    def _log_http(self):
+        """Whether HTTP requests and responses have to be logged."""
+        return self.http_debug and self._logger.isEnabledFor(logging.DEBUG)
 
     def head(self, url, **kwargs):
         """Perform a HEAD request.
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Columnar representation of Orchestrator listings.
+
+Large listings can be loaded as a :py:class:`Columns` object instead of a
+list of objects, building an array per field directly from the items of
+each page (without creating an object per item)::
+
+    cols = cli.deployments.list_columns(["status", "createdBy.subject"])
+    cols.value_counts("status")
+    table = cols.to_arrow()
+
+Nested fields are selected with dotted names. The columns are plain Python
+lists, that can be converted to NumPy arrays or to a pyarrow table when
+those packages are installed.
+"""
+
+import collections
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+from orpy import exceptions
+
+
+def _getter(field):
+    """Get a function extracting a (possibly dotted) field from an item."""
+    if "." not in field:
+        return lambda item: item.get(field)
+    path = field.split(".")
+
+    def get(item):
+        for key in path:
+            if not isinstance(item, dict):
+                return None
+            item = item.get(key)
+        return item
+
+    return get
+
+
+def _info(item):
+    # Accept orpy.client.base objects as well as dictionaries
+    return item.to_dict() if hasattr(item, "to_dict") else item
+
+
+class Columns(object):
+    """A table stored as one list of values per field."""
+
+    def __init__(self, fields=None):
+        """Initialize an empty table.
+
+        :param list fields: The fields to extract from the items. If not set,
+                            all the (top level) fields found in the items
+                            are used, in order of appearance.
+        """
+        self._fixed = fields is not None
+        self._columns = collections.OrderedDict((f, []) for f in fields or [])
+        self._getters = {f: _getter(f) for f in fields or []}
+        self._length = 0
+
+    def __len__(self):
+        """Get the number of rows."""
+        return self._length
+
+    def __contains__(self, field):
+        """Check whether there is a column for a field."""
+        return field in self._columns
+
+    def __getitem__(self, field):
+        """Get the values of a column, as a list."""
+        return self._columns[field]
+
+    @property
+    def fields(self):
+        """Get the names of the columns."""
+        return list(self._columns)
+
+    def _discover(self, items):
+        for item in items:
+            for field in item:
+                if field not in self._columns:
+                    self._columns[field] = [None] * self._length
+                    self._getters[field] = _getter(field)
+
+    def extend(self, items):
+        """Add rows to the table, building the columns in bulk.
+
+        :param list items: The items to add, as dictionaries (e.g. the
+                           content of a page of a listing) or
+                           orpy.client.base objects.
+        """
+        if not isinstance(items, list):
+            items = list(items)
+        if items and not isinstance(items[0], dict):
+            items = [_info(i) for i in items]
+        if not self._fixed:
+            self._discover(items)
+        for field, column in self._columns.items():
+            column.extend(map(self._getters[field], items))
+        self._length += len(items)
+
+    @classmethod
+    def from_pages(cls, pages, fields=None):
+        """Build a table from the pages of a listing.
+
+        :param pages: Iterable of lists of items, see
+                      :py:meth:`orpy.client.client.OrpyClient.list_pages`.
+        :param list fields: The fields to extract from the items.
+        :rtype: Columns
+        """
+        table = cls(fields)
+        for page in pages:
+            table.extend(page)
+        return table
+
+    @classmethod
+    def from_items(cls, items, fields=None, chunk_size=1000):
+        """Build a table from an iterable of items.
+
+        :param items: Iterable of dictionaries or orpy.client.base objects
+                      (e.g. the resources from
+                      :py:meth:`orpy.client.resources.Resources.list_all`).
+        :param list fields: The fields to extract from the items.
+        :param int chunk_size: Number of items added at once.
+        :rtype: Columns
+        """
+        table = cls(fields)
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                table.extend(chunk)
+                chunk = []
+        table.extend(chunk)
+        return table
+
+    def rows(self, fields=None):
+        """Iterate over the rows of the table, as tuples.
+
+        :param list fields: The columns to include. Defaults to all.
+        """
+        fields = fields or self.fields
+        return zip(*[self._columns[f] for f in fields])
+
+    def to_dict(self):
+        """Get the table as a dictionary of lists."""
+        return {f: list(c) for f, c in self._columns.items()}
+
+    def value_counts(self, field):
+        """Count the occurrences of each value of a column.
+
+        :param str field: The column.
+        :returns: The values and their counts, most common first.
+        :rtype: collections.Counter
+        """
+        column = self._columns[field]
+        try:
+            return collections.Counter(column)
+        except TypeError:
+            # Unhashable values (e.g. dictionaries)
+            return collections.Counter(repr(v) for v in column)
+
+    def to_numpy(self):
+        """Get the table as a dictionary of NumPy arrays.
+
+        Columns whose values have a common type get an array of that type,
+        the rest (e.g. with missing values) an array of objects.
+
+        :rtype: dict
+        """
+        if numpy is None:
+            raise exceptions.InvalidUsageError(
+                "The numpy package is needed to convert to NumPy arrays."
+            )
+        ret = {}
+        for field, column in self._columns.items():
+            if any(v is None or isinstance(v, (dict, list)) for v in column):
+                array = numpy.empty(len(column), dtype=object)
+                array[:] = column
+            else:
+                array = numpy.asarray(column)
+            ret[field] = array
+        return ret
+
+    def to_arrow(self):
+        """Get the table as a pyarrow Table.
+
+        :rtype: pyarrow.Table
+        """
+        if pyarrow is None:
+            raise exceptions.InvalidUsageError(
+                "The pyarrow package is needed to convert to an Arrow table."
+            )
+        return pyarrow.table(collections.OrderedDict(self._columns))
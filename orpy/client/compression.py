@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compression of the requests and responses exchanged with the Orchestrator."""
+
+import gzip
+import threading
+
+from requests.packages.urllib3 import util
+
+# Encodings that can be decoded: gzip and deflate are always available, brotli
+# (br) and zstd depend on the installed modules. This is the value of
+# requests.utils.DEFAULT_ACCEPT_ENCODING, only available since requests 2.26.
+ACCEPT_ENCODING = ", ".join(
+    util.make_headers(accept_encoding=True)["accept-encoding"].split(",")
+)
+
+
+def compress(data, level=6):
+    """Compress a request body with gzip.
+
+    :param data: The data to compress, either bytes or text.
+    :param int level: The compression level, from 1 (fastest) to 9.
+    :returns: The compressed data.
+    :rtype: bytes
+    """
+    if not isinstance(data, bytes):
+        data = data.encode("utf-8")
+    return gzip.compress(data, compresslevel=level)
+
+
+class TransferStats(object):
+    """Count the bytes transferred with and without compression.
+
+    For the requests, ``sent`` is the size of the bodies as sent over the
+    wire and ``sent_uncompressed`` their size before compression. For the
+    responses, ``received`` is the size of the bodies as received over the
+    wire (i.e. compressed) and ``received_uncompressed`` their decoded size.
+    """
+
+    def __init__(self):
+        """Initialize the counters."""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Set all the counters to zero."""
+        with self._lock:
+            self.requests = 0
+            self.sent = 0
+            self.sent_uncompressed = 0
+            self.responses = 0
+            self.received = 0
+            self.received_uncompressed = 0
+
+    def record_request(self, sent, uncompressed=None):
+        """Record a request body.
+
+        :param int sent: Bytes sent over the wire.
+        :param int uncompressed: Bytes before compression, if compressed.
+        """
+        with self._lock:
+            self.requests += 1
+            self.sent += sent
+            self.sent_uncompressed += sent if uncompressed is None else uncompressed
+
+    def record_response(self, received, uncompressed):
+        """Record a response body.
+
+        :param int received: Bytes received over the wire.
+        :param int uncompressed: Bytes after decoding the body.
+        """
+        with self._lock:
+            self.responses += 1
+            self.received += received
+            self.received_uncompressed += uncompressed
+
+    @property
+    def saved(self):
+        """Get the number of bytes saved by compression."""
+        sent = self.sent_uncompressed - self.sent
+        return sent + self.received_uncompressed - self.received
+
+    def to_dict(self):
+        """Get the counters as a dictionary."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "sent": self.sent,
+                "sent_uncompressed": self.sent_uncompressed,
+                "responses": self.responses,
+                "received": self.received,
+                "received_uncompressed": self.received_uncompressed,
+                "saved": self.saved,
+            }
@@ -17,6 +17,7 @@
 """This module contains the client dealing with PaaS Orchestrator configuration."""
 
 from orpy.client import base
+from orpy.client import tracing
 from orpy import exceptions
 
 
@@ -30,6 +31,7 @@ class Config(object):
         """
         self.client = client
 
+    @tracing.traced("config.get")
     def get(self, **kwargs):
         """Get Configurted endpoints for the orchestrator.
 
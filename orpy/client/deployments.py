@@ -16,7 +16,26 @@
 
 """This module contains the client dealing with PaaS Orchestrator deployments."""
 
+import collections
+import json
+import time
+
 from orpy.client import base
+from orpy.client import changes
+from orpy.client import columns
+from orpy.client import tosca
+from orpy.client import tracing
+from orpy import exceptions
+from orpy import profiling
+
+CREATED = "created"
+DELETED = "deleted"
+STATUS_CHANGED = "status_changed"
+
+# Fields counted by default in a deployment summary
+SUMMARY_FIELDS = ("status", "cloudProviderName", "task")
+# Length of the creation time prefix used to bucket deployments per period
+_PERIODS = {"year": 4, "month": 7, "day": 10}
 
 
 class Deployments(object):
@@ -28,18 +47,258 @@ class Deployments(object):
         :params client: An instance of OrpyClient.
         """
         self.client = client
+        self._updates = None
+        self._record_updates = False
+
+    @property
+    def updates(self):
+        """Records of the updates done from this host.
+
+        Updates are only recorded when ``skip_unchanged`` is used, unless a
+        store is explicitly assigned, in which case every update is recorded
+        in it.
+
+        :rtype: orpy.client.changes.UpdateStore
+        """
+        if self._updates is None:
+            self._updates = changes.UpdateStore(self.client.urls[0])
+        return self._updates
 
-    def list(self, **kwargs):
+    @updates.setter
+    def updates(self, store):
+        self._updates = store
+        self._record_updates = store is not None
+
+    @tracing.traced("deployments.list")
+    def list(self, page_size=None, max_items=None, start_page=None, **kwargs):
         """List existing deployments.
 
+        By default all the pages of the listing are fetched, with the page
+        size chosen by the Orchestrator. Use ``page_size`` to get larger
+        pages (i.e. less round trips) for big inventories, or ``max_items``
+        to stop as soon as enough deployments have been fetched.
+
+        :param int page_size: Number of deployments to request per page.
+        :param int max_items: Maximum number of deployments to return.
+        :param int start_page: Number of the first page to get (starting at
+                               0).
         :param kwargs: Other arguments passed to the request client.
 
         :return: List of orpy.client.base.Deployment
         :rtype: list
         """
-        resp, results = self.client.get("./deployments", **kwargs)
-        return [base.Deployment(data) for data in results]
+        if page_size is None and max_items is None and start_page is None:
+            resp, results = self.client.get("./deployments", **kwargs)
+        else:
+            results = self.client.list_items(
+                "./deployments",
+                page_size=page_size,
+                max_items=max_items,
+                start_page=start_page,
+                **kwargs,
+            )
+        with profiling.phase("models"):
+            return [base.Deployment(data) for data in results]
+
+    @tracing.traced("deployments.list_columns")
+    def list_columns(
+        self, fields=None, page_size=None, max_items=None, start_page=None, **kwargs
+    ):
+        """List existing deployments, as a table of columns.
+
+        The columns are built directly from the pages of the listing, without
+        creating an orpy.client.base.Deployment object per deployment, which
+        is much faster for big inventories.
+
+        :param list fields: The fields to get (nested fields can be given
+                            with dots, e.g. ``createdBy.subject``). By
+                            default, all the top level fields are included.
+        :param int page_size: Number of deployments to request per page.
+        :param int max_items: Maximum number of deployments to return.
+        :param int start_page: Number of the first page to get (starting at
+                               0).
+        :param kwargs: Other arguments passed to the request client.
+
+        :rtype: orpy.client.columns.Columns
+        """
+        pages = self.client.list_pages(
+            "./deployments",
+            page_size=page_size,
+            max_items=max_items,
+            start_page=start_page,
+            **kwargs,
+        )
+        with profiling.phase("models"):
+            return columns.Columns.from_pages(pages, fields)
+
+    @tracing.traced("deployments.count")
+    def count(self, **kwargs):
+        """Count the existing deployments.
+
+        A single page with one deployment is requested, taking the total from
+        the pagination metadata. If the Orchestrator does not return it, the
+        whole listing is walked.
+
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: The number of deployments.
+        :rtype: int
+        """
+        params = dict(kwargs.pop("params", None) or {}, size=1)
+        pages = self.client.iter_pages("./deployments", "GET", params=params, **kwargs)
+        try:
+            resp, content, page = next(pages)
+        finally:
+            pages.close()
+        if page is None:
+            # Not paginated, we already have everything
+            return len(content)
+        if page.get("totalElements") is not None:
+            return page["totalElements"]
+        return sum(1 for _ in self.client.list_items("./deployments", **kwargs))
+
+    @tracing.traced("deployments.summary")
+    def summary(self, fields=SUMMARY_FIELDS, period="month", page_size=None, **kwargs):
+        """Summarize the existing deployments, in a single streaming pass.
+
+        Deployments are counted per value of each of the given fields, and
+        per creation period, as the pages are received. No
+        orpy.client.base.Deployment objects are built and pages are discarded
+        once counted, so memory does not depend on the number of deployments.
+
+        :param fields: Deployment fields to count the values of. Nested
+                       fields can be given with dots (e.g.
+                       ``createdBy.subject``). Nested values are counted
+                       as JSON documents.
+        :param str period: Period to build the histogram of creation times:
+                           ``year``, ``month``, ``day`` or None to skip it.
+        :param int page_size: Number of deployments to request per page.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: A dictionary with the ``total`` number of deployments, the
+                 ``counts`` per value of each field and the ``created``
+                 histogram (per period, sorted).
+        :rtype: dict
+        """
+        if period is not None and period not in _PERIODS:
+            raise exceptions.InvalidUsageError(
+                "Invalid period %s, must be one of %s."
+                % (period, ", ".join(sorted(_PERIODS)))
+            )
+        if page_size is not None:
+            params = dict(kwargs.pop("params", None) or {}, size=page_size)
+            kwargs["params"] = params
 
+        paths = [(field, field.split(".")) for field in fields]
+        counts = dict((field, collections.Counter()) for field in fields)
+        created = collections.Counter()
+        total = 0
+        for resp, content, page in self.client.iter_pages(
+            "./deployments", "GET", **kwargs
+        ):
+            for d in content:
+                total += 1
+                for field, path in paths:
+                    value = d
+                    for key in path:
+                        value = value.get(key) if isinstance(value, dict) else None
+                    if isinstance(value, (dict, list)):
+                        # Nested values (e.g. createdBy) are not hashable
+                        value = json.dumps(value, sort_keys=True)
+                    counts[field][value] += 1
+                if period is not None:
+                    created[(d.get("creationTime") or "")[: _PERIODS[period]]] += 1
+
+        return {
+            "total": total,
+            "counts": dict((field, dict(c)) for field, c in counts.items()),
+            "created": collections.OrderedDict(sorted(created.items())),
+        }
+
+    def watch(self, interval=30, initial=False, polls=None, **kwargs):
+        """Watch deployments, yielding only their state transitions.
+
+        The deployment listing is polled every ``interval`` seconds and
+        compared with the previous one, using an index keyed by UUID that only
+        keeps each deployment status. An event is yielded for each deployment
+        that was created, deleted or changed its status between polls. If the
+        listing fits in one page, subsequent polls are conditional requests
+        (using the ``ETag`` returned by the Orchestrator, if any), so that an
+        unchanged listing is not transferred again.
+
+        :param int interval: Seconds to wait between polls.
+        :param bool initial: Whether to yield a "created" event for every
+                             deployment found in the first poll.
+        :param int polls: Number of polls to do before returning. If not set,
+                          the deployments are watched forever.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: A generator of orpy.client.base.DeploymentEvent, with the
+                 ``event`` attribute set to one of ``created``, ``deleted``
+                 or ``status_changed``.
+        :rtype: generator
+        """
+        snapshot = None
+        etag = None
+        count = 0
+        while True:
+            current, data, etag = self._poll(etag, **kwargs)
+            if current is not None:
+                if snapshot is None and not initial:
+                    snapshot = current
+                for event in self._diff(snapshot or {}, current, data):
+                    yield event
+                snapshot = current
+
+            count += 1
+            if polls is not None and count >= polls:
+                return
+            time.sleep(interval)
+
+    def _poll(self, etag, **kwargs):
+        kwargs["headers"] = dict(kwargs.get("headers", {}))
+        if etag:
+            kwargs["headers"]["If-None-Match"] = etag
+
+        current, data = {}, {}
+        new_etag = None
+        for resp, content, page in self.client.iter_pages(
+            "./deployments", "GET", **kwargs
+        ):
+            if resp.status_code == 304:
+                return None, None, etag
+            if (page or {}).get("totalPages", 1) <= 1:
+                new_etag = resp.headers.get("ETag")
+            for d in content:
+                current[d["uuid"]] = d.get("status")
+                data[d["uuid"]] = d
+        return current, data, new_etag
+
+    @staticmethod
+    def _diff(previous, current, data):
+        for uuid, status in current.items():
+            if uuid not in previous:
+                event = {"event": CREATED, "previousStatus": None}
+            elif previous[uuid] != status:
+                event = {"event": STATUS_CHANGED, "previousStatus": previous[uuid]}
+            else:
+                continue
+            event.update({"uuid": uuid, "status": status, "deployment": data[uuid]})
+            yield base.DeploymentEvent(event)
+
+        for uuid, status in previous.items():
+            if uuid not in current:
+                yield base.DeploymentEvent(
+                    {
+                        "event": DELETED,
+                        "uuid": uuid,
+                        "status": None,
+                        "previousStatus": status,
+                        "deployment": None,
+                    }
+                )
+
+    @tracing.traced("deployments.show")
     def show(self, uuid, **kwargs):
         """Show details about a deployment.
 
@@ -52,6 +311,7 @@ class Deployments(object):
         resp, result = self.client.get("./deployments/%s" % uuid, **kwargs)
         return base.Deployment(result)
 
+    @tracing.traced("deployments.delete")
     def delete(self, uuid, **kwargs):
         """Delete a deployment.
 
@@ -64,6 +324,7 @@ class Deployments(object):
         resp, body = self.client.delete("./deployments/%s" % uuid, **kwargs)
         return
 
+    @tracing.traced("deployments.get_template")
     def get_template(self, uuid, **kwargs):
         """Get the TOSCA template of a deployment.
 
@@ -77,6 +338,7 @@ class Deployments(object):
         info = {"template": result}
         return base.TOSCATemplate(info)
 
+    @tracing.traced("deployments.create")
     def create(
         self,
         template,
@@ -84,6 +346,7 @@ class Deployments(object):
         max_providers_retry=None,
         keep_last_attemp=True,
         parameters=None,
+        validate=False,
         **kwargs,
     ):
         """Create a deployment.
@@ -93,11 +356,21 @@ class Deployments(object):
         :param int max_providers_retry: Maximum number of providers to retry.
         :param bool keep_last_attemp: Whether to keep the allocated resources
                                       in case of failure.
+        :param dict parameters: The input parameters of the template.
+        :param bool validate: Whether to check the template and parameters
+                              locally (see :py:mod:`orpy.client.tosca`)
+                              before sending them to the Orchestrator.
         :param kwargs: Other arguments passed to the request client.
 
         :return: The created deployment
         :rtype: orpy.client.base.Deployment
+        :raises orpy.exceptions.TemplateValidationError: If the template or
+                                                         the parameters are
+                                                         not valid.
         """
+        if validate:
+            tosca.validate(template, parameters)
+
         json = {
             "template": template,
             "keepLastAttemp": keep_last_attemp,
@@ -108,9 +381,10 @@ class Deployments(object):
         if max_providers_retry:
             json["maxProvidersRetry"] = max_providers_retry
 
-        resp, result = self.client.post("./deployments/", json=json, **kwargs)
+        resp, result = self.client.post("./deployments/", payload=json, **kwargs)
         return base.Deployment(result)
 
+    @tracing.traced("deployments.update")
     def update(
         self,
         uuid,
@@ -119,21 +393,49 @@ class Deployments(object):
         max_providers_retry=None,
         keep_last_attemp=True,
         parameters=None,
+        validate=False,
+        skip_unchanged=False,
         **kwargs,
     ):
         """Update a deployment.
 
+        If ``skip_unchanged`` is set, the update is compared first with the
+        current deployment (see :py:meth:`diff`), and nothing is sent if it
+        would not change anything. The update is then recorded (template and
+        parameters, in a file only readable by the user), so that the next
+        ones can be compared with it. Other updates are not recorded (unless
+        a store is assigned to :py:attr:`updates`), and discard the previous
+        record of the deployment.
+
         :param str uuid: The UUID of the deployment.
         :param str template: The TOSCA template to use.
         :param str callback_url: The orchestrator callback url.
         :param int max_providers_retry: Maximum number of providers to retry.
         :param bool keep_last_attemp: Whether to keep the allocated resources
                                       in case of failure.
+        :param dict parameters: The input parameters of the template.
+        :param bool validate: Whether to check the template and parameters
+                              locally (see :py:mod:`orpy.client.tosca`)
+                              before sending them to the Orchestrator.
+        :param bool skip_unchanged: Whether to skip updates that would not
+                                    change the deployment.
         :param kwargs: Other arguments passed to the request client.
 
-        :return: The updated deployment
+        :return: The updated deployment, or the current one if the update
+                 was skipped.
         :rtype: orpy.client.base.Deployment
+        :raises orpy.exceptions.TemplateValidationError: If the template or
+                                                         the parameters are
+                                                         not valid.
         """
+        if validate:
+            tosca.validate(template, parameters)
+
+        if skip_unchanged:
+            diff = self.diff(uuid, template, parameters, **kwargs)
+            if not diff:
+                return diff.deployment
+
         json = {
             "template": template,
             "keepLastAttemp": keep_last_attemp,
@@ -144,5 +446,53 @@ class Deployments(object):
         if max_providers_retry:
             json["maxProvidersRetry"] = max_providers_retry
 
-        resp, result = self.client.put("./deployments/%s" % uuid, json=json, **kwargs)
+        resp, result = self.client.put(
+            "./deployments/%s" % uuid, payload=json, **kwargs
+        )
+        if skip_unchanged or self._record_updates:
+            update_time = result.get("updateTime") if isinstance(result, dict) else None
+            self.updates.record_update(uuid, template, parameters, update_time)
+        else:
+            self.updates.forget(uuid)
         return base.Deployment(result)
+
+    @tracing.traced("deployments.diff")
+    def diff(self, uuid, template, parameters=None, **kwargs):
+        """Get the changes that an update would apply to a deployment.
+
+        The current template is fetched from the Orchestrator, unless the
+        deployment has not changed since it was recorded. The current
+        parameters are only known if the deployment was last updated from
+        this host with ``skip_unchanged``, and it has not been modified since
+        then (i.e. its update time is the one returned by that update, or the
+        one set when the Orchestrator completed it, see
+        :py:mod:`orpy.client.changes`).
+
+        :param str uuid: The UUID of the deployment.
+        :param str template: The new TOSCA template.
+        :param dict parameters: The new input parameters.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: The changes, that evaluate to False if there are none.
+        :rtype: orpy.client.changes.Changes
+        """
+        deployment = self.show(uuid, **kwargs)
+        update_time = getattr(deployment, "updateTime", None)
+
+        current = self.updates.template(uuid, update_time)
+        if current is None:
+            current = changes.normalize_template(
+                self.get_template(uuid, **kwargs).template
+            )
+            self.updates.record_template(uuid, current, update_time)
+
+        ret = changes.compare(
+            current,
+            self.updates.parameters(
+                uuid, current, update_time, getattr(deployment, "status", None)
+            ),
+            template,
+            parameters,
+        )
+        ret.deployment = deployment
+        return ret
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Selection and failover of redundant Orchestrator endpoints."""
+
+import threading
+import time
+
+from six.moves.urllib import parse
+
+
+class Endpoint(object):
+    """An Orchestrator endpoint and its health information."""
+
+    def __init__(self, url):
+        """Initialize the endpoint.
+
+        :param str url: The base URL of the endpoint.
+        """
+        self.url = url
+        self.healthy = True
+        self.latency = None
+        self.served = 0
+        self.failures = 0
+
+    def to_dict(self):
+        """Get the endpoint information as a dictionary."""
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "latency": self.latency,
+            "served": self.served,
+            "failures": self.failures,
+        }
+
+
+class EndpointPool(object):
+    """A pool of redundant Orchestrator endpoints.
+
+    Endpoints are health checked with the probe given by the client (a GET on
+    the ``./info`` endpoint, as done by ``Info.get()``) at most every
+    ``check_interval`` seconds, measuring their latency. Requests are routed
+    to the healthy endpoint with the lowest latency, and endpoints that fail
+    with connection errors are marked as unhealthy until the next check.
+
+    With a single endpoint no health checks are done at all.
+    """
+
+    def __init__(self, urls, probe=None, check_interval=60):
+        """Initialize the pool.
+
+        :param list urls: Base URLs of the endpoints, in order of preference.
+        :param probe: Callable that gets an endpoint URL and raises an
+                      exception if it is not healthy.
+        :param float check_interval: Seconds between health checks.
+        """
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.probe = probe
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checking = False
+        self._last_check = None
+
+    def __len__(self):
+        """Get the number of endpoints in the pool."""
+        return len(self.endpoints)
+
+    @property
+    def primary(self):
+        """Get the first (preferred) endpoint of the pool."""
+        return self.endpoints[0]
+
+    def _needs_check(self):
+        if len(self.endpoints) < 2 or self.probe is None:
+            return False
+        with self._lock:
+            if self._checking:
+                return False
+            now = time.monotonic()
+            if self._last_check is not None:
+                if now - self._last_check < self.check_interval:
+                    return False
+            self._checking = True
+            self._last_check = now
+            return True
+
+    def check(self):
+        """Health check all the endpoints, measuring their latency."""
+        for endpoint in self.endpoints:
+            start = time.monotonic()
+            try:
+                self.probe(endpoint.url)
+            except Exception:
+                endpoint.healthy = False
+                endpoint.failures += 1
+            else:
+                endpoint.healthy = True
+                endpoint.latency = time.monotonic() - start
+
+    def select(self, exclude=()):
+        """Select the best endpoint to send a request to.
+
+        :param exclude: Endpoints that must not be selected.
+        :returns: The healthy endpoint with the lowest latency or, if none is
+                  healthy, the first one that is not excluded. None if all
+                  the endpoints are excluded.
+        :rtype: Endpoint
+        """
+        if self._needs_check():
+            try:
+                self.check()
+            finally:
+                self._checking = False
+
+        candidates = [e for e in self.endpoints if e not in exclude]
+        if not candidates:
+            return None
+        healthy = [e for e in candidates if e.healthy]
+        if not healthy:
+            return candidates[0]
+        # Endpoints without a latency measurement keep their order of
+        # preference, after the measured ones.
+        return min(
+            healthy,
+            key=lambda e: (e.latency is None, e.latency or 0),
+        )
+
+    def resolve(self, url, endpoint):
+        """Get the full URL of a request for a given endpoint.
+
+        Relative URLs are joined with the endpoint URL, and absolute URLs
+        pointing to any of the endpoints of the pool (e.g. pagination links)
+        are rebased on the given endpoint. Other absolute URLs are returned
+        untouched.
+
+        :param str url: The (relative or absolute) URL of the request.
+        :param Endpoint endpoint: The endpoint to use.
+        :returns: The full URL, and whether it targets the given endpoint.
+        :rtype: tuple
+        """
+        if not parse.urlparse(url).scheme:
+            return parse.urljoin(endpoint.url, url), True
+        for e in self.endpoints:
+            if url.startswith(e.url):
+                return url.replace(e.url, endpoint.url, 1), True
+        return url, False
+
+    def mark_failed(self, endpoint):
+        """Mark an endpoint as unhealthy."""
+        with self._lock:
+            endpoint.healthy = False
+            endpoint.failures += 1
+
+    def mark_served(self, endpoint):
+        """Record that an endpoint served a request."""
+        with self._lock:
+            endpoint.served += 1
+
+    def stats(self):
+        """Get the health information and counters of all the endpoints.
+
+        :rtype: list of dict
+        """
+        return [e.to_dict() for e in self.endpoints]
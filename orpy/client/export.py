@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Streaming export of the Orchestrator inventory.
+
+Deployments are written page by page as they are received, so memory only
+depends on the page size and not on the size of the inventory::
+
+    exporter = export.Exporter(cli, resources=True)
+    with export.get_writer("csv", "inventory.csv.gz", "gzip") as writer:
+        exporter.write(writer)
+
+Nested values (e.g. ``createdBy`` or the resources of each deployment) are
+written as JSON documents in CSV and Parquet files.
+"""
+
+import abc
+import bz2
+import collections
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import sys
+
+try:
+    import pyarrow
+    from pyarrow import parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+    parquet = None
+
+from orpy.client import columns
+from orpy import exceptions
+
+CSV = "csv"
+JSON_LINES = "jsonl"
+PARQUET = "parquet"
+FORMATS = (CSV, JSON_LINES, PARQUET)
+
+COMPRESSIONS = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+# Codecs supported by pyarrow when writing Parquet files
+PARQUET_COMPRESSIONS = ("snappy", "gzip", "brotli", "zstd", "lz4", "none")
+
+# Columns of an empty export if they are not given, i.e. the fields of the
+# deployments returned by the Orchestrator
+DEFAULT_FIELDS = (
+    "uuid",
+    "creationTime",
+    "updateTime",
+    "physicalId",
+    "status",
+    "statusReason",
+    "task",
+    "cloudProviderName",
+    "cloudProviderEndpoint",
+    "createdBy",
+)
+
+# Fields not exported unless explicitly requested
+LINKS = "links"
+OUTPUTS = "outputs"
+RESOURCES = "resources"
+
+_EXTENSIONS = {
+    ".csv": CSV,
+    ".jsonl": JSON_LINES,
+    ".ndjson": JSON_LINES,
+    ".json": JSON_LINES,
+    ".parquet": PARQUET,
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+}
+
+
+def guess_format(path):
+    """Guess the format and compression of a file from its extensions.
+
+    :param str path: The file name, e.g. ``inventory.csv.gz``.
+    :returns: The format (or None) and compression (or None) of the file.
+    :rtype: tuple
+    """
+    fmt = compression = None
+    root, ext = os.path.splitext(path or "")
+    if _EXTENSIONS.get(ext.lower()) in COMPRESSIONS:
+        compression = _EXTENSIONS[ext.lower()]
+        root, ext = os.path.splitext(root)
+    if _EXTENSIONS.get(ext.lower()) in FORMATS:
+        fmt = _EXTENSIONS[ext.lower()]
+    return fmt, compression
+
+
+def open_output(path=None, compression=None, stdout=None):
+    """Open a text stream to write an export to.
+
+    :param str path: The file to write to. If not set (or ``-``), the export
+                     is written to the standard output.
+    :param str compression: One of ``gzip``, ``bz2`` or ``xz``, or None.
+    :param stdout: The standard output stream (sys.stdout if not set).
+    :returns: A file object, that does not close the standard output.
+    """
+    if compression is not None and compression not in COMPRESSIONS:
+        raise exceptions.InvalidUsageError(
+            "Unknown compression %s, use one of: %s"
+            % (compression, ", ".join(sorted(COMPRESSIONS)))
+        )
+    if path in (None, "-"):
+        stdout = stdout if stdout is not None else sys.stdout
+        if compression is None:
+            return _Unclosed(stdout)
+        # Compressors do not close the file objects they are given
+        return COMPRESSIONS[compression](
+            getattr(stdout, "buffer", stdout), "wt", encoding="utf-8", newline=""
+        )
+    if compression is None:
+        return io.open(path, "w", encoding="utf-8", newline="")
+    return COMPRESSIONS[compression](path, "wt", encoding="utf-8", newline="")
+
+
+class _Unclosed(object):
+    """Wrap a stream so that it is flushed, but not closed."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        return self.stream.write(data)
+
+    def close(self):
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _serialize(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return value
+
+
+class Writer(object, metaclass=abc.ABCMeta):
+    """Base class of the export formats.
+
+    Tables are written with :py:meth:`write` as they are received. The
+    columns of the first table are used for the whole export.
+    """
+
+    def __init__(self):
+        """Initialize the writer."""
+        self.fields = None
+        self.count = 0
+
+    def write(self, table):
+        """Write a table.
+
+        :param orpy.client.columns.Columns table: The rows to write.
+        """
+        if self.fields is None:
+            self.fields = table.fields
+        self._write(table)
+        self.count += len(table)
+
+    @abc.abstractmethod
+    def _write(self, table):
+        """Write the rows of a table."""
+
+    def close(self):
+        """Finish the export."""
+
+    def __enter__(self):
+        """Use the writer as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Finish the export."""
+        self.close()
+
+
+class _StreamWriter(Writer):
+    def close(self):
+        """Finish the export, closing the stream."""
+        self.stream.close()
+
+
+class CSVWriter(_StreamWriter):
+    """Write CSV, with a header row."""
+
+    def __init__(self, stream):
+        """Initialize the writer.
+
+        :param stream: The text stream to write to, closed with the writer
+                       (see :py:func:`open_output`).
+        """
+        super(CSVWriter, self).__init__()
+        self.stream = stream
+        self._writer = csv.writer(stream)
+        self._header = False
+
+    def _write(self, table):
+        if not self._header:
+            self._writer.writerow(self.fields)
+            self._header = True
+        self._writer.writerows(
+            ["" if v is None else _serialize(v) for v in row]
+            for row in table.rows(self.fields)
+        )
+
+
+class JSONLinesWriter(_StreamWriter):
+    """Write a JSON document per row, one per line."""
+
+    def __init__(self, stream):
+        """Initialize the writer.
+
+        :param stream: The text stream to write to, closed with the writer
+                       (see :py:func:`open_output`).
+        """
+        super(JSONLinesWriter, self).__init__()
+        self.stream = stream
+
+    def _write(self, table):
+        lines = (
+            json.dumps(dict(zip(self.fields, row)), default=str) + "\n"
+            for row in table.rows(self.fields)
+        )
+        self.stream.write("".join(lines))
+
+
+class ParquetWriter(Writer):
+    """Write a Parquet file, with a row group per table.
+
+    As in CSV files, all the columns are written as strings (nested values
+    as JSON documents), so that the schema does not depend on the values
+    found in the first table.
+    """
+
+    def __init__(self, path, compression="snappy"):
+        """Initialize the writer.
+
+        :param str path: The file to write to.
+        :param str compression: The Parquet compression codec, or None.
+        """
+        if parquet is None:
+            raise exceptions.InvalidUsageError(
+                "The pyarrow package is needed to write Parquet files."
+            )
+        super(ParquetWriter, self).__init__()
+        self.path = path
+        self.compression = compression or "none"
+        self._writer = None
+
+    def _write(self, table):
+        if self._writer is None:
+            schema = pyarrow.schema([(f, pyarrow.string()) for f in self.fields])
+            self._writer = parquet.ParquetWriter(
+                self.path, schema, compression=self.compression
+            )
+        data = collections.OrderedDict(
+            (f, [None if v is None else str(_serialize(v)) for v in table[f]])
+            for f in self.fields
+        )
+        self._writer.write_table(pyarrow.table(data, schema=self._writer.schema))
+
+    def close(self):
+        """Finish the export, writing the footer of the file."""
+        if self._writer is not None:
+            self._writer.close()
+
+
+def get_writer(fmt, path=None, compression=None, stdout=None):
+    """Get the writer of an export format.
+
+    :param str fmt: One of ``csv``, ``jsonl`` or ``parquet``.
+    :param str path: The file to write to, or None for the standard output
+                     (not supported for Parquet).
+    :param str compression: The compression to use. For Parquet files this
+                            is the codec (``snappy`` if not set).
+    :param stdout: The standard output stream (sys.stdout if not set).
+    :returns: The writer, that must be closed once done.
+    :rtype: Writer
+    """
+    if fmt == PARQUET:
+        if path in (None, "-"):
+            raise exceptions.InvalidUsageError(
+                "Parquet files cannot be written to the standard output."
+            )
+        if compression is not None and compression not in PARQUET_COMPRESSIONS:
+            raise exceptions.InvalidUsageError(
+                "Unknown Parquet compression %s, use one of: %s"
+                % (compression, ", ".join(PARQUET_COMPRESSIONS))
+            )
+        return ParquetWriter(path, compression=compression or "snappy")
+    if fmt not in (CSV, JSON_LINES):
+        raise exceptions.InvalidUsageError(
+            "Unknown export format %s, use one of: %s" % (fmt, ", ".join(FORMATS))
+        )
+    stream = open_output(path, compression, stdout=stdout)
+    return (CSVWriter if fmt == CSV else JSONLinesWriter)(stream)
+
+
+class Exporter(object):
+    """Export the deployments of an Orchestrator, page by page."""
+
+    def __init__(
+        self,
+        client,
+        fields=None,
+        resources=False,
+        outputs=False,
+        page_size=None,
+        max_items=None,
+        start_page=None,
+        concurrency=8,
+    ):
+        """Initialize the exporter.
+
+        :param client: An instance of OrpyClient.
+        :param list fields: The deployment fields to export (nested fields
+                            can be given with dots, e.g.
+                            ``createdBy.subject``). By default, all the top
+                            level fields found in the first page, except the
+                            links and the outputs (or
+                            :py:data:`DEFAULT_FIELDS` if there are no
+                            deployments).
+        :param bool resources: Add the resources of each deployment, in the
+                               ``resources`` field.
+        :param bool outputs: Export the outputs of the deployments too.
+        :param int page_size: Number of deployments to request per page.
+        :param int max_items: Maximum number of deployments to export.
+        :param int start_page: Number of the first page to get (starting at
+                               0).
+        :param int concurrency: Number of deployments to get the resources
+                                of concurrently.
+        """
+        self.client = client
+        self.resources = resources
+        self.outputs = outputs
+        self.fields = self._extra_fields(fields) if fields else None
+        self.page_size = page_size
+        self.max_items = max_items
+        self.start_page = start_page
+        self.concurrency = concurrency
+
+    def _default_fields(self, page):
+        fields = []
+        for item in page:
+            for field in item:
+                if field not in fields:
+                    fields.append(field)
+        excluded = (LINKS, RESOURCES) + (() if self.outputs else (OUTPUTS,))
+        return [f for f in fields if f not in excluded]
+
+    def _extra_fields(self, fields):
+        fields = list(fields)
+        if self.outputs and OUTPUTS not in fields:
+            fields.append(OUTPUTS)
+        if self.resources and RESOURCES not in fields:
+            fields.append(RESOURCES)
+        return fields
+
+    def _add_resources(self, page):
+        found = collections.defaultdict(list)
+        uuids = [d["uuid"] for d in page]
+        for resource in self.client.resources.list_all(
+            uuids, concurrency=self.concurrency
+        ):
+            info = resource.to_dict()
+            info.pop("deploymentUuid", None)
+            info.pop(LINKS, None)
+            found[resource.deploymentUuid].append(info)
+        for d in page:
+            d[RESOURCES] = found.get(d["uuid"], [])
+
+    def tables(self):
+        """Get the deployments, one table per page.
+
+        :returns: A generator of orpy.client.columns.Columns.
+        """
+        pages = self.client.list_pages(
+            "./deployments",
+            page_size=self.page_size,
+            max_items=self.max_items,
+            start_page=self.start_page,
+        )
+        try:
+            for page in pages:
+                if self.fields is None and page:
+                    self.fields = self._extra_fields(self._default_fields(page))
+                if self.resources:
+                    self._add_resources(page)
+                if page:
+                    yield columns.Columns.from_pages([page], self.fields)
+        finally:
+            pages.close()
+
+    def write(self, writer):
+        """Export the deployments.
+
+        :param Writer writer: The writer of the export format.
+        :returns: The number of deployments exported.
+        :rtype: int
+        """
+        for table in self.tables():
+            writer.write(table)
+        if not writer.count:
+            # Write the header (or the schema) of an empty export
+            if self.fields is None:
+                self.fields = self._extra_fields(DEFAULT_FIELDS)
+            writer.write(columns.Columns(self.fields))
+        return writer.count
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Dependency graph of the resources of a deployment."""
+
+import collections
+
+from orpy import exceptions
+
+
+class ResourceGraph(object):
+    """Dependency graph of the resources of a deployment.
+
+    The graph is built from the ``requiredBy`` attribute of each resource: if
+    resource A is required by resource B, then B depends on A. Resources can
+    be looked up either by their UUID or by their TOSCA node name
+    (``toscaNodeName``), taking into account that a node name may correspond
+    to several resources (e.g. when a node is scaled).
+
+    All the adjacency indexes are built once, so that queries do not need to
+    scan the list of resources.
+    """
+
+    def __init__(self, resources):
+        """Build the graph.
+
+        :param resources: Iterable of orpy.client.base.Resource objects.
+        """
+        self._resources = collections.OrderedDict()
+        self._by_name = collections.defaultdict(list)
+        self._dependents = collections.OrderedDict()
+        self._requirements = collections.OrderedDict()
+
+        for resource in resources:
+            self._resources[resource.uuid] = resource
+            self._by_name[resource.get("toscaNodeName")].append(resource.uuid)
+            self._dependents[resource.uuid] = []
+            self._requirements[resource.uuid] = []
+
+        for uuid, resource in self._resources.items():
+            for ref in resource.get("requiredBy") or []:
+                for dependent in self._resolve(ref):
+                    if dependent not in self._dependents[uuid]:
+                        self._dependents[uuid].append(dependent)
+                        self._requirements[dependent].append(uuid)
+
+    def _resolve(self, key):
+        if key in self._resources:
+            return [key]
+        return self._by_name.get(key, [])
+
+    def _get_uuids(self, key):
+        uuids = self._resolve(key)
+        if not uuids:
+            raise KeyError(key)
+        return uuids
+
+    def __len__(self):
+        """Return the number of resources in the graph."""
+        return len(self._resources)
+
+    def __iter__(self):
+        """Iterate over the resources of the graph."""
+        return iter(self._resources.values())
+
+    def __contains__(self, key):
+        """Return whether a UUID or node name is in the graph."""
+        return bool(self._resolve(key))
+
+    def get(self, key):
+        """Get the resources for a resource UUID or a TOSCA node name.
+
+        :param str key: Resource UUID or TOSCA node name.
+        :return: List of orpy.client.base.Resource
+        :rtype: list
+        """
+        return [self._resources[uuid] for uuid in self._resolve(key)]
+
+    def roots(self):
+        """Get the resources that do not depend on any other resource.
+
+        :return: List of orpy.client.base.Resource
+        :rtype: list
+        """
+        return [
+            self._resources[u] for u, reqs in self._requirements.items() if not reqs
+        ]
+
+    def leaves(self):
+        """Get the resources that no other resource depends on.
+
+        :return: List of orpy.client.base.Resource
+        :rtype: list
+        """
+        return [self._resources[u] for u, deps in self._dependents.items() if not deps]
+
+    def _walk(self, index, key, recursive):
+        seen = set(self._get_uuids(key))
+        queue = collections.deque(seen)
+        ret = []
+        while queue:
+            for uuid in index[queue.popleft()]:
+                if uuid in seen:
+                    continue
+                seen.add(uuid)
+                ret.append(self._resources[uuid])
+                if recursive:
+                    queue.append(uuid)
+        return ret
+
+    def dependents(self, key, recursive=True):
+        """Get the resources that depend on a given resource.
+
+        :param str key: Resource UUID or TOSCA node name.
+        :param bool recursive: Whether to include indirect dependents too.
+        :return: List of orpy.client.base.Resource, in breadth first order.
+        :rtype: list
+        :raises KeyError: If the resource is not in the graph.
+        """
+        return self._walk(self._dependents, key, recursive)
+
+    def requirements(self, key, recursive=True):
+        """Get the resources that a given resource depends on.
+
+        :param str key: Resource UUID or TOSCA node name.
+        :param bool recursive: Whether to include indirect requirements too.
+        :return: List of orpy.client.base.Resource, in breadth first order.
+        :rtype: list
+        :raises KeyError: If the resource is not in the graph.
+        """
+        return self._walk(self._requirements, key, recursive)
+
+    def topological_order(self):
+        """Get the resources sorted so that requirements come first.
+
+        :return: List of orpy.client.base.Resource
+        :rtype: list
+        :raises orpy.exceptions.DependencyCycleError: If there is a cycle.
+        """
+        degree = {u: len(reqs) for u, reqs in self._requirements.items()}
+        queue = collections.deque(u for u, d in degree.items() if d == 0)
+        ret = []
+        while queue:
+            uuid = queue.popleft()
+            ret.append(self._resources[uuid])
+            for dependent in self._dependents[uuid]:
+                degree[dependent] -= 1
+                if degree[dependent] == 0:
+                    queue.append(dependent)
+
+        if len(ret) != len(self._resources):
+            cycle = sorted(u for u, d in degree.items() if d > 0)
+            raise exceptions.DependencyCycleError(resources=", ".join(cycle))
+        return ret
+
+    def walk(self, key=None):
+        """Walk the graph depth first, from requirements to dependents.
+
+        Resources that depend on several others are visited once under each
+        of them, but cycles are not followed.
+
+        :param str key: Resource UUID or TOSCA node name to start from. If not
+                        set, all the roots are used.
+        :return: A generator of ``(depth, resource)`` tuples.
+        :rtype: generator
+        """
+        if key is None:
+            start = [r.uuid for r in self.roots()]
+        else:
+            start = self._get_uuids(key)
+
+        stack = [(0, uuid, frozenset()) for uuid in reversed(start)]
+        while stack:
+            depth, uuid, path = stack.pop()
+            yield depth, self._resources[uuid]
+            path = path | {uuid}
+            for dependent in reversed(self._dependents[uuid]):
+                if dependent not in path:
+                    stack.append((depth + 1, dependent, path))
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Lazily formatted log records for the HTTP requests and responses.
+
+The objects in this module are passed as arguments to the logging calls, so
+that they are only formatted if a handler actually emits the record. Bodies
+are never copied nor parsed again: the payload that has already been parsed
+is serialized on the fly, replacing the values of sensitive keys with their
+SHA1 hash, and the serialization stops as soon as the size limit is reached.
+"""
+
+import hashlib
+import json
+
+import six
+
+# Maximum number of characters of the bodies to log
+BODY_LIMIT = 4096
+
+REDACTED_HEADERS = frozenset(["authorization", "cookie", "set-cookie"])
+REDACTED_KEYS = frozenset(
+    [
+        "access_token",
+        "refresh_token",
+        "id_token",
+        "token",
+        "password",
+        "secret",
+        "client_secret",
+    ]
+)
+
+
+def redact(value):
+    """Get the redacted representation of a value."""
+    value = six.text_type(value).encode("utf-8")
+    return "{SHA1}%s" % hashlib.sha1(value).hexdigest()  # nosec
+
+
+def iter_json(obj, keys=REDACTED_KEYS, limit=None):
+    """Serialize an object as JSON, in chunks, redacting sensitive values.
+
+    :param obj: The (already parsed) object to serialize.
+    :param keys: Keys whose values are redacted, in lower case.
+    :param int limit: If set, strings are cut to this number of characters
+                      before serializing them, so that large values (e.g.
+                      TOSCA templates) are not encoded only to be truncated.
+    :returns: A generator of JSON text chunks.
+    """
+    if isinstance(obj, dict):
+        yield "{"
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                yield ", "
+            yield json.dumps(six.text_type(key))
+            yield ": "
+            if value is not None and six.text_type(key).lower() in keys:
+                yield json.dumps(redact(value))
+            else:
+                for chunk in iter_json(value, keys, limit):
+                    yield chunk
+        yield "}"
+    elif isinstance(obj, (list, tuple)):
+        yield "["
+        for i, value in enumerate(obj):
+            if i:
+                yield ", "
+            for chunk in iter_json(value, keys, limit):
+                yield chunk
+        yield "]"
+    elif limit is not None and isinstance(obj, six.string_types) and len(obj) > limit:
+        yield json.dumps(obj[:limit])
+    else:
+        yield json.dumps(obj, default=six.text_type)
+
+
+def excerpt(chunks, limit=BODY_LIMIT):
+    """Join text chunks, up to a given number of characters.
+
+    :param chunks: Iterable of text chunks, only consumed up to the limit.
+    :param int limit: Maximum number of characters.
+    """
+    parts = []
+    size = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return "".join(parts)[:limit] + "...<truncated>"
+    return "".join(parts)
+
+
+def excerpt_bytes(data, limit=BODY_LIMIT):
+    """Get the beginning of a raw body, as text."""
+    if isinstance(data, bytes):
+        text = data[:limit].decode("utf-8", "replace")
+    else:
+        text = data[:limit]
+    if len(data) > limit:
+        text += "...<truncated, %s bytes>" % len(data)
+    return text
+
+
+def _header(name, value):
+    if name.lower() in REDACTED_HEADERS:
+        value = redact(value)
+    return name, value
+
+
+class Request(object):
+    """A request, formatted as a curl command line."""
+
+    def __init__(self, method, url, kwargs, payload=None, limit=BODY_LIMIT):
+        """Initialize the record.
+
+        :param str method: The HTTP method.
+        :param str url: The URL of the request.
+        :param dict kwargs: The arguments passed to requests.
+        :param payload: The parsed payload of the request, if any.
+        :param int limit: Maximum number of characters of the body to log.
+        """
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self.payload = payload
+        self.limit = limit
+
+    def __str__(self):
+        """Format the request."""
+        parts = ["curl -g -i"]
+        if not self.kwargs.get("verify", True):
+            parts.append(" --insecure")
+        parts.append(" '%s'" % self.url)
+        parts.append(" -X %s" % self.method)
+
+        headers = self.kwargs.get("headers", {})
+        for name in sorted(headers):
+            parts.append(' -H "%s: %s"' % _header(name, headers[name]))
+
+        data = self.kwargs.get("data")
+        if headers.get("Content-Encoding") == "gzip":
+            parts.append(" --data-binary '<%s gzip bytes>'" % len(data))
+        elif self.payload is not None:
+            body = excerpt(iter_json(self.payload, limit=self.limit), self.limit)
+            parts.append(" -d '%s'" % body)
+        elif data:
+            parts.append(" -d '%s'" % excerpt_bytes(data, self.limit))
+        return "".join(parts)
+
+
+class Response(object):
+    """A response, with its status, headers and body."""
+
+    def __init__(self, resp, body=None, limit=BODY_LIMIT):
+        """Initialize the record.
+
+        :param requests.Response resp: The response.
+        :param body: The parsed (JSON) body of the response, if any.
+        :param int limit: Maximum number of characters of the body to log.
+        """
+        self.resp = resp
+        self.body = body
+        self.limit = limit
+
+    def __str__(self):
+        """Format the response."""
+        headers = dict(_header(k, v) for k, v in self.resp.headers.items())
+        if self.body is not None:
+            text = excerpt(iter_json(self.body, limit=self.limit), self.limit)
+        else:
+            text = excerpt_bytes(self.resp.content or b"", self.limit)
+        return "[%s] %s\nRESP BODY: %s\n" % (self.resp.status_code, headers, text)
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Local SQLite index of the Orchestrator deployments and resources.
+
+The index mirrors the deployments (and their resources) of an Orchestrator
+into a local SQLite database so that questions like "which deployments on
+provider X are in CREATE_FAILED and were created last week" can be answered
+locally, without listing the whole Orchestrator inventory every time.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from orpy.client import base
+from orpy.client import tracing
+from orpy import utils
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS deployments (
+    uuid TEXT PRIMARY KEY,
+    status TEXT,
+    task TEXT,
+    provider TEXT,
+    creator TEXT,
+    issuer TEXT,
+    creation_time REAL,
+    update_time REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deployments_status ON deployments (status);
+CREATE INDEX IF NOT EXISTS deployments_provider ON deployments (provider);
+CREATE INDEX IF NOT EXISTS deployments_creator ON deployments (creator);
+CREATE INDEX IF NOT EXISTS deployments_creation_time
+    ON deployments (creation_time);
+CREATE TABLE IF NOT EXISTS resources (
+    uuid TEXT PRIMARY KEY,
+    deployment_uuid TEXT NOT NULL,
+    state TEXT,
+    node_type TEXT,
+    node_name TEXT,
+    creation_time REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_deployment ON resources (deployment_uuid);
+CREATE INDEX IF NOT EXISTS resources_state ON resources (state);
+CREATE INDEX IF NOT EXISTS resources_node_type ON resources (node_type);
+"""
+
+
+def default_path(url):
+    """Get the default index path for a given Orchestrator URL.
+
+    :param str url: The Orchestrator URL.
+    :returns: Path of the SQLite database inside the orpy cache directory.
+    :rtype: str
+    """
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]  # nosec
+    return os.path.join(utils.cache_dir("index"), "%s.sqlite" % digest)
+
+
+class Index(object):
+    """Local index of the deployments and resources of an Orchestrator."""
+
+    def __init__(self, client, path=None):
+        """Initialize the index.
+
+        The database is not opened until it is actually used.
+
+        :params client: An instance of OrpyClient.
+        :param str path: Path of the SQLite database. If not set, a database
+                         inside the orpy cache directory is used, one per
+                         Orchestrator URL.
+        """
+        self.client = client
+        self._path = path
+        self._db = None
+        self._lock = threading.RLock()
+
+    @property
+    def path(self):
+        """Path of the SQLite database used by the index."""
+        if self._path is None:
+            self._path = default_path(self.client.urls[0])
+        return self._path
+
+    @property
+    def db(self):
+        """Get the connection to the index database, creating it if needed."""
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def close(self):
+        """Close the connection to the index database."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        return json.loads(row["value"])
+
+    def _set_meta(self, key, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
+
+    @property
+    def last_sync(self):
+        """POSIX timestamp of the last successful sync, or None."""
+        return self._get_meta("last_sync")
+
+    @tracing.traced("index.sync")
+    def sync(self, full=False, resources=True, page_size=None, **kwargs):
+        """Synchronize the index with the Orchestrator.
+
+        Deployments are listed sorted by their update time, newest first. In
+        an incremental sync the listing is stopped as soon as we reach
+        deployments that have not been modified since the last sync, and
+        resources are only fetched for the deployments that changed. An
+        incremental sync cannot see deleted deployments by itself, therefore
+        if the number of deployments reported by the Orchestrator does not
+        match the local one at that point, the listing goes on until the
+        end, and the deployments not listed are removed from the index.
+
+        Deployments are identified by their UUIDs whenever the listing is
+        complete, but an incremental sync relies on the count: if a
+        deployment is deleted while another one appears with an update time
+        older than the last sync (e.g. because of a clock skew in the
+        Orchestrator), none of them is noticed until the next full sync.
+
+        :param bool full: Whether to do a full sync, listing all the
+                          deployments and removing from the index those that
+                          no longer exist.
+        :param bool resources: Whether to also index deployment resources.
+        :param int page_size: Number of deployments to request per page.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: Statistics about the sync operation.
+        :rtype: dict
+        """
+        with self._lock:
+            return self._sync(full, resources, page_size, **kwargs)
+
+    def _sync(self, full, resources, page_size, **kwargs):
+        start = time.time()
+        watermark = None if full else self._get_meta("watermark")
+        known = dict(self.db.execute("SELECT uuid, update_time FROM deployments"))
+
+        stats = {"full": watermark is None, "pages": 0, "seen": 0}
+        changed = []
+        seen = set()
+        total = None
+        new_watermark = watermark
+        stop = False
+
+        params = {"sort": "updateTime,desc"}
+        if page_size:
+            params["size"] = page_size
+        kwargs.setdefault("params", params)
+
+        pages = self.client.iter_pages("./deployments", "GET", **kwargs)
+        for resp, content, page in pages:
+            stats["pages"] += 1
+            if total is None:
+                total = (page or {}).get("totalElements")
+
+            for data in content:
+                updated = utils.timestamp(
+                    data.get("updateTime") or data.get("creationTime")
+                )
+                # Times have minute resolution, so we only stop when we find
+                # a deployment strictly older than the watermark
+                if watermark is not None and updated is not None:
+                    if updated < watermark:
+                        if len(set(known) | seen) == total:
+                            stop = True
+                            break
+                        # Some deployments have been deleted (or we missed
+                        # some), so go on with a full listing.
+                        watermark = None
+                        stats["full"] = True
+                if updated is not None and (
+                    new_watermark is None or updated > new_watermark
+                ):
+                    new_watermark = updated
+
+                seen.add(data["uuid"])
+                if data["uuid"] not in known or known[data["uuid"]] != updated:
+                    changed.append(data)
+            if stop:
+                pages.close()
+                break
+
+        stats["seen"] = len(seen)
+
+        with self.db:
+            for data in changed:
+                self._store_deployment(data)
+                if resources:
+                    self._store_resources(data["uuid"], **kwargs)
+
+            deleted = []
+            if not stop:
+                # The listing is complete, so anything else has been deleted
+                deleted = [uuid for uuid in known if uuid not in seen]
+                for uuid in deleted:
+                    self.db.execute("DELETE FROM deployments WHERE uuid = ?", (uuid,))
+                    self.db.execute(
+                        "DELETE FROM resources WHERE deployment_uuid = ?", (uuid,)
+                    )
+
+            self._set_meta("watermark", new_watermark)
+            self._set_meta("last_sync", start)
+            self._set_meta("url", self.client.urls[0])
+
+        stats["updated"] = len(changed)
+        stats["deleted"] = len(deleted)
+        stats["elapsed"] = time.time() - start
+        return stats
+
+    def _store_deployment(self, data):
+        created_by = data.get("createdBy") or {}
+        self.db.execute(
+            "INSERT OR REPLACE INTO deployments (uuid, status, task, provider, "
+            "creator, issuer, creation_time, update_time, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                data["uuid"],
+                data.get("status"),
+                data.get("task"),
+                data.get("cloudProviderName"),
+                created_by.get("subject"),
+                created_by.get("issuer"),
+                utils.timestamp(data.get("creationTime")),
+                utils.timestamp(data.get("updateTime") or data.get("creationTime")),
+                json.dumps(data),
+            ),
+        )
+
+    def _store_resources(self, deployment_uuid, **kwargs):
+        kwargs.pop("params", None)
+        resp, results = self.client.get(
+            "./deployments/%s/resources/" % deployment_uuid, **kwargs
+        )
+        self.db.execute(
+            "DELETE FROM resources WHERE deployment_uuid = ?", (deployment_uuid,)
+        )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO resources (uuid, deployment_uuid, state, "
+            "node_type, node_name, creation_time, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    data["uuid"],
+                    deployment_uuid,
+                    data.get("state"),
+                    data.get("toscaNodeType"),
+                    data.get("toscaNodeName"),
+                    utils.timestamp(data.get("creationTime")),
+                    json.dumps(data),
+                )
+                for data in results
+            ],
+        )
+
+    def deployments(
+        self,
+        status=None,
+        provider=None,
+        created_by=None,
+        created_after=None,
+        created_before=None,
+        limit=None,
+    ):
+        """Query the indexed deployments.
+
+        All the filters are optional, and they are combined. Deployments are
+        returned sorted by creation time, newest first.
+
+        :param str status: Deployment status (e.g. ``CREATE_FAILED``).
+        :param str provider: Cloud provider name.
+        :param str created_by: Subject of the deployment creator.
+        :param created_after: Only deployments created after this time
+                              (datetime or string, see
+                              :func:`orpy.utils.parse_time`).
+        :param created_before: Only deployments created before this time.
+        :param int limit: Maximum number of deployments to return.
+
+        :return: List of orpy.client.base.Deployment
+        :rtype: list
+        """
+        where, args = [], []
+        for column, value in (
+            ("status", status),
+            ("provider", provider),
+            ("creator", created_by),
+        ):
+            if value is not None:
+                where.append("%s = ?" % column)
+                args.append(value)
+        for op, value in ((">=", created_after), ("<=", created_before)):
+            if value is not None:
+                if not hasattr(value, "timestamp"):
+                    value = utils.parse_time(value)
+                where.append("creation_time %s ?" % op)
+                args.append(value.timestamp())
+
+        query = "SELECT data FROM deployments"  # nosec
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY creation_time DESC"
+        if limit:
+            query += " LIMIT %d" % int(limit)
+
+        with self._lock:
+            rows = self.db.execute(query, args).fetchall()
+        return [base.Deployment(json.loads(row["data"])) for row in rows]
+
+    def resources(self, deployment_uuid=None, state=None, node_type=None):
+        """Query the indexed resources.
+
+        :param str deployment_uuid: Only resources of this deployment.
+        :param str state: Resource state (e.g. ``STARTED``).
+        :param str node_type: TOSCA node type (e.g.
+                              ``tosca.nodes.indigo.Compute``).
+
+        :return: List of orpy.client.base.Resource
+        :rtype: list
+        """
+        where, args = [], []
+        for column, value in (
+            ("deployment_uuid", deployment_uuid),
+            ("state", state),
+            ("node_type", node_type),
+        ):
+            if value is not None:
+                where.append("%s = ?" % column)
+                args.append(value)
+
+        query = "SELECT deployment_uuid, data FROM resources"  # nosec
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY deployment_uuid, creation_time"
+
+        with self._lock:
+            rows = self.db.execute(query, args).fetchall()
+        ret = []
+        for row in rows:
+            data = json.loads(row["data"])
+            data.setdefault("deploymentUuid", row["deployment_uuid"])
+            ret.append(base.Resource(data))
+        return ret
@@ -17,6 +17,7 @@
 """This module contains the client dealing with PaaS Orchestrator information."""
 
 from orpy.client import base
+from orpy.client import tracing
 from orpy import exceptions
 
 
@@ -30,6 +31,7 @@ class Info(object):
         """
         self.client = client
 
+    @tracing.traced("info.get")
     def get(self, **kwargs):
         """Get information about the Orchestrator.
 
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Prometheus style metrics of the requests done to the Orchestrator."""
+
+import http.server
+import threading
+
+from six.moves.urllib import parse
+
+from orpy import exceptions
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets, in seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LIST = "list"
+SHOW = "show"
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+TEMPLATE = "template"
+INFO = "info"
+
+
+def classify(method, url):
+    """Get the endpoint class of a request.
+
+    :param str method: The HTTP method.
+    :param str url: The URL (or path) of the request.
+    :returns: One of ``list``, ``show``, ``create``, ``update``, ``delete``,
+              ``template`` or ``info``.
+    :rtype: str
+    """
+    segments = [s for s in parse.urlparse(url).path.split("/") if s]
+    if "deployments" not in segments:
+        # Index, info and configuration
+        return INFO
+    if segments[-1] == "template":
+        return TEMPLATE
+
+    method = method.lower()
+    if method == "delete":
+        return DELETE
+    if method == "post":
+        return CREATE
+    if method in ("put", "patch"):
+        return UPDATE
+    if segments[-1] in ("deployments", "resources"):
+        return LIST
+    return SHOW
+
+
+def _labels(values):
+    # Label values are strings, so that samples can always be sorted (e.g.
+    # status codes along with "error")
+    return tuple(str(v) for v in values)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", r"\\").replace("\n", r"\n")
+        escaped.append('%s="%s"' % (name, value.replace('"', r"\"")))
+    return "{%s}" % ",".join(escaped)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter(object):
+    """A counter, with a value for each combination of its labels."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        """Initialize the counter.
+
+        :param str name: The name of the metric.
+        :param str documentation: Description of the metric.
+        :param tuple labels: The names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), value=1):
+        """Increment the counter.
+
+        :param tuple labels: The values of the labels, in order.
+        :param float value: The amount to increment the counter by.
+        """
+        labels = _labels(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def get(self, labels=()):
+        """Get the value of the counter for some label values."""
+        return self._values.get(_labels(labels), 0)
+
+    def samples(self):
+        """Get the samples of the metric, as ``(name, labels, value)``."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Histogram(object):
+    """A histogram, with a distribution for each combination of its labels."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """Initialize the histogram.
+
+        :param str name: The name of the metric.
+        :param str documentation: Description of the metric.
+        :param tuple labels: The names of the labels of the metric.
+        :param tuple buckets: Upper bounds of the buckets.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, labels=(), value=0):
+        """Record an observation.
+
+        :param tuple labels: The values of the labels, in order.
+        :param float value: The observed value.
+        """
+        labels = _labels(labels)
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * len(self.buckets), 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[labels] = (counts, total + value)
+
+    def count(self, labels=()):
+        """Get the number of observations for some label values."""
+        counts, total = self._values.get(_labels(labels), ((), 0))
+        return sum(counts)
+
+    def samples(self):
+        """Get the samples of the metric, as ``(name, labels, value)``."""
+        with self._lock:
+            values = sorted((k, (list(c), t)) for k, (c, t) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = [("le", _format_value(bound))]
+                yield (
+                    self.name + "_bucket",
+                    _format_labels(self.labels, labels, le),
+                    cumulative,
+                )
+            yield self.name + "_sum", _format_labels(self.labels, labels), total
+            yield self.name + "_count", _format_labels(self.labels, labels), cumulative
+
+
+class Registry(object):
+    """A collection of metrics, that can be rendered in the text format."""
+
+    def __init__(self):
+        """Initialize the registry."""
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise exceptions.InvalidUsageError(
+                    "Metric %s is already registered as a %s." % (name, metric.type)
+                )
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        """Get a counter, registering it if it does not exist.
+
+        :returns: The counter.
+        :rtype: Counter
+        """
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """Get a histogram, registering it if it does not exist.
+
+        :returns: The histogram.
+        :rtype: Histogram
+        """
+        return self._get_or_create(Histogram, name, documentation, labels, buckets)
+
+    def get(self, name):
+        """Get a registered metric by its name, or None."""
+        return self._metrics.get(name)
+
+    def render(self):
+        """Render all the metrics in the Prometheus text exposition format.
+
+        :rtype: str
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, metric in metrics:
+            lines.append("# HELP %s %s" % (name, metric.documentation))
+            lines.append("# TYPE %s %s" % (name, metric.type))
+            for sample, labels, value in metric.samples():
+                lines.append("%s%s %s" % (sample, labels, _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=0, address="127.0.0.1"):
+        """Expose the metrics over HTTP, in a background thread.
+
+        Any GET request gets the metrics in the text exposition format, so
+        that they can be scraped by Prometheus.
+
+        :param int port: The port to listen on. By default a free port is
+                         chosen.
+        :param str address: The address to listen on.
+        :returns: The server, whose ``url`` attribute is the URL of the
+                  metrics and that can be stopped with ``stop()``.
+        :rtype: MetricsServer
+        """
+        return MetricsServer(self, port=port, address=address).start()
+
+
+class MetricsServer(object):
+    """Local HTTP endpoint exposing the metrics of a Registry."""
+
+    def __init__(self, registry, port=0, address="127.0.0.1"):
+        """Initialize the server.
+
+        :param Registry registry: The registry to expose.
+        :param int port: The port to listen on.
+        :param str address: The address to listen on.
+        """
+        self.registry = registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa: N802
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((address, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """Get the URL of the metrics endpoint."""
+        address, port = self._server.server_address[:2]
+        return "http://%s:%s/metrics" % (address, port)
+
+    def start(self):
+        """Start serving the metrics in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.1},
+            name="orpy-metrics",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving the metrics."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class ClientMetrics(object):
+    """Metrics of the requests done by an OrpyClient.
+
+    Pass an instance to the client to record its requests::
+
+        m = metrics.ClientMetrics()
+        cli = client.OrpyClient(url, token=token, metrics=m)
+        server = m.registry.serve(port=9100)
+
+    The following metrics are recorded, labelled with the endpoint class of
+    the request (see :py:func:`classify`):
+
+    - ``orpy_requests_total``: requests done, also by method and status
+      code (``error`` if no response was received).
+    - ``orpy_request_duration_seconds``: histogram of the request latency.
+    - ``orpy_retries_total``: requests retried on another Orchestrator
+      instance.
+    - ``orpy_pages_total``: pages of paginated listings fetched.
+
+    The same object (or the same registry) can be shared between several
+    clients. If no metrics object is given to the client, nothing is
+    recorded at all.
+    """
+
+    def __init__(self, registry=None, buckets=DEFAULT_BUCKETS):
+        """Initialize the metrics.
+
+        :param Registry registry: The registry to register the metrics in.
+                                  A new one is created if not given.
+        :param tuple buckets: The latency buckets, in seconds.
+        """
+        self.registry = registry if registry is not None else Registry()
+        self.requests = self.registry.counter(
+            "orpy_requests_total",
+            "Requests done to the Orchestrator.",
+            ("endpoint", "method", "status"),
+        )
+        self.duration = self.registry.histogram(
+            "orpy_request_duration_seconds",
+            "Latency of the requests done to the Orchestrator.",
+            ("endpoint",),
+            buckets,
+        )
+        self.retries = self.registry.counter(
+            "orpy_retries_total",
+            "Requests retried on another Orchestrator instance.",
+            ("endpoint",),
+        )
+        self.pages = self.registry.counter(
+            "orpy_pages_total",
+            "Pages of paginated listings fetched from the Orchestrator.",
+            ("endpoint",),
+        )
+
+    def observe_request(self, method, url, status, elapsed):
+        """Record a request.
+
+        :param str method: The HTTP method.
+        :param str url: The URL of the request.
+        :param status: The status code of the response, or ``error``.
+        :param float elapsed: The time taken by the request, in seconds.
+        """
+        endpoint = classify(method, url)
+        self.requests.inc((endpoint, method.upper(), status))
+        self.duration.observe((endpoint,), elapsed)
+
+    def observe_retry(self, method, url):
+        """Record that a request is going to be retried."""
+        self.retries.inc((classify(method, url),))
+
+    def observe_page(self, method, url):
+        """Record that a page of a listing has been fetched."""
+        self.pages.inc((classify(method, url),))
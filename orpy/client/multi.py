@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Client to query several independent Orchestrators at the same time."""
+
+from concurrent import futures
+import logging
+
+from orpy import exceptions
+
+LOG = logging.getLogger(__name__)
+
+
+class MultiOrpyClient(object):
+    """Query several independent Orchestrators in parallel.
+
+    This class wraps several orpy.client.client.OrpyClient objects (e.g. one
+    per site or VO) and runs the read operations over all of them
+    concurrently, merging the results. Each returned object is tagged with
+    the URL of the Orchestrator it comes from in its ``orchestrator``
+    attribute::
+
+        from orpy.client import client
+        from orpy.client import multi
+
+        cli = multi.MultiOrpyClient([
+            client.OrpyClient(url_a, oidc_agent=oidc_agent),
+            client.OrpyClient(url_b, oidc_agent=oidc_agent),
+        ])
+        for d in cli.deployments.list():
+            print(d.orchestrator, d.uuid, d.status)
+
+    Only the deployment listing and showing and the resource listing are
+    supported.
+    """
+
+    def __init__(self, clients, ignore_errors=False):
+        """Initialize the client.
+
+        :param list clients: List of OrpyClient objects.
+        :param bool ignore_errors: Whether to ignore (logging them) errors
+                                   from some of the Orchestrators, returning
+                                   partial results instead of failing.
+        """
+        if not clients:
+            raise exceptions.InvalidUsageError("At least one client is needed.")
+        self.clients = list(clients)
+        self.ignore_errors = ignore_errors
+
+        self._deployments = MultiDeployments(self)
+        self._resources = MultiResources(self)
+
+    @property
+    def deployments(self):
+        """Interface to query for deployments.
+
+        :return: Deployments interface.
+        :rtype: orpy.client.multi.MultiDeployments
+        """
+        return self._deployments
+
+    @property
+    def resources(self):
+        """Interface to query for resources.
+
+        :return: Resources interface.
+        :rtype: orpy.client.multi.MultiResources
+        """
+        return self._resources
+
+    @staticmethod
+    def source(client):
+        """Get the tag used for the objects coming from a client."""
+        return client.urls[0]
+
+    def map(self, func, not_found_ok=False):
+        """Call a function with every client, concurrently.
+
+        :param func: Function getting a client as its only argument.
+        :param bool not_found_ok: Whether to ignore NotFoundError exceptions.
+
+        :returns: List of ``(source, result)`` tuples, for the clients that
+                  succeeded, in the same order as the clients.
+        :rtype: list
+        """
+        with futures.ThreadPoolExecutor(max_workers=len(self.clients)) as ex:
+            fs = [(client, ex.submit(func, client)) for client in self.clients]
+
+        ret = []
+        for client, future in fs:
+            try:
+                ret.append((self.source(client), future.result()))
+            except exceptions.NotFoundError:
+                if not not_found_ok:
+                    raise
+            except Exception as e:
+                if not self.ignore_errors:
+                    raise
+                LOG.warning("Ignoring error from %s: %s", self.source(client), e)
+        return ret
+
+    @staticmethod
+    def tag(obj, source):
+        """Tag an object with the Orchestrator it comes from."""
+        obj._add_details({"orchestrator": source})
+        return obj
+
+
+class MultiDeployments(object):
+    """Query deployments across several Orchestrators."""
+
+    def __init__(self, client):
+        """Initialize client.
+
+        :params client: An instance of MultiOrpyClient.
+        """
+        self.client = client
+
+    def list(self, max_items=None, **kwargs):
+        """List existing deployments in all the Orchestrators.
+
+        :param int max_items: Maximum number of deployments to return in
+                              total, taken in the order of the clients.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: List of orpy.client.base.Deployment
+        :rtype: list
+        """
+        results = self.client.map(
+            lambda c: c.deployments.list(max_items=max_items, **kwargs)
+        )
+        ret = [self.client.tag(d, src) for src, ret in results for d in ret]
+        return ret[:max_items] if max_items is not None else ret
+
+    def show(self, uuid, **kwargs):
+        """Show details about a deployment, looking for it everywhere.
+
+        :param str uuid: The UUID of the deployment to show.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: The deployment requested
+        :rtype: orpy.client.base.Deployment
+        :raises orpy.exceptions.NotFoundError: If no Orchestrator has it.
+        """
+        results = self.client.map(
+            lambda c: c.deployments.show(uuid, **kwargs), not_found_ok=True
+        )
+        if not results:
+            raise exceptions.NotFoundError(
+                "Deployment %s not found in any orchestrator" % uuid
+            )
+        src, d = results[0]
+        return self.client.tag(d, src)
+
+
+class MultiResources(object):
+    """Query resources across several Orchestrators."""
+
+    def __init__(self, client):
+        """Initialize client.
+
+        :params client: An instance of MultiOrpyClient.
+        """
+        self.client = client
+
+    def list(self, uuid, **kwargs):
+        """List resources for a deployment, looking for it everywhere.
+
+        :param str uuid: The UUID of the deployment get the resources.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: A list of orpy.client.base.Resource
+        :rtype: list
+        :raises orpy.exceptions.NotFoundError: If no Orchestrator has it.
+        """
+        results = self.client.map(
+            lambda c: c.resources.list(uuid, **kwargs), not_found_ok=True
+        )
+        if not results:
+            raise exceptions.NotFoundError(
+                "Deployment %s not found in any orchestrator" % uuid
+            )
+        return [self.client.tag(r, src) for src, ret in results for r in ret]
+
+    def list_all(self, concurrency=8, **kwargs):
+        """List the resources of all the deployments of all the Orchestrators.
+
+        Orchestrators are queried one after the other, but the deployments
+        of each of them are queried concurrently, see
+        :py:meth:`orpy.client.resources.Resources.list_all`.
+
+        :param int concurrency: Maximum number of concurrent requests.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: A generator of orpy.client.base.Resource
+        :rtype: generator
+        """
+        for client in self.client.clients:
+            src = self.client.source(client)
+            for r in client.resources.list_all(concurrency=concurrency, **kwargs):
+                yield self.client.tag(r, src)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Client side rate limiting of the requests done to the Orchestrator."""
+
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from orpy import exceptions
+
+READ = "read"
+WRITE = "write"
+
+
+def classify(method):
+    """Get the endpoint class of a request, given its HTTP method.
+
+    :param str method: The HTTP method.
+    :returns: Either ``read`` or ``write``.
+    :rtype: str
+    """
+    if method.lower() in ("get", "head", "options"):
+        return READ
+    return WRITE
+
+
+class TokenBucket(object):
+    """A token bucket, shared across threads and optionally processes.
+
+    Tokens are added to the bucket at ``rate`` tokens per second, up to
+    ``burst`` tokens. Acquiring a token when the bucket is empty reserves it
+    and sleeps until it is available, so that concurrent callers are spread
+    evenly over time instead of all retrying at once.
+
+    If ``path`` is set, the bucket state is stored in that file and accessed
+    holding an exclusive file lock, so that several processes on the same
+    host can share the same bucket.
+    """
+
+    def __init__(self, rate, burst=None, path=None):
+        """Initialize the bucket.
+
+        :param float rate: Tokens added per second.
+        :param int burst: Maximum number of tokens in the bucket. Defaults to
+                          one second worth of tokens (and at least 1).
+        :param str path: Optional file to share the bucket between processes.
+        """
+        if rate <= 0:
+            raise exceptions.InvalidUsageError("Rate limit must be positive.")
+        if path is not None and fcntl is None:
+            raise exceptions.InvalidUsageError(
+                "Sharing rate limits between processes is not supported on "
+                "this platform."
+            )
+
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.path = path
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._time = time.time()
+
+    def _reserve(self, state, tokens, now):
+        available = min(self.burst, state["tokens"] + (now - state["time"]) * self.rate)
+        state["tokens"] = available - tokens
+        state["time"] = now
+        if state["tokens"] >= 0:
+            return 0
+        return -state["tokens"] / self.rate
+
+    def _reserve_shared(self, tokens, now):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(f.read())
+                except ValueError:
+                    state = {"tokens": self.burst, "time": now}
+                wait = self._reserve(state, tokens, now)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return wait
+
+    def acquire(self, tokens=1):
+        """Acquire tokens from the bucket, sleeping until they are available.
+
+        :param int tokens: The number of tokens to acquire.
+        :returns: The number of seconds that we have waited.
+        :rtype: float
+        """
+        with self._lock:
+            now = time.time()
+            if self.path is not None:
+                wait = self._reserve_shared(tokens, now)
+            else:
+                state = {"tokens": self._tokens, "time": self._time}
+                wait = self._reserve(state, tokens, now)
+                self._tokens, self._time = state["tokens"], state["time"]
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter(object):
+    """Rate limiter for the requests done by an OrpyClient.
+
+    A global limit can be set for all the requests, as well as limits per
+    endpoint class (``read`` for GET and HEAD requests, ``write`` for the
+    rest). A request has to comply with both the global limit and the limit
+    of its class. For example, to do at most 10 requests per second, but
+    only 1 write request per second::
+
+        limiter = ratelimit.RateLimiter(rate=10, classes={"write": 1})
+        cli = client.OrpyClient(url, token=token, rate_limiter=limiter)
+
+    The same RateLimiter object can be shared between several clients.
+    """
+
+    def __init__(self, rate=None, burst=None, classes=None, path=None):
+        """Initialize the rate limiter.
+
+        :param float rate: Global rate, in requests per second. If not set,
+                           there is no global limit.
+        :param int burst: Global burst size, see :class:`TokenBucket`.
+        :param dict classes: Mapping of endpoint class (``read`` or
+                             ``write``) to its rate, or to a ``(rate,
+                             burst)`` tuple.
+        :param str path: If set, limits are shared with other processes
+                         using files prefixed with this path.
+        """
+        self._buckets = {}
+        if rate is not None:
+            self._buckets[None] = TokenBucket(rate, burst, self._path(path, "global"))
+        for name, limit in (classes or {}).items():
+            if not isinstance(limit, (tuple, list)):
+                limit = (limit, None)
+            self._buckets[name] = TokenBucket(
+                limit[0], limit[1], self._path(path, name)
+            )
+
+    @staticmethod
+    def _path(path, name):
+        if path is None:
+            return None
+        return "%s.%s" % (path, name)
+
+    def acquire(self, endpoint_class=None):
+        """Wait until a request of the given class can be done.
+
+        :param str endpoint_class: The endpoint class of the request.
+        :returns: The number of seconds that we have waited.
+        :rtype: float
+        """
+        waited = 0
+        for name in {None, endpoint_class}:
+            bucket = self._buckets.get(name)
+            if bucket is not None:
+                waited += bucket.acquire()
+        return waited
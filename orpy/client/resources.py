@@ -16,7 +16,14 @@
 
 """This module contains the client dealing with PaaS Orchestrator resources."""
 
+from concurrent import futures
+
 from orpy.client import base
+from orpy.client import columns
+from orpy.client import graph
+from orpy.client import tracing
+from orpy import exceptions
+from orpy import profiling
 
 
 class Resources(object):
@@ -29,18 +36,146 @@ class Resources(object):
         """
         self.client = client
 
-    def list(self, uuid, **kwargs):
+    @tracing.traced("resources.list")
+    def list(self, uuid, page_size=None, max_items=None, start_page=None, **kwargs):
         """List resources for a deployment.
 
         :param str uuid: The UUID of the deployment get the resources.
+        :param int page_size: Number of resources to request per page.
+        :param int max_items: Maximum number of resources to return.
+        :param int start_page: Number of the first page to get (starting at
+                               0).
         :param kwargs: Other arguments passed to the request client.
 
         :return: A list of orpy.client.base.Resource
         :rtype: list
         """
-        resp, results = self.client.get("./deployments/%s/resources/" % uuid, **kwargs)
-        return [base.Resource(result) for result in results]
+        url = "./deployments/%s/resources/" % uuid
+        if page_size is None and max_items is None and start_page is None:
+            resp, results = self.client.get(url, **kwargs)
+        else:
+            results = self.client.list_items(
+                url,
+                page_size=page_size,
+                max_items=max_items,
+                start_page=start_page,
+                **kwargs,
+            )
+        with profiling.phase("models"):
+            return [base.Resource(result) for result in results]
+
+    @tracing.traced("resources.list_columns")
+    def list_columns(
+        self,
+        uuid,
+        fields=None,
+        page_size=None,
+        max_items=None,
+        start_page=None,
+        **kwargs,
+    ):
+        """List resources for a deployment, as a table of columns.
+
+        :param str uuid: The UUID of the deployment get the resources.
+        :param list fields: The fields to get (nested fields can be given
+                            with dots). By default, all the top level fields
+                            are included.
+        :param int page_size: Number of resources to request per page.
+        :param int max_items: Maximum number of resources to return.
+        :param int start_page: Number of the first page to get (starting at
+                               0).
+        :param kwargs: Other arguments passed to the request client.
+
+        :rtype: orpy.client.columns.Columns
+        """
+        pages = self.client.list_pages(
+            "./deployments/%s/resources/" % uuid,
+            page_size=page_size,
+            max_items=max_items,
+            start_page=start_page,
+            **kwargs,
+        )
+        with profiling.phase("models"):
+            return columns.Columns.from_pages(pages, fields)
+
+    @tracing.traced("resources.graph")
+    def graph(self, uuid, **kwargs):
+        """Get the dependency graph of the resources of a deployment.
+
+        :param str uuid: The UUID of the deployment get the resources.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: The dependency graph for the deployment resources.
+        :rtype: orpy.client.graph.ResourceGraph
+        """
+        return graph.ResourceGraph(self.list(uuid, **kwargs))
+
+    def list_all(self, deployment_uuids=None, concurrency=8, **kwargs):
+        """List resources across several deployments concurrently.
+
+        Resources are requested for up to ``concurrency`` deployments at the
+        same time, and they are yielded as soon as each deployment's listing
+        is available, therefore they are not returned in any particular
+        order. Each resource is tagged with the UUID of its deployment in the
+        ``deploymentUuid`` attribute. Deployments that disappear while we are
+        listing them are silently skipped.
+
+        :param deployment_uuids: Iterable of deployment UUIDs to get the
+                                 resources for. If not set, the resources of
+                                 all the deployments are listed.
+        :param int concurrency: Maximum number of concurrent requests.
+        :param kwargs: Other arguments passed to the request client.
+
+        :return: A generator of orpy.client.base.Resource
+        :rtype: generator
+        """
+        if deployment_uuids is None:
+            deployment_uuids = (
+                d["uuid"]
+                for resp, content, page in self.client.iter_pages(
+                    "./deployments", "GET", **kwargs
+                )
+                for d in content
+            )
+
+        def _list(uuid):
+            kw = dict(kwargs, headers=dict(kwargs.get("headers", {})))
+            try:
+                resp, results = self.client.get(
+                    "./deployments/%s/resources/" % uuid, **kw
+                )
+            except exceptions.NotFoundError:
+                results = []
+            return uuid, results
+
+        def _tag(future):
+            uuid, results = future.result()
+            for result in results:
+                result["deploymentUuid"] = uuid
+                yield base.Resource(result)
+
+        executor = futures.ThreadPoolExecutor(max_workers=concurrency)
+        pending = set()
+        try:
+            for uuid in deployment_uuids:
+                pending.add(executor.submit(_list, uuid))
+                # Do not queue more work than needed, so that we start
+                # yielding results before the deployment listing is drained.
+                if len(pending) >= concurrency * 2:
+                    done, pending = futures.wait(
+                        pending, return_when=futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        yield from _tag(future)
+            for future in futures.as_completed(pending):
+                pending.discard(future)
+                yield from _tag(future)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
 
+    @tracing.traced("resources.show")
     def show(self, deployment_uuid, resource_uuid, **kwargs):
         """Show details about a resource on a deployment.
 
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Coalescing of concurrent identical calls (a.k.a. "single flight")."""
+
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """Merge concurrent calls with the same key into a single one.
+
+    The first thread calling :py:meth:`do` with a given key executes the
+    function, and any other thread calling it with the same key while the
+    first one is still running waits for it and gets the same result (or
+    exception) instead of executing it again. Once the call finishes, the key
+    is forgotten, therefore results are never cached.
+    """
+
+    def __init__(self):
+        """Initialize the object."""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """Execute a function, unless there is an identical call in flight.
+
+        :param key: A hashable key identifying the call.
+        :param func: The function to call.
+        :param args: Positional arguments for the function.
+        :param kwargs: Keyword arguments for the function.
+
+        :returns: A tuple containing the result of the function and whether
+                  it was shared with another in-flight call.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, call.waiters > 0
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Local preflight checks of TOSCA templates and their input parameters.
+
+The Orchestrator only reports errors in a template (or missing inputs) once
+it has been submitted, often after a failed deployment that has to be
+deleted. The checks done here catch the most common mistakes locally:
+templates that are not valid YAML, parameters that are not declared as
+inputs, required inputs without a value and values with the wrong type.
+"""
+
+import collections
+import hashlib
+import threading
+
+import yaml
+
+from orpy import exceptions
+
+# Number of parsed templates kept in memory
+CACHE_SIZE = 32
+
+_TRUE = ("true", "yes", "on", "1")
+_FALSE = ("false", "no", "off", "0")
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def digest(template):
+    """Get the content hash of a template.
+
+    :param str template: The TOSCA template.
+    :rtype: str
+    """
+    if not isinstance(template, bytes):
+        template = template.encode("utf-8")
+    return hashlib.sha256(template).hexdigest()
+
+
+class Template(object):
+    """A parsed TOSCA template."""
+
+    def __init__(self, data, sha256=None):
+        """Initialize the template.
+
+        :param dict data: The parsed template.
+        :param str sha256: The content hash of the template.
+        """
+        self.data = data
+        self.sha256 = sha256
+
+    @property
+    def inputs(self):
+        """Get the input definitions of the template.
+
+        :rtype: dict
+        """
+        topology = self.data.get("topology_template") or {}
+        return topology.get("inputs") or {}
+
+    def errors(self, parameters=None):
+        """Check input parameters against the inputs of the template.
+
+        :param dict parameters: The input parameters.
+        :returns: A list of error messages, empty if the parameters are valid.
+        :rtype: list
+        """
+        parameters = parameters or {}
+        inputs = self.inputs
+        errors = []
+
+        for name in sorted(set(parameters) - set(inputs)):
+            errors.append("parameter '%s' is not an input of the template" % name)
+
+        for name, definition in sorted(inputs.items()):
+            if not isinstance(definition, dict):
+                errors.append("input '%s' has an invalid definition" % name)
+                continue
+
+            type_ = definition.get("type")
+            if "default" in definition:
+                if not _check_type(type_, definition["default"]):
+                    errors.append(
+                        "default value of input '%s' is not of type %s" % (name, type_)
+                    )
+
+            if name not in parameters:
+                required = definition.get("required", True)
+                if required and "default" not in definition:
+                    errors.append("required input '%s' has no value" % name)
+                continue
+
+            value = parameters[name]
+            if not _check_type(type_, value):
+                errors.append(
+                    "value %r of input '%s' is not of type %s" % (value, name, type_)
+                )
+                continue
+            valid_values = _valid_values(definition)
+            if valid_values is not None and not _is_in(value, valid_values):
+                errors.append(
+                    "value %r of input '%s' is not one of %s"
+                    % (value, name, ", ".join(str(v) for v in valid_values))
+                )
+
+        return errors
+
+    def validate(self, parameters=None):
+        """Check input parameters against the inputs of the template.
+
+        :param dict parameters: The input parameters.
+        :raises orpy.exceptions.TemplateValidationError: If there are errors.
+        """
+        errors = self.errors(parameters)
+        if errors:
+            raise exceptions.TemplateValidationError(errors=errors)
+
+
+def _valid_values(definition):
+    for constraint in definition.get("constraints") or []:
+        if isinstance(constraint, dict) and "valid_values" in constraint:
+            return constraint["valid_values"]
+    return None
+
+
+def _is_in(value, valid_values):
+    return value in valid_values or str(value) in [str(v) for v in valid_values]
+
+
+def _check_type(type_, value):
+    """Check whether a value is valid for a TOSCA type.
+
+    Values given as strings (e.g. from the command line) are valid if they
+    can be converted to the type. Types that are not checked (e.g. versions,
+    scalar units or custom data types) are always valid.
+    """
+    if value is None:
+        return True
+    if type_ == "integer":
+        if isinstance(value, str):
+            try:
+                int(value)
+            except ValueError:
+                return False
+            return True
+        return isinstance(value, int) and not isinstance(value, bool)
+    if type_ == "float":
+        if isinstance(value, str):
+            try:
+                float(value)
+            except ValueError:
+                return False
+            return True
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if type_ == "boolean":
+        if isinstance(value, str):
+            return value.lower() in _TRUE + _FALSE
+        return isinstance(value, bool)
+    if type_ == "string":
+        return not isinstance(value, (dict, list))
+    if type_ in ("map", "list"):
+        if isinstance(value, str):
+            try:
+                value = yaml.safe_load(value)
+            except yaml.YAMLError:
+                return False
+        return isinstance(value, dict if type_ == "map" else list)
+    return True
+
+
+def parse(template):
+    """Parse a TOSCA template, caching the result by content hash.
+
+    :param str template: The TOSCA template, as YAML.
+    :returns: The parsed template.
+    :rtype: Template
+    :raises orpy.exceptions.TemplateValidationError: If the template is not
+                                                     valid YAML or not a
+                                                     TOSCA template.
+    """
+    sha256 = digest(template)
+    with _cache_lock:
+        parsed = _cache.get(sha256)
+        if parsed is not None:
+            _cache.move_to_end(sha256)
+            return parsed
+
+    try:
+        data = yaml.safe_load(template)
+    except yaml.YAMLError as e:
+        raise exceptions.TemplateValidationError(
+            errors=["template is not valid YAML (%s)" % e]
+        )
+    if not isinstance(data, dict) or "tosca_definitions_version" not in data:
+        raise exceptions.TemplateValidationError(
+            errors=["template has no tosca_definitions_version"]
+        )
+    topology = data.get("topology_template")
+    if topology is not None and not isinstance(topology, dict):
+        raise exceptions.TemplateValidationError(
+            errors=["topology_template is not a mapping"]
+        )
+    inputs = (topology or {}).get("inputs")
+    if inputs is not None and not isinstance(inputs, dict):
+        raise exceptions.TemplateValidationError(errors=["inputs is not a mapping"])
+
+    parsed = Template(data, sha256=sha256)
+    with _cache_lock:
+        _cache[sha256] = parsed
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
+
+
+def validate(template, parameters=None):
+    """Parse a TOSCA template and check its input parameters.
+
+    :param str template: The TOSCA template, as YAML.
+    :param dict parameters: The input parameters.
+    :returns: The parsed template.
+    :rtype: Template
+    :raises orpy.exceptions.TemplateValidationError: If there are errors.
+    """
+    parsed = parse(template)
+    parsed.validate(parameters)
+    return parsed
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Trace spans of the operations done with the Orchestrator.
+
+Every logical operation of the client (e.g. ``deployments.list()``) is
+traced as a span, with a child span for each HTTP request done (one per
+page of a listing, and one per attempt when failing over to another
+Orchestrator instance) and for each access token fetch. Spans are sent to
+the tracer given to the client::
+
+    tracer = tracing.JSONFileTracer("/tmp/orpy-spans.jsonl")
+    cli = client.OrpyClient(url, token=token, tracer=tracer)
+
+By default spans are discarded, with no overhead.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover
+    otel_trace = None
+
+from orpy import exceptions
+
+
+def traced(name):
+    """Trace every call to a method of a client interface as a span.
+
+    The decorated method must belong to an object holding the OrpyClient in
+    its ``client`` attribute, like orpy.client.deployments.Deployments.
+
+    :param str name: The name of the span.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.client.tracer.span(name):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Span(object):
+    """A span that is discarded."""
+
+    def set_attribute(self, key, value):
+        """Set an attribute of the span."""
+
+    def record_error(self, error):
+        """Record that the operation of the span failed.
+
+        :param Exception error: The error.
+        """
+
+    def end(self):
+        """Finish the span."""
+
+
+_NOOP_SPAN = Span()
+
+
+class Tracer(object):
+    """A tracer that discards all the spans.
+
+    Subclasses must implement :py:meth:`start_span` and, if spans must be
+    tracked as the parent of the spans started within them,
+    :py:meth:`span`.
+    """
+
+    def start_span(self, name, **attributes):
+        """Start a span, that must be finished calling its ``end()`` method.
+
+        :param str name: The name of the span.
+        :param attributes: The attributes of the span.
+        :rtype: Span
+        """
+        return _NOOP_SPAN
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """Trace the code run within the context as a span.
+
+        Errors raised within the context are recorded in the span. The
+        context value is the span, so that attributes can be set.
+
+        :param str name: The name of the span.
+        :param attributes: The attributes of the span.
+        """
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end()
+
+
+class _FileSpan(Span):
+    def __init__(self, tracer, name, trace_id, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error = None
+        self.start = time.time()
+        self._start = time.perf_counter()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.error = "%s: %s" % (type(error).__name__, error)
+
+    def end(self):
+        self.tracer.export(
+            {
+                "name": self.name,
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "start": self.start,
+                "duration": time.perf_counter() - self._start,
+                "attributes": self.attributes,
+                "error": self.error,
+            }
+        )
+
+
+class JSONFileTracer(Tracer):
+    """Write the spans to a file, as JSON lines, for offline analysis.
+
+    Each line is a finished span, with its ``name``, ``trace_id``,
+    ``span_id``, ``parent_id`` (None for root spans), ``start`` (as a UNIX
+    timestamp), ``duration`` (in seconds), ``attributes`` and ``error``
+    (None if it succeeded). Spans are appended to the file as soon as they
+    finish, so children are written before their parents.
+    """
+
+    def __init__(self, path):
+        """Initialize the tracer.
+
+        :param str path: The file to append the spans to.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = open(path, "a")
+
+    def _current(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start_span(self, name, **attributes):
+        """Start a span, child of the current one (if any)."""
+        stack = self._current()
+        if stack:
+            trace_id, parent_id = stack[-1].trace_id, stack[-1].span_id
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        return _FileSpan(self, name, trace_id, parent_id, attributes)
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """Trace the code run within the context, as the current span."""
+        stack = self._current()
+        with super(JSONFileTracer, self).span(name, **attributes) as span:
+            stack.append(span)
+            try:
+                yield span
+            finally:
+                stack.pop()
+
+    def export(self, record):
+        """Write a finished span to the file."""
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        """Close the file."""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        """Use the tracer as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the file."""
+        self.close()
+
+
+class _OpenTelemetrySpan(Span):
+    def __init__(self, span):
+        self.span = span
+
+    def set_attribute(self, key, value):
+        self.span.set_attribute(key, value)
+
+    def record_error(self, error):
+        self.span.record_exception(error)
+        self.span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+
+    def end(self):
+        self.span.end()
+
+
+class OpenTelemetryTracer(Tracer):
+    """Send the spans to OpenTelemetry.
+
+    Spans become part of the traces of the application using orpy, being
+    children of its current span. The ``opentelemetry-api`` package must be
+    installed, and the application is responsible for setting up the
+    OpenTelemetry SDK and exporters.
+    """
+
+    def __init__(self, tracer=None):
+        """Initialize the tracer.
+
+        :param tracer: The OpenTelemetry tracer to use. By default, one is
+                       got from the global tracer provider.
+        """
+        if otel_trace is None:
+            raise exceptions.InvalidUsageError(
+                "The opentelemetry-api package is needed to send spans to "
+                "OpenTelemetry."
+            )
+        if tracer is None:
+            tracer = otel_trace.get_tracer("orpy")
+        self.tracer = tracer
+
+    def start_span(self, name, **attributes):
+        """Start a span, child of the current OpenTelemetry span."""
+        return _OpenTelemetrySpan(self.tracer.start_span(name, attributes=attributes))
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """Trace the code run within the context, as the current span."""
+        with super(OpenTelemetryTracer, self).span(name, **attributes) as span:
+            with otel_trace.use_span(
+                span.span,
+                end_on_exit=False,
+                record_exception=False,
+                set_status_on_exception=False,
+            ):
+                yield span
+
+
+NOOP = Tracer()
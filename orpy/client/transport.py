@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Transports to record and replay the interactions with the Orchestrator.
+
+A transport is a requests adapter that is mounted on the client session
+(see the ``transport`` parameter of orpy.client.client.OrpyClient). Two
+transports are provided:
+
+- :class:`RecordingTransport` sends the requests to the Orchestrator as
+  usual, storing each interaction (request, response and the time it took)
+  in a cassette file.
+- :class:`ReplayTransport` answers the requests from a cassette file,
+  without touching the network, optionally waiting the recorded (or scaled)
+  time for each response.
+
+Cassettes are gzip compressed files with one JSON document per line: a
+header followed by one line per interaction. Interactions are matched by
+method, path and query string (not by host). The path is taken relative to
+the URL of the client using the transport (recorded along with each
+request), so a cassette recorded against a production Orchestrator can be
+replayed with any URL. Authorization headers and cookies are never
+recorded.
+"""
+
+import base64
+import collections
+import datetime
+import gzip
+import io
+import json
+import threading
+import time
+
+import requests
+from requests import adapters
+from requests import structures
+from six.moves.urllib import parse
+
+from orpy import exceptions
+from orpy import version
+
+CASSETTE_VERSION = 1
+
+_SECRET_HEADERS = ("authorization", "cookie", "set-cookie")
+
+
+def _split(url, bases=()):
+    """Split the path of a URL into the base path (if any) and the rest."""
+    path = parse.urlsplit(url).path
+    for base in bases:
+        if base and (path == base or path.startswith(base + "/")):
+            return base, path[len(base) :] or "/"  # noqa: E203
+    return "", path
+
+
+def _key(method, url, bases=()):
+    query = parse.urlsplit(url).query
+    query = "&".join(sorted(query.split("&"))) if query else ""
+    return method.upper(), _split(url, bases)[1], query
+
+
+class _BaseURLs(object):
+    """Base paths of the clients using a transport (in ``_bases``)."""
+
+    def bind(self, url):
+        """Register the URL of a client using the transport.
+
+        Called by orpy.client.client.OrpyClient, so that the requests are
+        matched by their path relative to this URL.
+
+        :param str url: The Orchestrator URL of the client.
+        """
+        base = parse.urlsplit(url).path.rstrip("/")
+        if base and base not in self._bases:
+            self._bases.append(base)
+            # Longest first, so that nested base paths are matched properly
+            self._bases.sort(key=len, reverse=True)
+
+
+def _encode_body(body):
+    if body is None:
+        return None, None
+    if isinstance(body, str):
+        return body, None
+    try:
+        return body.decode("utf-8"), None
+    except UnicodeDecodeError:
+        return base64.b64encode(body).decode("ascii"), "base64"
+
+
+def _decode_body(body, encoding):
+    if body is None:
+        return b""
+    if encoding == "base64":
+        return base64.b64decode(body)
+    return body.encode("utf-8")
+
+
+def _headers(headers):
+    return dict((k, v) for k, v in headers.items() if k.lower() not in _SECRET_HEADERS)
+
+
+def load(path):
+    """Load the interactions stored in a cassette file.
+
+    :param str path: The path of the cassette.
+    :returns: The header of the cassette and the list of interactions.
+    :rtype: tuple
+    """
+    with gzip.open(path, "rt") as f:
+        lines = (json.loads(line) for line in f if line.strip())
+        try:
+            header = next(lines)
+        except StopIteration:
+            header = {}
+        if header.get("version") != CASSETTE_VERSION:
+            raise exceptions.InvalidUsageError(
+                "%s is not a valid orpy cassette (version %s)."
+                % (path, header.get("version"))
+            )
+        return header, list(lines)
+
+
+class RecordingTransport(_BaseURLs, adapters.HTTPAdapter):
+    """Transport that records the interactions in a cassette file.
+
+    Requests are sent with the default requests adapter. The cassette is
+    written as the requests are done, and it is finished when the transport
+    (or the client session) is closed::
+
+        transport = transport.RecordingTransport("listing.cassette.gz")
+        cli = client.OrpyClient(url, token=token, transport=transport)
+        cli.deployments.list()
+        transport.close()
+    """
+
+    def __init__(self, path, **kwargs):
+        """Initialize the transport.
+
+        :param str path: The path of the cassette to create (overwriting it).
+        :param kwargs: Other arguments passed to requests.adapters.HTTPAdapter.
+        """
+        super(RecordingTransport, self).__init__(**kwargs)
+        self.path = path
+        self.recorded = 0
+        self._bases = []
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt")
+        self._write(
+            {
+                "version": CASSETTE_VERSION,
+                "orpy": version.__version__,
+                "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            }
+        )
+
+    def _write(self, data):
+        self._file.write(json.dumps(data, separators=(",", ":")))
+        self._file.write("\n")
+
+    def send(self, request, **kwargs):
+        """Send the request and record the interaction."""
+        start = time.monotonic()
+        resp = super(RecordingTransport, self).send(request, **kwargs)
+        # Read the whole body, so that the elapsed time is the real one
+        content = resp.content
+        elapsed = time.monotonic() - start
+
+        req_body, req_encoding = _encode_body(request.body)
+        body, encoding = _encode_body(content)
+        interaction = {
+            "elapsed": round(elapsed, 6),
+            "request": {
+                "method": request.method,
+                "url": request.url,
+                "base": _split(request.url, self._bases)[0],
+                "headers": _headers(request.headers),
+                "body": req_body,
+                "encoding": req_encoding,
+            },
+            "response": {
+                "status": resp.status_code,
+                "reason": resp.reason,
+                "headers": _headers(resp.headers),
+                "body": body,
+                "encoding": encoding,
+            },
+        }
+        with self._lock:
+            if self._file is not None:
+                self._write(interaction)
+                self.recorded += 1
+        return resp
+
+    def close(self):
+        """Finish the cassette and close the connections."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        super(RecordingTransport, self).close()
+
+    def __enter__(self):
+        """Use the transport as a context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the transport."""
+        self.close()
+
+
+class ReplayTransport(_BaseURLs, adapters.BaseAdapter):
+    """Transport that answers the requests from a cassette file.
+
+    Interactions for the same request are replayed in the order they were
+    recorded; once they are exhausted, the last one is repeated. Requests
+    that were not recorded fail with orpy.exceptions.CassetteMissError.
+
+    With ``speed=1`` each response takes the time it took when it was
+    recorded, ``speed=2`` replays twice as fast and ``speed=None`` (the
+    default) answers immediately::
+
+        transport = transport.ReplayTransport("listing.cassette.gz", speed=1)
+        cli = client.OrpyClient("http://replay/", token="-", transport=transport)
+        cli.deployments.list()
+    """
+
+    def __init__(self, path, speed=None):
+        """Initialize the transport.
+
+        :param str path: The path of the cassette to replay.
+        :param float speed: Factor to scale the recorded timings, or None to
+                            answer without waiting.
+        """
+        super(ReplayTransport, self).__init__()
+        if speed is not None and speed <= 0:
+            raise exceptions.InvalidUsageError("Replay speed must be positive.")
+        self.path = path
+        self.speed = speed
+        self.replayed = 0
+        self._bases = []
+        self.header, interactions = load(path)
+
+        self._lock = threading.Lock()
+        self._interactions = collections.defaultdict(collections.deque)
+        recorded = set()
+        for interaction in interactions:
+            req = interaction["request"]
+            key = _key(req["method"], req["url"], [req.get("base") or ""])
+            self._interactions[key].append(interaction)
+            recorded.add(req.get("base") or "")
+        self._recorded_bases = sorted(recorded, key=len, reverse=True)
+
+    def _next(self, request):
+        keys = (
+            _key(request.method, request.url, self._bases),
+            # Absolute links found in recorded responses (e.g. next pages)
+            _key(request.method, request.url, self._recorded_bases),
+            # Interactions recorded without a client (i.e. by full path)
+            _key(request.method, request.url),
+        )
+        with self._lock:
+            queue = None
+            for key in keys:
+                queue = self._interactions.get(key)
+                if queue:
+                    break
+            if not queue:
+                raise exceptions.CassetteMissError(
+                    method=request.method, url=request.url, path=self.path
+                )
+            interaction = queue[0]
+            if len(queue) > 1:
+                queue.popleft()
+            self.replayed += 1
+        return interaction
+
+    def send(self, request, **kwargs):
+        """Answer the request with the recorded response."""
+        interaction = self._next(request)
+        if self.speed is not None:
+            time.sleep(interaction["elapsed"] / self.speed)
+
+        data = interaction["response"]
+        resp = requests.Response()
+        resp.status_code = data["status"]
+        resp.reason = data.get("reason")
+        resp.headers = structures.CaseInsensitiveDict(data["headers"])
+        # The body is stored already decoded
+        resp.headers.pop("Content-Encoding", None)
+        resp.raw = io.BytesIO(_decode_body(data["body"], data.get("encoding")))
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        resp.elapsed = datetime.timedelta(seconds=interaction["elapsed"])
+        return resp
+
+    def close(self):
+        """Close the transport (nothing to do)."""
@@ -66,6 +66,39 @@ class InvalidUrlError(ClientError):
     message = "URL provided is not a valid orchestrator (%(url)s)."
 
 
+class DependencyCycleError(ClientError):
+    """Cycle found in the resource dependency graph."""
+
+    message = "Dependency cycle detected among resources: %(resources)s."
+
+
+class CircuitOpenError(ClientError):
+    """The circuit breaker is open, the Orchestrator is not healthy."""
+
+    message = (
+        "The Orchestrator is not healthy, failing fast without sending the "
+        "request (will retry in %(retry_in)s seconds)."
+    )
+
+
+class CassetteMissError(ClientError):
+    """No recorded interaction matches a request being replayed."""
+
+    message = "No recorded interaction for %(method)s %(url)s in %(path)s."
+
+
+class TemplateValidationError(ClientError):
+    """The TOSCA template or its parameters are not valid."""
+
+    message = "Invalid TOSCA template or parameters: %(errors)s"
+
+    def __init__(self, *args, **kwargs):
+        """Initialize error, and setup the errors attribute."""
+        self.errors = list(kwargs.get("errors") or [])
+        kwargs["errors"] = "; ".join(self.errors)
+        super(TemplateValidationError, self).__init__(*args, **kwargs)
+
+
 class RetryAfterExceptionError(ClientError):
     """Base class for ClientErrors that use Retry-After header."""
 
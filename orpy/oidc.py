@@ -16,22 +16,46 @@
 
 """A module to interact with an OIDC agent."""
 
+import contextlib
+import hashlib
 import json
+import logging
+import os
 import socket
+import threading
+import time
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+import requests
+from six.moves.urllib import parse
+
+from orpy.client import client
 from orpy import exceptions
 from orpy import utils
 
+LOG = logging.getLogger(__name__)
+
 
 class OpenIDConnectAgent(object):
-    """Communicate with an OpenID Connect agent."""
+    """Communicate with an OpenID Connect agent.
+
+    Tokens obtained from the agent are cached until they are about to expire
+    (i.e. when their remaining validity is below ``validity``), so that the
+    agent is not contacted for every request. The object can be shared
+    between threads: only one of them contacts the agent at a time, while
+    the rest wait and reuse the token obtained.
+    """
 
     def __init__(self, account, socket_path=None, validity=60):
         """Initialize OpenID Connect Agent connection.
 
         :param str account: Account name to use
         :param str socket_path: Path to the oidc-agent UNIX socket
-        :param int validity: Minimum validity (minutes) for the token
+        :param int validity: Minimum validity (seconds) for the token
         """
         self.account = account
         self.validity = validity
@@ -41,43 +65,299 @@ class OpenIDConnectAgent(object):
 
         self.socket_path = socket_path
 
+        self._lock = threading.Lock()
+        self._token = None
+
+    def _is_valid(self, token):
+        if not token or not token.get("expires_at"):
+            return False
+        return token["expires_at"] - time.time() > self.validity
+
     def get_token(self):
-        """Communicate with the oidc agent and get an access token.
+        """Get an access token, from the cache or from the oidc agent.
+
+        :returns: A dictionary containing the access token
+        :rtype: dict
+        """
+        with self._lock:
+            if not self._is_valid(self._token):
+                self._token = self._request_token(self.validity)
+            return self._token
 
+    def refresh(self, min_valid_period=None):
+        """Get a new access token from the oidc agent, updating the cache.
+
+        :param int min_valid_period: Minimum validity (seconds) of the new
+                                     token. Defaults to ``validity``.
         :returns: A dictionary containing the access token
         :rtype: dict
         """
+        with self._lock:
+            self._token = self._request_token(min_valid_period or self.validity)
+            return self._token
+
+    def _request_token(self, min_valid_period):
+        """Communicate with the oidc agent and get an access token."""
         message = {
             "request": "access_token",
             "account": self.account,
-            "min_valid_period": self.validity,
+            "min_valid_period": min_valid_period,
             "application_hint": "orpy",
         }
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         try:
-            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            self._sock.connect(self.socket_path)
-            self._sock.sendall(json.dumps(message).encode())
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(message).encode())
 
-            data = ""
+            data = b""
             while True:
-                recv = self._sock.recv(16).decode()
+                recv = sock.recv(4096)
                 if recv:
                     data += recv
                 else:
                     break
         except socket.error as err:
-            raise exceptions.AuthExceptiob(
+            raise exceptions.AuthError(
                 err="Cannot communicate with the " "oidc-agent: %s" % err
             )
         finally:
-            self._sock.close()
+            sock.close()
 
-        token = json.loads(data)
+        token = json.loads(data.decode())
         if token.get("status") == "failure":
             raise exceptions.AuthError(err=token.get("error"))
         return token
 
 
+class TokenStore(object):
+    """Store tokens in a file, shared by several processes.
+
+    The file is only readable by its owner, and it is accessed holding an
+    exclusive lock on a companion ``.lock`` file, so that concurrent
+    processes do not renew the same token at the same time.
+    """
+
+    def __init__(self, path):
+        """Initialize the store.
+
+        :param str path: Path of the file to store the tokens in.
+        """
+        self.path = path
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Hold an exclusive lock on the store."""
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def load(self):
+        """Load the stored data, or an empty dictionary."""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save(self, data):
+        """Store the data, atomically replacing the previous one."""
+        tmp = "%s.%s.tmp" % (self.path, os.getpid())
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+class OpenIDConnectRefreshToken(object):
+    """Get access tokens with an OAuth 2.0 refresh token.
+
+    This provider does the refresh token grant against the token endpoint of
+    the OpenID Connect provider (e.g. INDIGO IAM), and can be used where
+    oidc-agent is not available (e.g. batch nodes or containers)::
+
+        provider = oidc.OpenIDConnectRefreshToken.from_orchestrator(
+            url, refresh_token, client_id, client_secret=client_secret
+        )
+        cli = client.OrpyClient(url, oidc_agent=provider)
+
+    Access tokens are reused until their remaining validity is below
+    ``validity`` seconds. They are kept in memory and, unless ``store`` is
+    False, in a file under the orpy cache directory, shared (with file
+    locking) by all the orpy processes using the same refresh token, so that
+    a single token is requested for all of them. If the provider rotates the
+    refresh token, the new one is stored and used from then on.
+    """
+
+    def __init__(
+        self,
+        refresh_token,
+        client_id,
+        client_secret=None,
+        token_endpoint=None,
+        issuer=None,
+        scopes=None,
+        validity=60,
+        store=True,
+        timeout=10,
+    ):
+        """Initialize the provider.
+
+        :param str refresh_token: The refresh token.
+        :param str client_id: The OAuth 2.0 client ID.
+        :param str client_secret: The client secret, for confidential
+                                  clients.
+        :param str token_endpoint: The URL of the token endpoint. If not set,
+                                   it is discovered from the issuer.
+        :param str issuer: The URL of the OpenID Connect provider, used to
+                           discover the token endpoint.
+        :param list scopes: Scopes to request, if not all the ones granted to
+                            the refresh token are needed.
+        :param int validity: Minimum validity (seconds) for the token.
+        :param store: Path of the file to store the tokens, True to use the
+                      default file in the orpy cache directory, or False to
+                      keep them only in memory.
+        :param float timeout: Timeout (seconds) for the requests.
+        """
+        if not (token_endpoint or issuer):
+            raise exceptions.InvalidUsageError(
+                "Either the token endpoint or the issuer must be set."
+            )
+        self.refresh_token = refresh_token
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_endpoint = token_endpoint
+        self.issuer = issuer
+        self.scopes = scopes
+        self.validity = validity
+        self.timeout = timeout
+
+        if store is True:
+            key = hashlib.sha256(
+                (
+                    "%s %s %s" % (issuer or token_endpoint, client_id, refresh_token)
+                ).encode("utf-8")
+            ).hexdigest()
+            store = os.path.join(utils.cache_dir("tokens"), key[:32] + ".json")
+        self.store = TokenStore(store) if store else None
+
+        self._lock = threading.Lock()
+        self._token = None
+
+    @classmethod
+    def from_orchestrator(cls, url, refresh_token, client_id, **kwargs):
+        """Create a provider, discovering the issuer from the Orchestrator.
+
+        The issuer is taken from the ``iam_url`` of the Orchestrator
+        configuration (see orpy.client.config.Config).
+
+        :param url: The Orchestrator URL, or an OrpyClient object.
+        :param str refresh_token: The refresh token.
+        :param str client_id: The OAuth 2.0 client ID.
+        :param kwargs: Other arguments passed to the constructor.
+        """
+        if not isinstance(url, client.OrpyClient):
+            url = client.OrpyClient(url)
+        config = url.config.get(authenticated=False).to_dict()
+        for key in ("iam_url", "iamUrl", "issuer"):
+            if config.get(key):
+                return cls(refresh_token, client_id, issuer=config[key], **kwargs)
+        raise exceptions.AuthError(
+            err="Cannot discover the OpenID Connect provider from %s" % url.url
+        )
+
+    def _discover(self):
+        url = parse.urljoin(
+            self.issuer.rstrip("/") + "/", ".well-known/openid-configuration"
+        )
+        try:
+            resp = requests.get(url, timeout=self.timeout)
+            resp.raise_for_status()
+            self.token_endpoint = resp.json()["token_endpoint"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            raise exceptions.AuthError(
+                err="Cannot discover the token endpoint of %s: %s" % (self.issuer, e)
+            )
+        return self.token_endpoint
+
+    def _is_valid(self, token):
+        if not token or not token.get("expires_at"):
+            return False
+        return token["expires_at"] - time.time() > self.validity
+
+    def _grant(self, refresh_token):
+        endpoint = self.token_endpoint or self._discover()
+        data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+        if self.scopes:
+            data["scope"] = " ".join(self.scopes)
+        auth = None
+        if self.client_secret:
+            auth = (self.client_id, self.client_secret)
+        else:
+            data["client_id"] = self.client_id
+
+        now = time.time()
+        try:
+            resp = requests.post(endpoint, data=data, auth=auth, timeout=self.timeout)
+            body = resp.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise exceptions.AuthError(err="Cannot refresh the access token: %s" % e)
+        if resp.status_code != 200 or "access_token" not in body:
+            raise exceptions.AuthError(
+                err="Cannot refresh the access token: %s"
+                % body.get("error_description", body.get("error", resp.status_code))
+            )
+
+        token = {"access_token": body["access_token"], "issuer": self.issuer}
+        if body.get("expires_in"):
+            token["expires_at"] = int(now + body["expires_in"])
+        return token, body.get("refresh_token") or refresh_token
+
+    def _renew(self, force):
+        if self.store is None:
+            if force or not self._is_valid(self._token):
+                self._token, self.refresh_token = self._grant(self.refresh_token)
+            return self._token
+
+        with self.store.lock():
+            data = self.store.load()
+            token = data.get("token")
+            if force or not self._is_valid(token):
+                refresh_token = data.get("refresh_token") or self.refresh_token
+                token, refresh_token = self._grant(refresh_token)
+                self.store.save({"token": token, "refresh_token": refresh_token})
+            return token
+
+    def get_token(self):
+        """Get an access token, only renewing it if needed.
+
+        :returns: A dictionary containing the access token
+        :rtype: dict
+        """
+        with self._lock:
+            if not self._is_valid(self._token):
+                self._token = self._renew(force=False)
+            return self._token
+
+    def refresh(self, min_valid_period=None):
+        """Get a new access token, updating the cache.
+
+        :param int min_valid_period: Ignored, the new token will have the
+                                     validity set by the provider.
+        :returns: A dictionary containing the access token
+        :rtype: dict
+        """
+        with self._lock:
+            self._token = self._renew(force=True)
+            return self._token
+
+
 class OpenIDConnectSession(object):
     """Get the token from an object session.
 
@@ -109,3 +389,134 @@ class OpenIDConnectSession(object):
         """
         token = self._session.token
         return token
+
+
+class TokenRefresher(object):
+    """Renew access tokens in the background, before they expire.
+
+    This class wraps a token provider (e.g. an OpenIDConnectAgent object)
+    and runs a daemon thread that gets a new token ``margin`` seconds before
+    the current one expires (according to its ``expires_at`` field), so that
+    the requests never have to wait for a token to be renewed. It can be
+    used wherever the wrapped provider is used::
+
+        agent = oidc.OpenIDConnectAgent("oidc-agent-account")
+        with oidc.TokenRefresher(agent) as refresher:
+            cli = client.OrpyClient(url, oidc_agent=refresher)
+
+    If the background renewal fails (or the provider keeps returning a
+    token that does not last longer), it is retried every ``retry_interval``
+    seconds, and once the token is about to expire :py:meth:`get_token`
+    falls back to get it from the provider.
+    """
+
+    def __init__(self, provider, margin=300, retry_interval=30, min_interval=5):
+        """Initialize the refresher.
+
+        :param provider: The object to get the tokens from, with a
+                         ``get_token()`` method (and, optionally, a
+                         ``refresh(min_valid_period)`` method to force the
+                         renewal).
+        :param float margin: Seconds before the expiration of the token to
+                             renew it.
+        :param float retry_interval: Seconds to wait before retrying a failed
+                                     renewal.
+        :param float min_interval: Minimum number of seconds between
+                                   renewals.
+        """
+        self.provider = provider
+        self.margin = margin
+        self.retry_interval = retry_interval
+        self.min_interval = min_interval
+        self.refreshes = 0
+
+        self._lock = threading.Lock()
+        self._token = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start renewing the tokens in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="orpy-token-refresher"
+            )
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        """Start the refresher."""
+        return self.start()
+
+    def __exit__(self, *args):
+        """Stop the refresher."""
+        self.stop()
+
+    def _renew(self):
+        """Get a new token from the provider.
+
+        :returns: The token, and whether it lasts longer than the previous
+                  one.
+        """
+        refresh = getattr(self.provider, "refresh", None)
+        if refresh is not None:
+            # Ask for more than the margin, otherwise oidc-agent may answer
+            # with the cached token that we are trying to replace
+            token = refresh(min_valid_period=self.margin + self.min_interval)
+        else:
+            token = self.provider.get_token()
+        with self._lock:
+            previous, self._token = self._token, token
+            if previous is None:
+                renewed = True
+            elif token.get("expires_at") and previous.get("expires_at"):
+                renewed = token["expires_at"] > previous["expires_at"]
+            else:
+                renewed = token.get("access_token") != previous.get("access_token")
+            if renewed:
+                self.refreshes += 1
+        return token, renewed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                token, renewed = self._renew()
+            except Exception as e:
+                LOG.warning("Cannot renew the access token: %s", e)
+                wait = self.retry_interval
+            else:
+                expires_at = token.get("expires_at")
+                if expires_at:
+                    wait = expires_at - time.time() - self.margin
+                else:
+                    wait = self.margin
+                if renewed:
+                    wait = max(wait, self.min_interval)
+                else:
+                    LOG.warning("The access token was not renewed, retrying later")
+                    wait = max(wait, self.retry_interval)
+            self._stop.wait(wait)
+
+    def get_token(self):
+        """Get the current access token, without waiting for its renewal.
+
+        :returns: A dictionary containing the access token
+        :rtype: dict
+        """
+        with self._lock:
+            token = self._token
+        if token is not None:
+            expires_at = token.get("expires_at")
+            if not expires_at or expires_at - time.time() > self.margin:
+                return token
+        # Not renewed yet (or the renewal is failing), get it ourselves
+        return self.provider.get_token()
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2019 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Timing of the different phases of an orpy execution.
+
+Code paths worth measuring are wrapped with :py:func:`phase`::
+
+    with profiling.phase("http", method="GET") as details:
+        resp = session.request(...)
+        details["status"] = resp.status_code
+
+When no profiler is enabled (the default) this is a no-op. Once a
+:py:class:`Profiler` is enabled with :py:func:`enable`, every phase is
+recorded, and a report with the timeline and the totals per phase can be
+printed. This is what the ``--profile`` option of the CLI does.
+"""
+
+import collections
+import contextlib
+import cProfile
+import functools
+import threading
+import time
+import tracemalloc
+
+_PROFILER = None
+
+
+class _Details(dict):
+    """Details of a phase that is not being recorded, ignoring any update."""
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NullPhase(object):
+    """A phase that is not being recorded (contextlib.nullcontext needs 3.7)."""
+
+    def __init__(self):
+        self.details = _Details()
+
+    def __enter__(self):
+        return self.details
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL = _NullPhase()
+
+Record = collections.namedtuple(
+    "Record", ["name", "start", "duration", "depth", "details"]
+)
+
+
+class Profiler(object):
+    """Record the duration of the phases of an execution.
+
+    Optionally, the execution can also be profiled with cProfile and the
+    memory allocations traced with tracemalloc.
+    """
+
+    def __init__(self, start=None, cprofile=False, memory=False):
+        """Initialize the profiler.
+
+        :param float start: Start of the execution, as returned by
+                            time.perf_counter(). Defaults to now.
+        :param bool cprofile: Whether to profile the execution with cProfile.
+        :param bool memory: Whether to trace memory allocations.
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.records = []
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.memory = memory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def begin(self):
+        """Start the cProfile profiler and memory tracing, if requested."""
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        if self.memory:
+            tracemalloc.start()
+
+    def finish(self):
+        """Stop the cProfile profiler and memory tracing."""
+        self.end = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.disable()
+
+    def add(self, name, start, end, depth=0, **details):
+        """Record a phase that has already finished.
+
+        :param str name: The name of the phase.
+        :param float start: Start of the phase (from time.perf_counter()).
+        :param float end: End of the phase (from time.perf_counter()).
+        :param int depth: Nesting level of the phase.
+        :param details: Other information about the phase.
+        """
+        record = Record(name, start - self.start, end - start, depth, details)
+        with self._lock:
+            self.records.append(record)
+
+    @contextlib.contextmanager
+    def phase(self, name, **details):
+        """Record the duration of the code run within the context.
+
+        The context value is a dictionary of details of the phase, that can
+        be updated within the context.
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield details
+        finally:
+            self._local.depth = depth
+            self.add(name, start, time.perf_counter(), depth, **details)
+
+    def totals(self):
+        """Get the number of calls, total and max duration of each phase.
+
+        :returns: An ordered dictionary, in order of first appearance.
+        """
+        totals = collections.OrderedDict()
+        for r in sorted(self.records, key=lambda r: r.start):
+            calls, total, max_ = totals.get(r.name, (0, 0, 0))
+            totals[r.name] = (calls + 1, total + r.duration, max(max_, r.duration))
+        return totals
+
+    def report(self, stream, timeline=100, top=10):
+        """Write a report of the recorded phases.
+
+        :param stream: The file-like object to write the report to.
+        :param int timeline: Maximum number of phases to show in the
+                             timeline.
+        :param int top: Number of entries to show from the cProfile and
+                        tracemalloc statistics.
+        """
+        end = self.end or time.perf_counter()
+        stream.write("Profile (total %.3fs):\n" % (end - self.start))
+        stream.write("  %-24s %6s %10s %10s\n" % ("phase", "calls", "total", "max"))
+        for name, (calls, total, max_) in self.totals().items():
+            stream.write("  %-24s %6d %9.3fs %9.3fs\n" % (name, calls, total, max_))
+
+        records = sorted(self.records, key=lambda r: r.start)
+        stream.write("Timeline:\n")
+        for r in records[:timeline]:
+            details = ", ".join("%s=%s" % i for i in sorted(r.details.items()))
+            stream.write(
+                "  +%.3fs %8.3fs %s%s%s\n"
+                % (
+                    r.start,
+                    r.duration,
+                    "  " * r.depth,
+                    r.name,
+                    " [%s]" % details if details else "",
+                )
+            )
+        if len(records) > timeline:
+            stream.write("  ... %d more\n" % (len(records) - timeline))
+
+        if self.cprofile is not None:
+            import pstats
+
+            stream.write("cProfile (by cumulative time):\n")
+            stats = pstats.Stats(self.cprofile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(top)
+
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            stream.write(
+                "Memory (current %.1f KiB, peak %.1f KiB), top allocations:\n"
+                % (current / 1024.0, peak / 1024.0)
+            )
+            for stat in snapshot.statistics("lineno")[:top]:
+                stream.write("  %s\n" % stat)
+
+    def dump(self, path):
+        """Dump the cProfile statistics to a file, for pstats or snakeviz."""
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(path)
+
+
+def enable(profiler):
+    """Record the phases with the given profiler."""
+    global _PROFILER
+    _PROFILER = profiler
+    return profiler
+
+
+def disable():
+    """Stop recording the phases."""
+    global _PROFILER
+    _PROFILER = None
+
+
+def get():
+    """Get the profiler in use, if any."""
+    return _PROFILER
+
+
+def phase(name, **details):
+    """Record the duration of a phase, if a profiler is enabled.
+
+    :param str name: The name of the phase.
+    :param details: Other information about the phase.
+    :returns: A context manager, whose value is a dictionary where further
+              details can be set.
+    """
+    if _PROFILER is None:
+        return _NULL
+    return _PROFILER.phase(name, **details)
+
+
+def wrap(obj, name, phase_name):
+    """Record every call to a method of an object as a phase.
+
+    :param obj: The object whose method will be wrapped.
+    :param str name: The name of the method.
+    :param str phase_name: The name of the phase to record.
+    """
+    method = getattr(obj, name)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with phase(phase_name):
+            return method(*args, **kwargs)
+
+    setattr(obj, name, wrapper)
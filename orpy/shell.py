@@ -17,19 +17,29 @@
 
 """Module that implements the CLI."""
 
-import argparse
-import sys
+import time
 
-from cliff import app
-from cliff import command
-from cliff import commandmanager
-from cliff import complete
-from cliff import help
+# Measured as early as possible, for the import phase of --profile
+_START = time.perf_counter()
 
-from orpy.client import client
-from orpy import oidc
-from orpy import utils
-from orpy import version
+import argparse  # noqa: E402
+import sys  # noqa: E402
+
+from cliff import app  # noqa: E402
+from cliff import command  # noqa: E402
+from cliff import commandmanager  # noqa: E402
+from cliff import complete  # noqa: E402
+from cliff import help  # noqa: E402
+
+from orpy.client import client  # noqa: E402
+from orpy.client import multi  # noqa: E402
+from orpy.client import transport  # noqa: E402
+from orpy import oidc  # noqa: E402
+from orpy import profiling  # noqa: E402
+from orpy import utils  # noqa: E402
+from orpy import version  # noqa: E402
+
+_IMPORTED = time.perf_counter()
 
 
 class OrpyApp(app.App):
@@ -47,9 +57,16 @@ class OrpyApp(app.App):
         self.client = None
         self.token = None
         self.oidc_agent = None
+        self.transport = None
+        self.profiler = None
+        self._run_start = None
 
         # Patch command.Command to add a default auth_required = True
         command.Command.auth_required = True
+        # Most commands only work with a single orchestrator
+        command.Command.multi_orchestrator = False
+        # Only a few commands work locally, without an orchestrator
+        command.Command.client_required = True
 
         # Some commands do not need authentication
         help.HelpCommand.auth_required = False
@@ -63,27 +80,69 @@ class OrpyApp(app.App):
             deferred_help=True,
         )
 
+    def run(self, argv):
+        """Run the application, recording when we started to parse options."""
+        self._run_start = time.perf_counter()
+        return super(OrpyApp, self).run(argv)
+
     def initialize_app(self, argv):
         """Initialize the Cliff application."""
         for cmd in self.commands:
             self.command_manager.add_command(cmd.__name__.lower(), cmd)
 
+        opts = self.options
+        if opts.profile or opts.profile_output or opts.profile_memory:
+            self.profiler = profiling.Profiler(
+                start=_START,
+                cprofile=bool(opts.profile_output),
+                memory=opts.profile_memory,
+            )
+            self.profiler.add("import", _START, _IMPORTED)
+            if self._run_start is not None:
+                self.profiler.add("options", self._run_start, time.perf_counter())
+            profiling.enable(self.profiler)
+            self.profiler.begin()
+
     def prepare_to_run_command(self, cmd):
         """Do preliminary stuff to run the command."""
         if isinstance(cmd, help.HelpCommand):
             return
 
-        if not self.options.orchestrator_url:
+        if self.profiler is not None:
+            profiling.wrap(cmd, "take_action", "command")
+            profiling.wrap(cmd, "produce_output", "format")
+
+        if not cmd.client_required:
+            return
+
+        with profiling.phase("client init"):
+            self._prepare_client(cmd)
+
+    def _prepare_client(self, cmd):
+        urls = self.options.orchestrator_url or []
+        if not urls and utils.env("ORCHESTRATOR_URL"):
+            urls = [utils.env("ORCHESTRATOR_URL")]
+
+        if not urls:
             self.parser.error(
                 "No URL for the orchestrator has been suplied "
                 "use --url or set the ORCHESTRATOR_URL "
                 "environment variable."
             )
 
+        if len(urls) > 1 and not cmd.multi_orchestrator:
+            self.parser.error(
+                "Command '%s' does not support several orchestrators, please "
+                "use --url only once." % getattr(cmd, "cmd_name", "")
+            )
+
         if cmd.auth_required:
+            refresh = all(
+                [self.options.oidc_refresh_token, self.options.oidc_client_id]
+            )
             if (
                 not all([self.options.oidc_agent_sock, self.options.oidc_agent_account])
-            ) and not self.token:
+            ) and not (self.token or refresh):
 
                 self.parser.error(
                     "No oidc-agent has been set up or no access "
@@ -101,14 +160,60 @@ class OrpyApp(app.App):
                     self.options.oidc_agent_account,
                     socket_path=self.options.oidc_agent_sock,
                 )
+            elif refresh:
+                kwargs = {"client_secret": self.options.oidc_client_secret or None}
+                if self.options.oidc_issuer:
+                    self.oidc_agent = oidc.OpenIDConnectRefreshToken(
+                        self.options.oidc_refresh_token,
+                        self.options.oidc_client_id,
+                        issuer=self.options.oidc_issuer,
+                        **kwargs,
+                    )
+                else:
+                    self.oidc_agent = oidc.OpenIDConnectRefreshToken.from_orchestrator(
+                        urls[0],
+                        self.options.oidc_refresh_token,
+                        self.options.oidc_client_id,
+                        **kwargs,
+                    )
 
         if self.client is None:
-            self.client = client.OrpyClient(
-                self.options.orchestrator_url,
-                oidc_agent=self.oidc_agent,
-                token=self.token,
-                debug=self.options.debug,
-            )
+            if self.options.record and self.options.replay:
+                self.parser.error("--record and --replay are mutually exclusive.")
+            if self.options.record:
+                self.transport = transport.RecordingTransport(self.options.record)
+            elif self.options.replay:
+                self.transport = transport.ReplayTransport(
+                    self.options.replay, speed=self.options.replay_speed
+                )
+
+            clients = [
+                client.OrpyClient(
+                    url,
+                    oidc_agent=self.oidc_agent,
+                    token=self.token,
+                    debug=self.options.debug,
+                    transport=self.transport,
+                    compress_requests=self.options.compress_requests,
+                )
+                for url in urls
+            ]
+            if len(clients) > 1:
+                self.client = multi.MultiOrpyClient(clients)
+            else:
+                self.client = clients[0]
+
+    def clean_up(self, cmd, result, err):
+        """Finish the cassette being recorded and the profile, if any."""
+        if self.transport is not None:
+            self.transport.close()
+
+        if self.profiler is not None:
+            self.profiler.finish()
+            profiling.disable()
+            self.profiler.report(self.stderr)
+            if self.options.profile_output:
+                self.profiler.dump(self.options.profile_output)
 
     def build_option_parser(self, description, version):
         """Generate and populate the option parser."""
@@ -134,6 +239,11 @@ class OrpyApp(app.App):
     the command line with the --oidc-agent-sock and --oidc-agent-account
     parameters.
 
+    Where oidc-agent is not available, you can use an OpenID Connect refresh
+    token instead, setting 'OIDC_REFRESH_TOKEN', 'OIDC_CLIENT_ID' and, for
+    confidential clients, 'OIDC_CLIENT_SECRET' (or the corresponding
+    --oidc-* parameters).
+
 """
         parser = super(OrpyApp, self).build_option_parser(
             self.__doc__,
@@ -166,14 +276,110 @@ class OrpyApp(app.App):
             "In order to use the oidc-agent you must pass thos parameter "
             "or set the OIDC_ACCOUNT environment variable.",
         )
+        parser.add_argument(
+            "--oidc-refresh-token",
+            metavar="<refresh-token>",
+            dest="oidc_refresh_token",
+            default=utils.env("OIDC_REFRESH_TOKEN"),
+            help="OpenID Connect refresh token to get access tokens from the "
+            "OpenID Connect provider when oidc-agent is not available. "
+            "Access tokens are cached in the orpy cache directory and shared "
+            "by all the orpy processes. Requires --oidc-client-id. Defaults "
+            "to the OIDC_REFRESH_TOKEN environment variable.",
+        )
+        parser.add_argument(
+            "--oidc-client-id",
+            metavar="<client-id>",
+            dest="oidc_client_id",
+            default=utils.env("OIDC_CLIENT_ID"),
+            help="OAuth 2.0 client ID that the refresh token was issued to. "
+            "Defaults to the OIDC_CLIENT_ID environment variable.",
+        )
+        parser.add_argument(
+            "--oidc-client-secret",
+            metavar="<client-secret>",
+            dest="oidc_client_secret",
+            default=utils.env("OIDC_CLIENT_SECRET"),
+            help="OAuth 2.0 client secret, for confidential clients. Defaults "
+            "to the OIDC_CLIENT_SECRET environment variable.",
+        )
+        parser.add_argument(
+            "--oidc-issuer",
+            metavar="<issuer-url>",
+            dest="oidc_issuer",
+            default=utils.env("OIDC_ISSUER"),
+            help="URL of the OpenID Connect provider to refresh the tokens "
+            "with. If not set, it is taken from the orchestrator "
+            "configuration. Defaults to the OIDC_ISSUER environment variable.",
+        )
         parser.add_argument(
             "--url",
             metavar="<orchestrator-url>",
             dest="orchestrator_url",
-            default=utils.env("ORCHESTRATOR_URL"),
+            action="append",
+            default=None,
             help="The base url of the orchestrator rest interface. "
             "Alternative the environment variable ORCHESTRATOR_URL "
-            "can be used.",
+            "can be used. Can be specified several times to query several "
+            "orchestrators at once (only for the 'deployment list', "
+            "'deployment show' and 'resource list' commands).",
+        )
+        parser.add_argument(
+            "--compress-requests",
+            metavar="<bytes>",
+            type=int,
+            default=None,
+            help="Compress with gzip the request bodies (e.g. TOSCA templates) "
+            "of at least this size in bytes. The orchestrator, or the proxy "
+            "in front of it, must support compressed requests.",
+        )
+        parser.add_argument(
+            "--record",
+            metavar="<cassette>",
+            default=None,
+            help="Record the interactions with the orchestrator in this "
+            "cassette file, so that they can be replayed with --replay.",
+        )
+        parser.add_argument(
+            "--replay",
+            metavar="<cassette>",
+            default=None,
+            help="Answer the requests from this cassette file, recorded with "
+            "--record, instead of contacting the orchestrator.",
+        )
+        parser.add_argument(
+            "--replay-speed",
+            metavar="<factor>",
+            type=float,
+            default=None,
+            help="When replaying, wait the recorded time for each response, "
+            "scaled by this factor (e.g. 2 replays twice as fast). By "
+            "default responses are replayed immediately.",
+        )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            default=False,
+            help="Print to stderr how long each phase of the execution took "
+            "(imports, option parsing, client initialization, token "
+            "acquisition, each HTTP request, JSON decoding, model "
+            "construction and output formatting).",
+        )
+        parser.add_argument(
+            "--profile-output",
+            metavar="<file>",
+            default=None,
+            help="Profile the execution with cProfile, writing the statistics "
+            "to this file (e.g. to be inspected with pstats or snakeviz) and "
+            "printing a summary along with the --profile report.",
+        )
+        parser.add_argument(
+            "--profile-memory",
+            action="store_true",
+            default=False,
+            help="Trace the memory allocations with tracemalloc, adding the "
+            "peak memory usage and the top allocations to the --profile "
+            "report.",
         )
 
         return parser
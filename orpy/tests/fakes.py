@@ -0,0 +1,552 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""In-process fake INDIGO PaaS Orchestrator, for tests and benchmarks."""
+
+import collections
+import datetime
+import gzip
+import http.server
+import json
+import math
+import os
+import re
+import socketserver
+import threading
+import time
+import uuid as uuid_lib
+
+from six.moves.urllib import parse
+
+import fixtures
+
+STATUSES = ("CREATE_COMPLETE", "CREATE_FAILED", "CREATE_IN_PROGRESS", "DELETE_FAILED")
+PROVIDERS = ("provider-A", "provider-B", "provider-C")
+
+TEMPLATE = """tosca_definitions_version: tosca_simple_yaml_1_0
+
+topology_template:
+  inputs:
+    num_cpus:
+      type: integer
+      default: 1
+
+  node_templates:
+    server:
+      type: tosca.nodes.indigo.Compute
+"""
+
+
+def _time(seconds):
+    t = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    t += datetime.timedelta(seconds=seconds)
+    return t.strftime("%Y-%m-%dT%H:%M%z")
+
+
+class FakeOrchestrator(object):
+    """A fake Orchestrator serving its REST API over HTTP.
+
+    The fake serves ``/info``, ``/configuration``, paginated
+    ``/deployments`` and ``/deployments/{uuid}/resources`` listings, and
+    allows to show, create, update and delete deployments. As in the real
+    Orchestrator, the update time of a deployment changes when it is updated
+    and again when the update completes, which happens the next time the
+    deployment is shown. The inventory size, the default page size and a
+    latency to add to every request are configurable.
+
+    It can be used as a context manager, or as a fixture::
+
+        orchestrator = self.useFixture(fakes.FakeOrchestratorFixture(100))
+        cli = client.OrpyClient(orchestrator.url, token="token")
+    """
+
+    def __init__(
+        self, deployments=100, resources=3, page_size=10, latency=0, compress=True
+    ):
+        """Initialize the fake orchestrator.
+
+        :param int deployments: Number of deployments in the inventory.
+        :param int resources: Number of resources per deployment.
+        :param int page_size: Default page size for the listings.
+        :param float latency: Seconds to wait before answering each request.
+        :param bool compress: Whether to compress the responses with gzip
+                              when the client accepts it.
+        """
+        self.page_size = page_size
+        self.latency = latency
+        self.compress = compress
+        self.iam_url = None
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+
+        self.deployments = collections.OrderedDict()
+        self.resources = {}
+        self.templates = {}
+        self._next_index = 0
+        self._updates = 0
+        for i in range(deployments):
+            self.add_deployment(index=i, resources=resources)
+
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL of the fake orchestrator."""
+        host, port = self._server.server_address[:2]
+        return "http://%s:%s/orchestrator" % (host, port)
+
+    def update_time(self):
+        """Get a new update time, later than any previous one."""
+        with self._lock:
+            self._updates += 1
+            # One year after the creation of the inventory
+            return _time(365 * 86400 + self._updates * 60)
+
+    def add_deployment(self, index=None, resources=3, template=TEMPLATE):
+        """Add a deployment (and its resources) to the inventory."""
+        if index is None:
+            index = self._next_index
+        self._next_index = max(self._next_index, index + 1)
+        uuid = str(uuid_lib.UUID(int=index + 1))
+        self.deployments[uuid] = {
+            "uuid": uuid,
+            "creationTime": _time(index * 60),
+            "updateTime": _time(index * 60),
+            "physicalId": uuid,
+            "status": STATUSES[index % len(STATUSES)],
+            "statusReason": None,
+            "task": "NONE",
+            "cloudProviderName": PROVIDERS[index % len(PROVIDERS)],
+            "cloudProviderEndpoint": {"cpEndpoint": "https://cloud.example.org"},
+            "createdBy": {
+                "subject": "user-%d" % (index % 5),
+                "issuer": "https://iam.example.org/",
+            },
+            "outputs": {},
+            "links": [],
+        }
+        self.resources[uuid] = [
+            {
+                "uuid": "%s-%d" % (uuid, i),
+                "creationTime": _time(index * 60),
+                "state": "STARTED",
+                "toscaNodeType": "tosca.nodes.indigo.Compute",
+                "toscaNodeName": "node_%d" % i,
+                "requiredBy": ["node_%d" % (i + 1)] if i + 1 < resources else [],
+                "links": [],
+            }
+            for i in range(resources)
+        ]
+        self.templates[uuid] = template
+        return self.deployments[uuid]
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        fake = self
+
+        class Handler(_Handler):
+            orchestrator = fake
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, *args):
+        """Stop the server."""
+        self.stop()
+
+    def count(self, endpoint):
+        """Record a request to an endpoint."""
+        with self._lock:
+            self.requests[endpoint] += 1
+
+    def paginate(self, base_url, items, query):
+        """Build a paginated response, as the Orchestrator does."""
+        size = int(query.get("size", [self.page_size])[0])
+        number = int(query.get("page", [0])[0])
+        total_pages = max(1, int(math.ceil(len(items) / float(size))))
+
+        def _link(rel, page):
+            q = dict((k, v[0]) for k, v in query.items())
+            q.update({"page": page, "size": size})
+            return {"rel": rel, "href": "%s?%s" % (base_url, parse.urlencode(q))}
+
+        links = [
+            _link("first", 0),
+            _link("self", number),
+            _link("last", total_pages - 1),
+        ]
+        if number + 1 < total_pages:
+            links.append(_link("next", number + 1))
+        return {
+            "content": items[number * size : (number + 1) * size],  # noqa: E203
+            "page": {
+                "size": size,
+                "totalElements": len(items),
+                "totalPages": total_pages,
+                "number": number,
+            },
+            "links": links,
+        }
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    orchestrator = None
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    routes = [
+        ("GET", r"/info$", "info"),
+        ("GET", r"/configuration$", "configuration"),
+        ("GET", r"/deployments/?$", "list"),
+        ("POST", r"/deployments/?$", "create"),
+        ("GET", r"/deployments/(?P<uuid>[^/]+)/?$", "show"),
+        ("PUT", r"/deployments/(?P<uuid>[^/]+)/?$", "update"),
+        ("DELETE", r"/deployments/(?P<uuid>[^/]+)/?$", "delete"),
+        ("GET", r"/deployments/(?P<uuid>[^/]+)/template/?$", "template"),
+        ("GET", r"/deployments/(?P<uuid>[^/]+)/resources/?$", "resources"),
+        (
+            "GET",
+            r"/deployments/(?P<uuid>[^/]+)/resources/(?P<resource>[^/]+)/?$",
+            "resource",
+        ),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        url = parse.urlparse(self.path)
+        path = url.path
+        if path.startswith("/orchestrator"):
+            path = path[len("/orchestrator") :]  # noqa: E203
+        for method, regex, name in self.routes:
+            match = re.match(regex, path)
+            if method == self.command and match:
+                break
+        else:
+            return self._send(404, {"message": "Not found"})
+
+        fake = self.orchestrator
+        fake.count(name)
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        query = parse.parse_qs(url.query)
+        base_url = "http://%s%s" % (self.headers["Host"], url.path)
+        return getattr(self, "_do_" + name)(base_url, query, body, **match.groupdict())
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch  # noqa: N815
+
+    def _send(self, status, body=None, content_type="application/json"):
+        if body is None:
+            data = b""
+        elif isinstance(body, str):
+            data = body.encode("utf-8")
+        else:
+            data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        accepted = self.headers.get("Accept-Encoding", "")
+        if data and self.orchestrator.compress and "gzip" in accepted:
+            data = gzip.compress(data)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _get(self, uuid):
+        d = self.orchestrator.deployments.get(uuid)
+        if d is None:
+            self._send(404, {"message": "Deployment %s not found" % uuid})
+        return d
+
+    def _do_info(self, base_url, query, body):
+        self._send(200, {"build": {"version": "fake"}})
+
+    def _do_configuration(self, base_url, query, body):
+        self._send(
+            200,
+            {
+                "cpr_url": "https://cpr.example.org",
+                "im_url": None,
+                "iam_url": self.orchestrator.iam_url,
+            },
+        )
+
+    def _do_list(self, base_url, query, body):
+        with self.orchestrator._lock:
+            items = list(self.orchestrator.deployments.values())
+        sort = query.get("sort", [""])[0].split(",")
+        if sort[0]:
+            items.sort(key=lambda d: d.get(sort[0]) or "", reverse="desc" in sort)
+        self._send(200, self.orchestrator.paginate(base_url, items, query))
+
+    def _do_show(self, base_url, query, body, uuid):
+        d = self._get(uuid)
+        if d is not None:
+            if d["status"] == "UPDATE_IN_PROGRESS":
+                d["status"] = "UPDATE_COMPLETE"
+                d["updateTime"] = self.orchestrator.update_time()
+            self._send(200, d)
+
+    def _do_create(self, base_url, query, body):
+        data = json.loads(body.decode("utf-8"))
+        with self.orchestrator._lock:
+            d = self.orchestrator.add_deployment(template=data.get("template"))
+            d["status"] = "CREATE_IN_PROGRESS"
+        self._send(201, d)
+
+    def _do_update(self, base_url, query, body, uuid):
+        d = self._get(uuid)
+        if d is not None:
+            data = json.loads(body.decode("utf-8"))
+            self.orchestrator.templates[uuid] = data.get("template")
+            d["status"] = "UPDATE_IN_PROGRESS"
+            d["updateTime"] = self.orchestrator.update_time()
+            self._send(202, d)
+
+    def _do_delete(self, base_url, query, body, uuid):
+        if self._get(uuid) is not None:
+            with self.orchestrator._lock:
+                self.orchestrator.deployments.pop(uuid, None)
+            self._send(204)
+
+    def _do_template(self, base_url, query, body, uuid):
+        if self._get(uuid) is not None:
+            self._send(200, self.orchestrator.templates[uuid], "text/plain")
+
+    def _do_resources(self, base_url, query, body, uuid):
+        if self._get(uuid) is not None:
+            items = self.orchestrator.resources[uuid]
+            self._send(200, self.orchestrator.paginate(base_url, items, query))
+
+    def _do_resource(self, base_url, query, body, uuid, resource):
+        if self._get(uuid) is not None:
+            for r in self.orchestrator.resources[uuid]:
+                if r["uuid"] == resource:
+                    return self._send(200, r)
+            self._send(404, {"message": "Resource %s not found" % resource})
+
+
+class FakeOrchestratorFixture(fixtures.Fixture):
+    """Fixture running a FakeOrchestrator during a test."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the fixture, arguments are passed to FakeOrchestrator."""
+        super(FakeOrchestratorFixture, self).__init__()
+        self.orchestrator = FakeOrchestrator(*args, **kwargs)
+
+    def _setUp(self):  # noqa: N802
+        self.orchestrator.start()
+        self.addCleanup(self.orchestrator.stop)
+        self.url = self.orchestrator.url
+
+
+class FakeOIDCAgent(object):
+    """A fake oidc-agent, serving access tokens over a UNIX socket."""
+
+    def __init__(self, socket_path, lifetime=3600):
+        """Initialize the fake agent.
+
+        :param str socket_path: Path of the UNIX socket to listen on.
+        :param int lifetime: Seconds that each issued token is valid.
+        """
+        self.socket_path = socket_path
+        self.lifetime = lifetime
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def issue(self, message):
+        """Issue a new token for a request."""
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+        return {
+            "status": "success",
+            "access_token": "%s-token-%d" % (message.get("account"), n),
+            "issuer": "https://iam.example.org/",
+            "expires_at": int(time.time()) + self.lifetime,
+        }
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        fake = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                message = json.loads(self.request.recv(4096).decode())
+                self.request.sendall(json.dumps(fake.issue(message)).encode())
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            os.unlink(self.socket_path)
+
+
+class FakeOIDCAgentFixture(fixtures.Fixture):
+    """Fixture running a FakeOIDCAgent during a test."""
+
+    def __init__(self, lifetime=3600):
+        """Initialize the fixture."""
+        super(FakeOIDCAgentFixture, self).__init__()
+        self.lifetime = lifetime
+
+    def _setUp(self):  # noqa: N802
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, "agent.sock")
+        self.agent = FakeOIDCAgent(path, lifetime=self.lifetime).start()
+        self.addCleanup(self.agent.stop)
+        self.socket_path = path
+
+
+class FakeIAM(object):
+    """A fake OpenID Connect provider, implementing the refresh token grant."""
+
+    def __init__(self, refresh_token="refresh", client_id="client", lifetime=3600):
+        """Initialize the fake provider.
+
+        :param str refresh_token: The valid refresh token.
+        :param str client_id: The valid client ID.
+        :param int lifetime: Seconds that each issued token is valid.
+        """
+        self.refresh_token = refresh_token
+        self.client_id = client_id
+        self.lifetime = lifetime
+        self.rotate = False
+        self.grants = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Issuer URL of the fake provider."""
+        host, port = self._server.server_address[:2]
+        return "http://%s:%s/" % (host, port)
+
+    def grant(self, form):
+        """Do a refresh token grant, returning the status and the response."""
+        with self._lock:
+            expected = {
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token,
+                "client_id": self.client_id,
+            }
+            if any(form.get(k) != v for k, v in expected.items()):
+                return 400, {"error": "invalid_grant"}
+            self.grants += 1
+            body = {
+                "access_token": "access-%d" % self.grants,
+                "token_type": "Bearer",
+                "expires_in": self.lifetime,
+            }
+            if self.rotate:
+                self.refresh_token = body["refresh_token"] = "refresh-%d" % self.grants
+            return 200, body
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):  # noqa: N802
+                if self.path != "/.well-known/openid-configuration":
+                    return self._send(404, {})
+                self._send(
+                    200, {"issuer": fake.url, "token_endpoint": fake.url + "token"}
+                )
+
+            def do_POST(self):  # noqa: N802
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+                self._send(*fake.grant(dict((k, v[0]) for k, v in form.items())))
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+
+class FakeIAMFixture(fixtures.Fixture):
+    """Fixture running a FakeIAM during a test."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the fixture, arguments are passed to FakeIAM."""
+        super(FakeIAMFixture, self).__init__()
+        self.iam = FakeIAM(*args, **kwargs)
+
+    def _setUp(self):  # noqa: N802
+        self.iam.start()
+        self.addCleanup(self.iam.stop)
+        self.url = self.iam.url
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the circuit breaker."""
+
+import fixtures
+import mock
+import requests
+
+from orpy.client import breaker
+from orpy.client import client
+from orpy import exceptions
+from orpy.tests import base
+
+
+class TestCircuitBreaker(base.TestCase):
+    """Test the circuit breaker."""
+
+    def setUp(self):
+        """Use a fake clock."""
+        super(TestCircuitBreaker, self).setUp()
+        self.now = 0
+        m = self.useFixture(fixtures.MockPatch("orpy.client.breaker.time")).mock
+        m.monotonic.side_effect = lambda: self.now
+        self.probe = mock.Mock()
+        self.breaker = breaker.CircuitBreaker(
+            failure_threshold=2, reset_timeout=10, window=3, probe=self.probe
+        )
+
+    def test_opens_and_recovers(self):
+        """Test the closed -> open -> half-open -> closed cycle."""
+        self.breaker.record(False)
+        self.breaker.record(True)
+        self.assertEqual(breaker.CLOSED, self.breaker.state)
+        self.breaker.record(False, elapsed=1)
+        self.assertEqual(breaker.OPEN, self.breaker.state)
+        self.assertRaises(exceptions.CircuitOpenError, self.breaker.before_request)
+        self.probe.assert_not_called()
+
+        self.now = 11
+        self.assertEqual(breaker.HALF_OPEN, self.breaker.state)
+        self.breaker.before_request()
+        self.probe.assert_called_once_with()
+        self.assertEqual(breaker.CLOSED, self.breaker.state)
+
+    def test_failed_probe(self):
+        """Test that a failed probe keeps the circuit open."""
+        self.breaker.record(False)
+        self.breaker.record(False)
+        self.now = 11
+        self.probe.side_effect = Exception()
+
+        self.assertRaises(exceptions.CircuitOpenError, self.breaker.before_request)
+        self.assertEqual(breaker.OPEN, self.breaker.state)
+
+    def test_slow_requests(self):
+        """Test that slow requests count as failures."""
+        b = breaker.CircuitBreaker(failure_threshold=1, slow_threshold=2)
+        b.record(True, elapsed=1)
+        self.assertEqual(breaker.CLOSED, b.state)
+        b.record(True, elapsed=3)
+        self.assertEqual(breaker.OPEN, b.state)
+
+    def test_client_fails_fast(self):
+        """Test that the client does not hit the network when open."""
+        cli = client.OrpyClient(
+            "http://orchestrator", token="t", circuit_breaker=self.breaker
+        )
+        cli.session = mock.Mock()
+        cli.session.request.side_effect = requests.exceptions.ConnectionError()
+
+        for _ in range(2):
+            self.assertRaises(requests.exceptions.ConnectionError, cli.deployments.list)
+        self.assertRaises(exceptions.CircuitOpenError, cli.deployments.list)
+        self.assertEqual(2, cli.session.request.call_count)
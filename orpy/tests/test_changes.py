@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the detection of no-op deployment updates."""
+
+import os
+
+import fixtures
+
+from orpy.client import changes
+from orpy.client import client
+from orpy.client import metrics
+from orpy.tests import base
+from orpy.tests import fakes
+
+# Same template as fakes.TEMPLATE, formatted differently
+REFORMATTED = """# A comment
+tosca_definitions_version: "tosca_simple_yaml_1_0"
+topology_template:
+  node_templates:
+    server: {type: tosca.nodes.indigo.Compute}
+  inputs:
+    num_cpus: {type: integer, default: 1}
+"""
+
+
+class TestNormalize(base.TestCase):
+    """Test the normalization of templates and parameters."""
+
+    def test_template(self):
+        """Test that formatting, comments and key order are ignored."""
+        self.assertEqual(
+            changes.normalize_template(fakes.TEMPLATE),
+            changes.normalize_template(REFORMATTED),
+        )
+        self.assertEqual("not yaml: [", changes.normalize_template("not yaml: ["))
+
+    def test_parameters(self):
+        """Test that parameters are typed and completed with defaults."""
+        self.assertEqual(
+            {"num_cpus": 1}, changes.normalize_parameters({}, fakes.TEMPLATE)
+        )
+        self.assertEqual(
+            {"num_cpus": 2, "foo": "bar"},
+            changes.normalize_parameters(
+                {"num_cpus": "2", "foo": "bar"}, fakes.TEMPLATE
+            ),
+        )
+
+
+class TestNoopUpdates(base.TestCase):
+    """Test the updates that would not change a deployment."""
+
+    def setUp(self):
+        """Start a fake orchestrator, recording updates in a temp dir."""
+        super(TestNoopUpdates, self).setUp()
+        cache = self.useFixture(fixtures.TempDir()).path
+        self.useFixture(fixtures.EnvironmentVariable("ORPY_CACHE_DIR", cache))
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=1))
+        self.metrics = metrics.ClientMetrics()
+        self.client = client.OrpyClient(self.fake.url, token="t", metrics=self.metrics)
+        self.uuid = self.client.deployments.list()[0].uuid
+
+    def _count(self, endpoint, method, status=200):
+        return self.metrics.requests.get((endpoint, method, status))
+
+    def test_diff(self):
+        """Test the changes reported before and after an update."""
+        deployments = self.client.deployments
+
+        diff = deployments.diff(self.uuid, REFORMATTED)
+        self.assertEqual([], diff.template_diff)
+        self.assertFalse(diff.parameters_known)
+        self.assertTrue(diff)
+        self.assertEqual(self.uuid, diff.deployment.uuid)
+
+        deployments.update(
+            self.uuid, REFORMATTED, parameters={"num_cpus": "2"}, skip_unchanged=True
+        )
+        self.assertEqual(1, self._count("update", "PUT", 202))
+
+        diff = deployments.diff(self.uuid, fakes.TEMPLATE, {"num_cpus": 3})
+        self.assertEqual({"num_cpus": (2, 3)}, diff.parameters)
+        self.assertTrue(diff)
+
+        template = fakes.TEMPLATE.replace("Compute", "Other")
+        diff = deployments.diff(self.uuid, template, {"num_cpus": 2})
+        removed = [line for line in diff.template_diff if line.startswith("-  ")]
+        added = [line for line in diff.template_diff if line.startswith("+  ")]
+        self.assertEqual(1, len(removed))
+        self.assertIn("tosca.nodes.indigo.Other", added[0])
+        self.assertEqual({}, diff.parameters)
+
+    def test_skip_unchanged(self):
+        """Test that no-op updates are not sent."""
+        deployments = self.client.deployments
+        for i in range(3):
+            deployments.update(
+                self.uuid,
+                fakes.TEMPLATE,
+                parameters={"num_cpus": 2},
+                skip_unchanged=True,
+            )
+        self.assertEqual(1, self._count("update", "PUT", 202))
+        # The template is fetched before the first update, and once again
+        # when the update completes (i.e. the deployment changes)
+        self.assertEqual(2, self._count("template", "GET"))
+
+        deployments.update(
+            self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 4}, skip_unchanged=True
+        )
+        self.assertEqual(2, self._count("update", "PUT", 202))
+
+    def test_update_completed(self):
+        """Test that parameters are still known once the update completes."""
+        deployments = self.client.deployments
+        d = deployments.update(
+            self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 2}, skip_unchanged=True
+        )
+        self.assertEqual("UPDATE_IN_PROGRESS", d.status)
+
+        completed = deployments.show(self.uuid)
+        self.assertEqual("UPDATE_COMPLETE", completed.status)
+        self.assertNotEqual(d.updateTime, completed.updateTime)
+
+        for _ in range(2):
+            deployments.update(
+                self.uuid,
+                fakes.TEMPLATE,
+                parameters={"num_cpus": 2},
+                skip_unchanged=True,
+            )
+        self.assertEqual(1, self._count("update", "PUT", 202))
+
+    def test_plain_update_not_recorded(self):
+        """Test that updates without skip_unchanged are not recorded."""
+        deployments = self.client.deployments
+        deployments.update(self.uuid, fakes.TEMPLATE, parameters={"password": "x"})
+        self.assertEqual({}, deployments.updates.load(self.uuid))
+
+        deployments.update(
+            self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 2}, skip_unchanged=True
+        )
+        path = deployments.updates._file(self.uuid)
+        self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+
+        # The previous record is discarded
+        deployments.update(self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 4})
+        self.assertFalse(os.path.exists(path))
+        deployments.update(
+            self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 2}, skip_unchanged=True
+        )
+        self.assertEqual(4, self._count("update", "PUT", 202))
+
+    def test_explicit_store(self):
+        """Test that every update is recorded in an assigned store."""
+        deployments = self.client.deployments
+        path = self.useFixture(fixtures.TempDir()).path
+        deployments.updates = changes.UpdateStore(self.fake.url, path=path)
+        deployments.update(self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 2})
+        deployments.update(
+            self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 2}, skip_unchanged=True
+        )
+        self.assertEqual(1, self._count("update", "PUT", 202))
+        self.assertEqual(1, len(os.listdir(path)))
+
+    def test_modified_elsewhere(self):
+        """Test that parameters are unknown once the deployment changes."""
+        deployments = self.client.deployments
+        deployments.update(
+            self.uuid, fakes.TEMPLATE, parameters={"num_cpus": 2}, skip_unchanged=True
+        )
+        self.assertTrue(deployments.diff(self.uuid, fakes.TEMPLATE).parameters_known)
+
+        # Updated from another host, with the same template
+        self.fake.orchestrator.deployments[self.uuid]["updateTime"] = "2030-01-01"
+        diff = deployments.diff(self.uuid, fakes.TEMPLATE, {"num_cpus": 2})
+        self.assertFalse(diff.parameters_known)
+        self.assertTrue(diff)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the orpy client."""
+
+import mock
+import requests
+
+from orpy.client import client
+from orpy import exceptions
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+def _response(url, status=200, body=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = url
+    resp._content = requests.compat.json.dumps(body or {}).encode()
+    return resp
+
+
+class TestEndpointFailover(base.TestCase):
+    """Test the usage of several Orchestrator instances."""
+
+    def setUp(self):
+        """Set up a client with two instances, the first one down."""
+        super(TestEndpointFailover, self).setUp()
+        self.client = client.OrpyClient(
+            ["http://down/orchestrator", "http://up/orchestrator/"], token="t"
+        )
+        self.client.session = mock.Mock()
+        self.client.session.get.side_effect = self._request_get
+        self.client.session.request.side_effect = self._request
+
+    def _request_get(self, url, **kwargs):
+        return self._request("get", url, **kwargs)
+
+    def _request(self, method, url, **kwargs):
+        if url.startswith("http://down"):
+            raise requests.exceptions.ConnectionError()
+        return _response(url, body={"uuid": "foo"})
+
+    def test_health_check_selects_healthy(self):
+        """Test that unhealthy instances are not used."""
+        self.assertEqual("http://up/orchestrator/", self.client.url)
+        self.client.deployments.show("foo")
+
+        stats = self.client.endpoints.stats()
+        self.assertEqual([False, True], [s["healthy"] for s in stats])
+        self.assertEqual([0, 1], [s["served"] for s in stats])
+
+    def test_failover(self):
+        """Test failing over on connection errors."""
+        # Disable health checks, so that the first instance is tried
+        self.client.endpoints.probe = None
+
+        d = self.client.deployments.show("foo")
+
+        self.assertEqual("foo", d.uuid)
+        urls = [c[0][1] for c in self.client.session.request.call_args_list]
+        self.assertEqual(
+            [
+                "http://down/orchestrator/deployments/foo",
+                "http://up/orchestrator/deployments/foo",
+            ],
+            urls,
+        )
+
+    def test_no_failover_for_sent_posts(self):
+        """Test that creations are not retried on another instance."""
+        self.client.endpoints.probe = None
+
+        self.assertRaises(
+            requests.exceptions.ConnectionError,
+            self.client.deployments.create,
+            "template",
+        )
+        self.assertEqual(1, self.client.session.request.call_count)
+
+
+class TestClientAgainstFakeOrchestrator(base.TestCase):
+    """Test the client against a local fake Orchestrator."""
+
+    def setUp(self):
+        """Start a fake orchestrator."""
+        super(TestClientAgainstFakeOrchestrator, self).setUp()
+        self.fake = self.useFixture(
+            fakes.FakeOrchestratorFixture(deployments=25, page_size=10)
+        )
+        self.client = client.OrpyClient(self.fake.url, token="token")
+
+    def test_list_follows_pagination(self):
+        """Test that all the pages are fetched."""
+        ret = self.client.deployments.list()
+
+        self.assertEqual(25, len(ret))
+        self.assertEqual(25, len(set(d.uuid for d in ret)))
+        self.assertEqual(3, self.fake.orchestrator.requests["list"])
+
+    def test_iter_pages_stops_early(self):
+        """Test that pages are only fetched when needed."""
+        pages = self.client.iter_pages("./deployments", "GET")
+        resp, content, page = next(pages)
+        pages.close()
+
+        self.assertEqual(10, len(content))
+        self.assertEqual(25, page["totalElements"])
+        self.assertEqual(1, self.fake.orchestrator.requests["list"])
+
+    def test_deployment_lifecycle(self):
+        """Test creating, showing, updating and deleting a deployment."""
+        d = self.client.deployments.create("template")
+        self.assertEqual("CREATE_IN_PROGRESS", d.status)
+        self.assertEqual(d.uuid, self.client.deployments.show(d.uuid).uuid)
+        self.assertEqual(
+            "template", self.client.deployments.get_template(d.uuid).template
+        )
+        self.client.deployments.update(d.uuid, "other")
+        self.client.deployments.delete(d.uuid)
+        self.assertRaises(
+            exceptions.NotFoundError, self.client.deployments.show, d.uuid
+        )
+
+    def test_resources(self):
+        """Test listing and showing resources."""
+        uuid = self.client.deployments.list()[0].uuid
+        ret = self.client.resources.list(uuid)
+        self.assertEqual(3, len(ret))
+        r = self.client.resources.show(uuid, ret[0].uuid)
+        self.assertEqual(ret[0].uuid, r.uuid)
+        self.assertEqual(2, len(self.client.resources.graph(uuid).dependents(r.uuid)))
+
+    def test_info(self):
+        """Test getting information about the orchestrator."""
+        self.assertEqual(self.fake.url + "/", self.client.info.get().url)
+
+    def test_compression(self):
+        """Test that responses and large request bodies are compressed."""
+        self.client.compress_requests = 1024
+        self.client.deployments.list()
+        self.client.deployments.create("small")
+        d = self.client.deployments.create("x" * 4096)
+
+        self.assertEqual(
+            "x" * 4096, self.client.deployments.get_template(d.uuid).template
+        )
+        stats = self.client.transfer_stats.to_dict()
+        self.assertEqual(2, stats["requests"])
+        self.assertLess(stats["sent"], stats["sent_uncompressed"])
+        self.assertLess(stats["received"], stats["received_uncompressed"])
+        self.assertGreater(stats["saved"], 4000)
+
+    def test_list_max_items(self):
+        """Test that only the needed pages are requested."""
+        ret = self.client.deployments.list(max_items=20)
+
+        self.assertEqual(20, len(ret))
+        self.assertEqual(1, self.fake.orchestrator.requests["list"])
+
+        ret = self.client.deployments.list(max_items=12, page_size=5)
+        self.assertEqual(12, len(ret))
+        self.assertEqual(4, self.fake.orchestrator.requests["list"])
+
+    def test_list_page_size_and_start_page(self):
+        """Test that the listing starts at the given page."""
+        everything = [d.uuid for d in self.client.deployments.list()]
+
+        ret = self.client.deployments.list(page_size=20, start_page=1)
+        self.assertEqual(everything[20:], [d.uuid for d in ret])
+
+        ret = self.client.resources.list(everything[0], page_size=1)
+        self.assertEqual(3, len(ret))
+        self.assertEqual(3, self.fake.orchestrator.requests["resources"])
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the columnar listings."""
+
+import collections
+
+from orpy.client import base as client_base
+from orpy.client import client
+from orpy.client import columns
+from orpy import exceptions
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestColumns(base.TestCase):
+    """Test the columnar tables."""
+
+    def test_fields(self):
+        """Test selecting (dotted) fields from several pages."""
+        pages = [
+            [{"a": 1, "b": {"c": "x"}}, {"a": 2, "b": None}],
+            [{"a": 3}],
+        ]
+        table = columns.Columns.from_pages(pages, ["a", "b.c"])
+        self.assertEqual(3, len(table))
+        self.assertEqual(["a", "b.c"], table.fields)
+        self.assertEqual([1, 2, 3], table["a"])
+        self.assertEqual(["x", None, None], table["b.c"])
+        self.assertEqual([(1, "x"), (2, None), (3, None)], list(table.rows()))
+
+    def test_discover_fields(self):
+        """Test that fields found in later pages are backfilled."""
+        pages = [[{"a": 1}], [{"a": 2, "b": True}]]
+        table = columns.Columns.from_pages(pages)
+        self.assertEqual({"a": [1, 2], "b": [None, True]}, table.to_dict())
+
+    def test_from_items(self):
+        """Test building a table from objects, in chunks."""
+        items = [client_base.Resource({"uuid": str(i), "n": i}) for i in range(5)]
+        table = columns.Columns.from_items(items, ["n"], chunk_size=2)
+        self.assertEqual(list(range(5)), table["n"])
+
+    def test_value_counts(self):
+        """Test counting the values of a column."""
+        table = columns.Columns.from_items([{"s": "a"}, {"s": "b"}, {"s": "a"}])
+        self.assertEqual(collections.Counter({"a": 2, "b": 1}), table.value_counts("s"))
+
+    def test_to_numpy(self):
+        """Test the conversion to NumPy arrays."""
+        if columns.numpy is None:
+            self.skipTest("numpy not installed")
+        table = columns.Columns.from_items([{"a": 1, "b": "x"}, {"a": 2}])
+        arrays = table.to_numpy()
+        self.assertEqual(3, arrays["a"].sum())
+        self.assertEqual(object, arrays["b"].dtype)
+
+    def test_to_arrow(self):
+        """Test the conversion to an Arrow table."""
+        if columns.pyarrow is None:
+            self.skipTest("pyarrow not installed")
+        table = columns.Columns.from_items([{"a": 1, "b": "x"}, {"a": 2}])
+        arrow = table.to_arrow()
+        self.assertEqual(["a", "b"], arrow.column_names)
+        self.assertEqual(2, arrow.num_rows)
+
+    def test_missing_backends(self):
+        """Test that conversions fail cleanly without the packages."""
+        table = columns.Columns.from_items([{"a": 1}])
+        if columns.numpy is None:
+            self.assertRaises(exceptions.InvalidUsageError, table.to_numpy)
+        if columns.pyarrow is None:
+            self.assertRaises(exceptions.InvalidUsageError, table.to_arrow)
+
+
+class TestListColumns(base.TestCase):
+    """Test listing deployments and resources as columns."""
+
+    def setUp(self):
+        """Start a fake orchestrator."""
+        super(TestListColumns, self).setUp()
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=25))
+        self.client = client.OrpyClient(self.fake.url, token="t")
+
+    def test_deployments(self):
+        """Test that the columns match the deployment objects."""
+        table = self.client.deployments.list_columns(
+            ["uuid", "status", "createdBy.subject"], page_size=10
+        )
+        deployments = self.client.deployments.list(page_size=10)
+        self.assertEqual(25, len(table))
+        self.assertEqual([d.uuid for d in deployments], table["uuid"])
+        self.assertEqual(
+            [d.createdBy["subject"] for d in deployments], table["createdBy.subject"]
+        )
+        self.assertEqual(
+            collections.Counter(d.status for d in deployments),
+            table.value_counts("status"),
+        )
+
+    def test_max_items(self):
+        """Test that the last page is truncated."""
+        table = self.client.deployments.list_columns(
+            ["uuid"], page_size=10, max_items=15
+        )
+        self.assertEqual(15, len(table))
+        self.assertEqual(2, self.fake.orchestrator.requests["list"])
+
+    def test_resources(self):
+        """Test listing the resources of a deployment as columns."""
+        uuid = self.client.deployments.list(max_items=1)[0].uuid
+        table = self.client.resources.list_columns(uuid)
+        self.assertEqual(3, len(table))
+        self.assertIn("toscaNodeName", table)
+        self.assertEqual(["node_0", "node_1", "node_2"], table["toscaNodeName"])
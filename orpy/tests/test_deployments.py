@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the deployments interface."""
+
+import json
+
+import fixtures
+import mock
+
+from orpy.client import client
+from orpy.client import deployments
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestDeploymentsWatch(base.TestCase):
+    """Test watching deployments."""
+
+    def setUp(self):
+        """Set up a fake client returning a sequence of listings."""
+        super(TestDeploymentsWatch, self).setUp()
+        self.client = mock.Mock()
+        self.deployments = deployments.Deployments(self.client)
+        self.useFixture(fixtures.MockPatch("time.sleep"))
+
+    def _listings(self, *listings):
+        def _pages(url, method, **kwargs):
+            status, content = next(it)
+            resp = mock.Mock(status_code=status, headers={"ETag": "v%d" % len(content)})
+            yield resp, content, {"totalPages": 1}
+
+        it = iter(listings)
+        self.client.iter_pages.side_effect = _pages
+
+    def test_watch(self):
+        """Test that only transitions are yielded."""
+        self._listings(
+            (200, [{"uuid": "a", "status": "CREATE_IN_PROGRESS"}]),
+            (
+                200,
+                [
+                    {"uuid": "a", "status": "CREATE_COMPLETE"},
+                    {"uuid": "b", "status": "CREATE_IN_PROGRESS"},
+                ],
+            ),
+            (304, ""),
+            (200, [{"uuid": "b", "status": "CREATE_IN_PROGRESS"}]),
+        )
+
+        events = list(self.deployments.watch(polls=4))
+
+        self.assertEqual(
+            [
+                ("status_changed", "a", "CREATE_IN_PROGRESS", "CREATE_COMPLETE"),
+                ("created", "b", None, "CREATE_IN_PROGRESS"),
+                ("deleted", "a", "CREATE_COMPLETE", None),
+            ],
+            [(e.event, e.uuid, e.previousStatus, e.status) for e in events],
+        )
+        headers = self.client.iter_pages.call_args_list[2][1]["headers"]
+        self.assertEqual("v2", headers["If-None-Match"])
+
+    def test_watch_initial(self):
+        """Test that existing deployments are reported when requested."""
+        self._listings((200, [{"uuid": "a", "status": "CREATE_COMPLETE"}]))
+
+        events = list(self.deployments.watch(initial=True, polls=1))
+
+        self.assertEqual([("created", "a")], [(e.event, e.uuid) for e in events])
+
+
+class TestDeploymentsSummary(base.TestCase):
+    """Test summarizing deployments against a fake orchestrator."""
+
+    def setUp(self):
+        """Start a fake orchestrator."""
+        super(TestDeploymentsSummary, self).setUp()
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=30))
+        self.client = client.OrpyClient(self.fake.url, token="token")
+
+    def test_count(self):
+        """Test that the total is taken from the page metadata."""
+        self.assertEqual(30, self.client.deployments.count())
+        self.assertEqual(1, self.fake.orchestrator.requests["list"])
+
+    def test_summary(self):
+        """Test counting deployments per field and creation period."""
+        summary = self.client.deployments.summary(
+            fields=("status", "createdBy.subject"), period="day", page_size=7
+        )
+
+        self.assertEqual(30, summary["total"])
+        self.assertEqual(5, self.fake.orchestrator.requests["list"])
+        self.assertEqual(
+            {
+                "CREATE_COMPLETE": 8,
+                "CREATE_FAILED": 8,
+                "CREATE_IN_PROGRESS": 7,
+                "DELETE_FAILED": 7,
+            },
+            summary["counts"]["status"],
+        )
+        self.assertEqual(6, summary["counts"]["createdBy.subject"]["user-0"])
+        self.assertEqual({"2023-01-01": 30}, summary["created"])
+
+    def test_summary_nested(self):
+        """Test counting the values of a nested field."""
+        summary = self.client.deployments.summary(fields=("createdBy",), period=None)
+        counts = summary["counts"]["createdBy"]
+        self.assertEqual(5, len(counts))
+        key = json.dumps(
+            {"issuer": "https://iam.example.org/", "subject": "user-0"},
+            sort_keys=True,
+        )
+        self.assertEqual(6, counts[key])
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the streaming export of the inventory."""
+
+import csv
+import gzip
+import io
+import json
+import os
+
+import fixtures
+
+from orpy.client import client
+from orpy.client import columns
+from orpy.client import export
+from orpy import exceptions
+from orpy import shell
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestExporter(base.TestCase):
+    """Test the streaming export of the deployments."""
+
+    def setUp(self):
+        """Start a fake orchestrator."""
+        super(TestExporter, self).setUp()
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=25))
+        self.client = client.OrpyClient(self.fake.url, token="t")
+        self.tmp = self.useFixture(fixtures.TempDir()).path
+
+    def test_guess_format(self):
+        """Test guessing the format and compression from the file name."""
+        self.assertEqual(("csv", "gzip"), export.guess_format("a.CSV.gz"))
+        self.assertEqual(("jsonl", None), export.guess_format("a.ndjson"))
+        self.assertEqual(("parquet", None), export.guess_format("a.parquet"))
+        self.assertEqual((None, "xz"), export.guess_format("a.xz"))
+        self.assertEqual((None, None), export.guess_format("-"))
+
+    def test_csv(self):
+        """Test a compressed CSV export, streamed page by page."""
+        path = os.path.join(self.tmp, "inventory.csv.gz")
+        exporter = export.Exporter(self.client, page_size=10)
+        with export.get_writer("csv", path, "gzip") as writer:
+            self.assertEqual(25, exporter.write(writer))
+
+        with gzip.open(path, "rt", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(25, len(rows))
+        self.assertNotIn("links", rows[0])
+        self.assertNotIn("outputs", rows[0])
+        self.assertEqual("", rows[0]["statusReason"])
+        self.assertEqual("user-0", json.loads(rows[0]["createdBy"])["subject"])
+        self.assertEqual(3, self.fake.orchestrator.requests["list"])
+
+    def test_jsonl_resources(self):
+        """Test a JSON lines export, with columns, resources and outputs."""
+        stream = io.StringIO()
+        exporter = export.Exporter(
+            self.client,
+            fields=["uuid", "createdBy.subject"],
+            resources=True,
+            outputs=True,
+            max_items=3,
+        )
+        writer = export.JSONLinesWriter(stream)
+        self.assertEqual(3, exporter.write(writer))
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(3, len(lines))
+        self.assertEqual(
+            ["uuid", "createdBy.subject", "outputs", "resources"],
+            list(lines[0].keys()),
+        )
+        self.assertEqual(
+            ["node_0", "node_1", "node_2"],
+            sorted(r["toscaNodeName"] for r in lines[0]["resources"]),
+        )
+        self.assertEqual(3, self.fake.orchestrator.requests["resources"])
+
+    def test_empty(self):
+        """Test that an empty CSV export has a header."""
+        self.fake.orchestrator.deployments.clear()
+        stream = io.StringIO()
+        exporter = export.Exporter(self.client, fields=["uuid", "status"])
+        self.assertEqual(0, exporter.write(export.CSVWriter(stream)))
+        self.assertEqual("uuid,status", stream.getvalue().strip())
+
+    def test_empty_default_fields(self):
+        """Test that an empty export has the default columns."""
+        self.fake.orchestrator.deployments.clear()
+        stream = io.StringIO()
+        exporter = export.Exporter(self.client, resources=True)
+        self.assertEqual(0, exporter.write(export.CSVWriter(stream)))
+        header = ",".join(export.DEFAULT_FIELDS + ("resources",))
+        self.assertEqual(header + "\r\n", stream.getvalue())
+
+        if export.parquet is None:
+            return
+        path = os.path.join(self.tmp, "empty.parquet")
+        with export.get_writer("parquet", path) as writer:
+            export.Exporter(self.client).write(writer)
+        f = export.parquet.ParquetFile(path)
+        self.assertEqual(0, f.metadata.num_rows)
+        self.assertEqual(list(export.DEFAULT_FIELDS), f.schema_arrow.names)
+
+    def test_parquet(self):
+        """Test a Parquet export."""
+        if export.parquet is None:
+            self.skipTest("pyarrow not installed")
+        path = os.path.join(self.tmp, "inventory.parquet")
+        exporter = export.Exporter(self.client, page_size=10, resources=True)
+        with export.get_writer("parquet", path, "zstd") as writer:
+            exporter.write(writer)
+
+        f = export.parquet.ParquetFile(path)
+        self.assertEqual(25, f.metadata.num_rows)
+        self.assertEqual(3, f.metadata.num_row_groups)
+        self.assertIn("resources", f.schema_arrow.names)
+
+    def test_parquet_types(self):
+        """Test pages whose columns have different types."""
+        if export.parquet is None:
+            self.skipTest("pyarrow not installed")
+        path = os.path.join(self.tmp, "types.parquet")
+        pages = [
+            [{"a": 1, "b": None, "c": True}],
+            [{"a": {"x": 1}, "b": 2, "c": "yes"}, {"a": [1], "b": "two"}],
+        ]
+        with export.ParquetWriter(path) as writer:
+            for page in pages:
+                writer.write(columns.Columns.from_pages([page], ["a", "b", "c"]))
+
+        data = export.parquet.read_table(path).to_pydict()
+        self.assertEqual(["1", '{"x": 1}', "[1]"], data["a"])
+        self.assertEqual([None, "2", "two"], data["b"])
+        self.assertEqual(["True", "yes", None], data["c"])
+
+    def test_invalid(self):
+        """Test invalid formats and compressions."""
+        self.assertRaises(exceptions.InvalidUsageError, export.get_writer, "xml")
+        self.assertRaises(
+            exceptions.InvalidUsageError, export.get_writer, "csv", None, "zip"
+        )
+        self.assertRaises(exceptions.InvalidUsageError, export.get_writer, "parquet")
+
+
+class TestExportCommand(base.TestCase):
+    """Test the export command."""
+
+    def setUp(self):
+        """Run the CLI against a fake orchestrator and oidc-agent."""
+        super(TestExportCommand, self).setUp()
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=5))
+        self.agent = self.useFixture(fakes.FakeOIDCAgentFixture())
+
+    def test_export(self):
+        """Test exporting some columns to the standard output."""
+        app = shell.OrpyApp()
+        app.stdout = io.StringIO()
+        app.stderr = io.StringIO()
+        argv = [
+            "--url",
+            self.fake.url,
+            "--oidc-agent-sock",
+            self.agent.socket_path,
+            "--oidc-agent-account",
+            "account",
+            "export",
+            "--column",
+            "uuid",
+            "--column",
+            "cloudProviderName",
+            "--limit",
+            "2",
+        ]
+        self.assertEqual(0, app.run(argv))
+        lines = app.stdout.getvalue().splitlines()
+        self.assertEqual(["uuid,cloudProviderName"], lines[:1])
+        self.assertEqual(3, len(lines))
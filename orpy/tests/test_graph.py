@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the resource dependency graph."""
+
+from orpy.client import base as client_base
+from orpy.client import graph
+from orpy import exceptions
+from orpy.tests import base
+
+
+def _resource(uuid, name, required_by):
+    return client_base.Resource(
+        {"uuid": uuid, "toscaNodeName": name, "requiredBy": required_by}
+    )
+
+
+class TestResourceGraph(base.TestCase):
+    """Test the resource dependency graph."""
+
+    def setUp(self):
+        """Build a graph: network <- server[0,1] <- app, by UUID and name."""
+        super(TestResourceGraph, self).setUp()
+        self.graph = graph.ResourceGraph(
+            [
+                _resource("app", "app", []),
+                _resource("srv0", "server", ["app"]),
+                _resource("srv1", "server", ["app"]),
+                _resource("net", "network", ["server"]),
+            ]
+        )
+
+    def test_roots_and_leaves(self):
+        """Test roots and leaves."""
+        self.assertEqual(["net"], [r.uuid for r in self.graph.roots()])
+        self.assertEqual(["app"], [r.uuid for r in self.graph.leaves()])
+
+    def test_dependents(self):
+        """Test what depends on a node, by UUID and by name."""
+        self.assertEqual(
+            ["srv0", "srv1", "app"], [r.uuid for r in self.graph.dependents("net")]
+        )
+        self.assertEqual(["app"], [r.uuid for r in self.graph.dependents("server")])
+        self.assertEqual(
+            ["srv0", "srv1"],
+            [r.uuid for r in self.graph.dependents("net", recursive=False)],
+        )
+        self.assertRaises(KeyError, self.graph.dependents, "foo")
+
+    def test_topological_order(self):
+        """Test that requirements come before their dependents."""
+        order = [r.uuid for r in self.graph.topological_order()]
+        self.assertEqual(["net", "srv0", "srv1", "app"], order)
+
+    def test_cycle(self):
+        """Test that cycles are detected."""
+        g = graph.ResourceGraph(
+            [_resource("a", "a", ["b"]), _resource("b", "b", ["a"])]
+        )
+        self.assertRaises(exceptions.DependencyCycleError, g.topological_order)
+        self.assertEqual([(0, "a"), (1, "b")], [(d, r.uuid) for d, r in g.walk("a")])
+
+    def test_walk(self):
+        """Test the depth first walk used by the tree command."""
+        ret = [(d, r.uuid) for d, r in self.graph.walk()]
+        self.assertEqual(
+            [(0, "net"), (1, "srv0"), (2, "app"), (1, "srv1"), (2, "app")], ret
+        )
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the HTTP debug logging."""
+
+import json
+import logging
+
+import fixtures
+import mock
+
+from orpy.client import client
+from orpy.client import httplog
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestHTTPLog(base.TestCase):
+    """Test the lazily formatted log records."""
+
+    def test_redaction_without_copies(self):
+        """Test that nested sensitive values are redacted, not modified."""
+        body = {"a": [{"token": "secret", "b": 1}], "password": None}
+
+        text = "".join(httplog.iter_json(body))
+
+        self.assertEqual(
+            {"a": [{"token": httplog.redact("secret"), "b": 1}], "password": None},
+            json.loads(text),
+        )
+        self.assertEqual("secret", body["a"][0]["token"])
+
+    def test_excerpt_stops_early(self):
+        """Test that the serialization stops once the limit is reached."""
+        consumed = []
+
+        def chunks():
+            for i in range(1000):
+                consumed.append(i)
+                yield "x" * 10
+
+        text = httplog.excerpt(chunks(), limit=25)
+
+        self.assertEqual("x" * 25 + "...<truncated>", text)
+        self.assertEqual(3, len(consumed))
+
+    def test_large_string_is_cut_before_encoding(self):
+        """Test that a large template is not encoded as a whole."""
+        template = "tosca_definitions_version: x\n" * 100000
+        record = httplog.Request(
+            "post", "http://o/", {}, {"template": template}, limit=100
+        )
+
+        with mock.patch.object(httplog.json, "dumps", wraps=json.dumps) as m:
+            text = str(record)
+
+        self.assertIn('"template": "tosca_definitions_version: x\\n', text)
+        self.assertIn("...<truncated>", text)
+        self.assertLessEqual(max(len(c[0][0]) for c in m.call_args_list), 100)
+
+    def test_request(self):
+        """Test the formatting of a request."""
+        kwargs = {"headers": {"Authorization": "Bearer t", "Accept": "a"}}
+        record = httplog.Request("post", "http://o/", kwargs, {"template": "t"})
+
+        self.assertEqual(
+            "curl -g -i 'http://o/' -X post -H \"Accept: a\" "
+            '-H "Authorization: %s" -d \'{"template": "t"}\''
+            % httplog.redact("Bearer t"),
+            str(record),
+        )
+
+
+class TestClientHTTPLog(base.TestCase):
+    """Test the logging done by the client."""
+
+    def setUp(self):
+        """Start a fake orchestrator."""
+        super(TestClientHTTPLog, self).setUp()
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=5))
+        self.logger = self.useFixture(
+            fixtures.FakeLogger(name="orpy.client.client", level=logging.DEBUG)
+        )
+
+    def test_debug(self):
+        """Test that requests and truncated responses are logged."""
+        cli = client.OrpyClient(self.fake.url, token="token", debug=True)
+        cli.debug_body_limit = 100
+        cli.deployments.list()
+
+        self.assertIn("REQ: curl", self.logger.output)
+        self.assertIn("RESP: [200]", self.logger.output)
+        self.assertIn("...<truncated>", self.logger.output)
+        self.assertNotIn("Bearertoken", self.logger.output)
+
+    def test_no_debug(self):
+        """Test that nothing is built if debug is not enabled."""
+        m = self.useFixture(fixtures.MockPatch("orpy.client.httplog.Request")).mock
+        cli = client.OrpyClient(self.fake.url, token="token")
+        cli.deployments.list()
+
+        m.assert_not_called()
+        self.assertEqual("", self.logger.output)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the local deployment index."""
+
+import os
+
+import fixtures
+import mock
+
+from orpy.client import index
+from orpy.client import tracing
+from orpy.tests import base
+
+
+def _deployment(uuid, status, updated, provider="provider-A"):
+    return {
+        "uuid": uuid,
+        "status": status,
+        "cloudProviderName": provider,
+        "createdBy": {"subject": "user", "issuer": "https://iam"},
+        "creationTime": "2023-01-01T10:00+0000",
+        "updateTime": updated,
+    }
+
+
+class TestIndex(base.TestCase):
+    """Test the local index synchronization and queries."""
+
+    def setUp(self):
+        """Set up a fake client and an index on a temporary file."""
+        super(TestIndex, self).setUp()
+        self.deployments = [
+            _deployment("d2", "CREATE_FAILED", "2023-01-03T10:00+0000"),
+            _deployment("d1", "CREATE_COMPLETE", "2023-01-02T10:00+0000"),
+        ]
+        self.client = mock.Mock(urls=["http://orchestrator/"], tracer=tracing.NOOP)
+        self.client.iter_pages.side_effect = self._pages
+        self.client.get.side_effect = lambda url, **kw: (
+            None,
+            [{"uuid": url.split("/")[2] + "-r", "state": "STARTED"}],
+        )
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, "index.sqlite")
+        self.index = index.Index(self.client, path=path)
+
+    def _pages(self, url, method, **kwargs):
+        page = {"totalElements": len(self.deployments)}
+        yield None, [dict(d) for d in self.deployments], page
+
+    def test_full_then_incremental_sync(self):
+        """Test that only changed deployments are fetched again."""
+        stats = self.index.sync()
+        self.assertTrue(stats["full"])
+        self.assertEqual(2, stats["updated"])
+        self.assertEqual(2, self.client.get.call_count)
+
+        self.deployments[1]["status"] = "DELETE_FAILED"
+        self.deployments[1]["updateTime"] = "2023-01-04T10:00+0000"
+        self.deployments.sort(key=lambda d: d["updateTime"], reverse=True)
+
+        stats = self.index.sync()
+        self.assertFalse(stats["full"])
+        self.assertEqual(1, stats["updated"])
+        self.assertEqual(3, self.client.get.call_count)
+
+        ret = self.index.deployments(status="DELETE_FAILED")
+        self.assertEqual(["d1"], [d.uuid for d in ret])
+        ret = self.index.resources(deployment_uuid="d1")
+        self.assertEqual(["d1-r"], [r.uuid for r in ret])
+
+    def test_sync_prunes_deleted(self):
+        """Test that deleted deployments are removed from the index."""
+        self.index.sync()
+        self.deployments.pop(0)
+
+        stats = self.index.sync()
+        self.assertTrue(stats["full"])
+        self.assertEqual(1, stats["deleted"])
+        self.assertEqual(["d1"], [d.uuid for d in self.index.deployments()])
+        self.assertEqual([], self.index.resources(deployment_uuid="d2"))
+
+    def test_sync_deleted_and_created(self):
+        """Test a deployment deleted while another one is created."""
+        self.deployments.append(
+            _deployment("d0", "CREATE_COMPLETE", "2023-01-01T10:00+0000")
+        )
+        self.index.sync()
+        self.deployments.pop(1)
+        self.deployments.insert(
+            0, _deployment("d3", "CREATE_COMPLETE", "2023-01-05T10:00+0000")
+        )
+
+        stats = self.index.sync()
+        self.assertTrue(stats["full"])
+        self.assertEqual(1, stats["updated"])
+        self.assertEqual(1, stats["deleted"])
+        self.assertEqual(
+            ["d0", "d2", "d3"], sorted(d.uuid for d in self.index.deployments())
+        )
+        # The listing goes on, instead of being started again
+        self.assertEqual(2, self.client.iter_pages.call_count)
+
+    def test_query_filters(self):
+        """Test combined filters on the indexed deployments."""
+        self.deployments.append(
+            _deployment("d3", "CREATE_FAILED", "2023-01-01T10:00+0000", "B")
+        )
+        self.index.sync()
+
+        ret = self.index.deployments(status="CREATE_FAILED", provider="B")
+        self.assertEqual(["d3"], [d.uuid for d in ret])
+        ret = self.index.deployments(created_after="2023-01-02")
+        self.assertEqual([], ret)
+        ret = self.index.deployments(created_by="user", limit=2)
+        self.assertEqual(2, len(ret))
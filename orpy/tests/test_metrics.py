@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the metrics of the client."""
+
+import mock
+import requests
+
+from orpy.client import client
+from orpy.client import metrics
+from orpy import exceptions
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestRegistry(base.TestCase):
+    """Test the metrics registry and its HTTP endpoint."""
+
+    def test_classify(self):
+        """Test the endpoint classes."""
+        cases = [
+            ("get", "http://o/orchestrator/", "info"),
+            ("get", "http://o/orchestrator/configuration", "info"),
+            ("get", "http://o/orchestrator/deployments?page=1", "list"),
+            ("get", "./deployments/foo", "show"),
+            ("get", "./deployments/foo/resources/", "list"),
+            ("get", "./deployments/foo/resources/bar", "show"),
+            ("get", "./deployments/foo/template", "template"),
+            ("post", "./deployments", "create"),
+            ("put", "./deployments/foo", "update"),
+            ("delete", "./deployments/foo", "delete"),
+        ]
+        for method, url, expected in cases:
+            self.assertEqual(expected, metrics.classify(method, url), url)
+
+    def test_render(self):
+        """Test the text exposition format."""
+        registry = metrics.Registry()
+        c = registry.counter("foo_total", "Foos.", ("kind",))
+        c.inc(("a",))
+        c.inc(('b"\n',), 2)
+        h = registry.histogram("bar_seconds", "Bars.", buckets=(0.1, 1))
+        h.observe(value=0.05)
+        h.observe(value=0.5)
+        h.observe(value=5)
+
+        expected = [
+            "# HELP bar_seconds Bars.",
+            "# TYPE bar_seconds histogram",
+            'bar_seconds_bucket{le="0.1"} 1',
+            'bar_seconds_bucket{le="1"} 2',
+            'bar_seconds_bucket{le="+Inf"} 3',
+            "bar_seconds_sum 5.55",
+            "bar_seconds_count 3",
+            "# HELP foo_total Foos.",
+            "# TYPE foo_total counter",
+            'foo_total{kind="a"} 1',
+            'foo_total{kind="b\\"\\n"} 2',
+        ]
+        self.assertEqual("\n".join(expected) + "\n", registry.render())
+
+        self.assertIs(c, registry.counter("foo_total", "Foos.", ("kind",)))
+        self.assertRaises(
+            exceptions.InvalidUsageError, registry.histogram, "foo_total", "Foos."
+        )
+
+    def test_render_status_and_error(self):
+        """Test rendering numeric status codes along with errors."""
+        m = metrics.ClientMetrics()
+        m.observe_request("GET", "./deployments", 200, 0.1)
+        m.observe_request("GET", "./deployments", "error", 0.1)
+        rendered = m.registry.render()
+        self.assertIn(
+            'orpy_requests_total{endpoint="list",method="GET",status="200"} 1',
+            rendered,
+        )
+        self.assertIn(
+            'orpy_requests_total{endpoint="list",method="GET",status="error"} 1',
+            rendered,
+        )
+
+    def test_serve(self):
+        """Test exposing the metrics over HTTP."""
+        registry = metrics.Registry()
+        registry.counter("foo_total", "Foos.").inc()
+        server = registry.serve()
+        self.addCleanup(server.stop)
+
+        resp = requests.get(server.url)
+        self.assertEqual(metrics.CONTENT_TYPE, resp.headers["Content-Type"])
+        self.assertIn("foo_total 1\n", resp.text)
+
+
+class TestClientMetrics(base.TestCase):
+    """Test the metrics recorded by the client."""
+
+    def test_requests_and_pages(self):
+        """Test the metrics recorded by the client."""
+        fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=25))
+        m = metrics.ClientMetrics()
+        cli = client.OrpyClient(fake.url, token="token", metrics=m)
+
+        deployments = cli.deployments.list()
+        self.assertEqual(25, len(deployments))
+        cli.deployments.show(deployments[0].uuid)
+        self.assertRaises(exceptions.NotFoundError, cli.deployments.show, "foo")
+
+        self.assertEqual(3, m.requests.get(("list", "GET", 200)))
+        self.assertEqual(3, m.pages.get(("list",)))
+        self.assertEqual(1, m.requests.get(("show", "GET", 200)))
+        self.assertEqual(1, m.requests.get(("show", "GET", 404)))
+        self.assertEqual(2, m.duration.count(("show",)))
+        self.assertIn('orpy_pages_total{endpoint="list"} 3', m.registry.render())
+
+    def test_retries(self):
+        """Test the metrics of failed over requests."""
+        m = metrics.ClientMetrics()
+        cli = client.OrpyClient(
+            ["http://down/orchestrator", "http://up/orchestrator"],
+            token="token",
+            metrics=m,
+        )
+        cli.endpoints.probe = None
+        cli.session = mock.Mock()
+
+        def _request(method, url, **kwargs):
+            if url.startswith("http://down"):
+                raise requests.exceptions.ConnectionError()
+            resp = requests.Response()
+            resp.status_code = 200
+            resp._content = b'{"uuid": "foo"}'
+            return resp
+
+        cli.session.request.side_effect = _request
+        cli.deployments.show("foo")
+
+        self.assertEqual(1, m.retries.get(("show",)))
+        self.assertEqual(1, m.requests.get(("show", "GET", "error")))
+        self.assertEqual(1, m.requests.get(("show", "GET", 200)))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the client querying several Orchestrators."""
+
+import mock
+
+from orpy.client import base as client_base
+from orpy.client import multi
+from orpy import exceptions
+from orpy.tests import base
+
+
+def _client(url, deployments):
+    c = mock.Mock(urls=[url])
+    c.deployments.list.return_value = [
+        client_base.Deployment({"uuid": u}) for u in deployments
+    ]
+
+    def _show(uuid):
+        if uuid not in deployments:
+            raise exceptions.NotFoundError()
+        return client_base.Deployment({"uuid": uuid})
+
+    c.deployments.show.side_effect = _show
+    return c
+
+
+class TestMultiOrpyClient(base.TestCase):
+    """Test the MultiOrpyClient."""
+
+    def setUp(self):
+        """Set up two fake orchestrators."""
+        super(TestMultiOrpyClient, self).setUp()
+        self.a = _client("http://a/", ["a1", "a2"])
+        self.b = _client("http://b/", ["b1"])
+        self.client = multi.MultiOrpyClient([self.a, self.b])
+
+    def test_list(self):
+        """Test that listings are merged and tagged."""
+        ret = self.client.deployments.list()
+        self.assertEqual(
+            [("http://a/", "a1"), ("http://a/", "a2"), ("http://b/", "b1")],
+            [(d.orchestrator, d.uuid) for d in ret],
+        )
+
+    def test_list_limit(self):
+        """Test that the limit applies to the merged listing."""
+        ret = self.client.deployments.list(max_items=2)
+        self.assertEqual(["a1", "a2"], [d.uuid for d in ret])
+        self.b.deployments.list.assert_called_once_with(max_items=2)
+
+    def test_show(self):
+        """Test looking for a deployment in all the orchestrators."""
+        self.assertEqual("http://b/", self.client.deployments.show("b1").orchestrator)
+        self.assertRaises(exceptions.NotFoundError, self.client.deployments.show, "foo")
+
+    def test_errors(self):
+        """Test that errors are raised unless they are ignored."""
+        self.b.deployments.list.side_effect = exceptions.ClientError("boom")
+        self.assertRaises(exceptions.ClientError, self.client.deployments.list)
+
+        self.client.ignore_errors = True
+        self.assertEqual(2, len(self.client.deployments.list()))
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the OpenID Connect token providers."""
+
+import os
+import time
+
+import fixtures
+import mock
+
+from orpy.client import client
+from orpy import exceptions
+from orpy import oidc
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestTokenRefresher(base.TestCase):
+    """Test renewing tokens in the background."""
+
+    def setUp(self):
+        """Start a fake oidc-agent."""
+        super(TestTokenRefresher, self).setUp()
+        self.fake = self.useFixture(fakes.FakeOIDCAgentFixture())
+        self.agent = oidc.OpenIDConnectAgent(
+            "account", socket_path=self.fake.socket_path
+        )
+
+    def _wait_for(self, refresher, refreshes):
+        deadline = time.time() + 5
+        while refresher.refreshes < refreshes and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_get_token_does_not_block(self):
+        """Test that the token renewed in background is used."""
+        with oidc.TokenRefresher(self.agent) as refresher:
+            self._wait_for(refresher, 1)
+            with mock.patch.object(self.agent, "get_token") as m:
+                token = refresher.get_token()
+            m.assert_not_called()
+
+        self.assertEqual("account-token-1", token["access_token"])
+        self.assertEqual(1, self.fake.agent.requests)
+
+    def test_renews_before_expiration(self):
+        """Test that tokens are renewed margin seconds before they expire."""
+        self.fake.agent.lifetime = 11
+        refresher = oidc.TokenRefresher(self.agent, margin=10, min_interval=0.01)
+        with refresher:
+            self._wait_for(refresher, 2)
+
+        self.assertGreaterEqual(self.fake.agent.requests, 2)
+        self.assertEqual(
+            "account-token-%d" % refresher.refreshes,
+            refresher.get_token()["access_token"],
+        )
+
+    def test_fallback_when_renewal_fails(self):
+        """Test that the provider is used if the renewal is failing."""
+        provider = mock.Mock()
+        provider.refresh.side_effect = exceptions.AuthError(err="down")
+        provider.get_token.return_value = {"access_token": "sync"}
+
+        with oidc.TokenRefresher(provider, retry_interval=60) as refresher:
+            self.assertEqual("sync", refresher.get_token()["access_token"])
+
+    def test_cached_token_is_not_hammered(self):
+        """Test renewals that return the token that is about to expire."""
+        provider = mock.Mock()
+        token = {"access_token": "cached", "expires_at": time.time() + 10.3}
+        provider.refresh.return_value = provider.get_token.return_value = token
+
+        refresher = oidc.TokenRefresher(
+            provider, margin=10, min_interval=0.01, retry_interval=60
+        )
+        with refresher:
+            time.sleep(0.6)
+            # Within the margin, the provider is asked directly
+            self.assertEqual(token, refresher.get_token())
+
+        self.assertEqual(1, refresher.refreshes)
+        self.assertEqual(2, provider.refresh.call_count)
+        provider.refresh.assert_called_with(min_valid_period=10.01)
+        provider.get_token.assert_called_once_with()
+
+
+class TestRefreshTokenProvider(base.TestCase):
+    """Test the refresh token grant and the on-disk token store."""
+
+    def setUp(self):
+        """Start a fake IAM and a fake orchestrator using it."""
+        super(TestRefreshTokenProvider, self).setUp()
+        self.cache = self.useFixture(fixtures.TempDir()).path
+        self.useFixture(fixtures.EnvironmentVariable("ORPY_CACHE_DIR", self.cache))
+        self.iam = self.useFixture(fakes.FakeIAMFixture()).iam
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=5))
+        self.fake.orchestrator.iam_url = self.iam.url
+
+    def _provider(self, **kwargs):
+        return oidc.OpenIDConnectRefreshToken.from_orchestrator(
+            self.fake.url, "refresh", "client", **kwargs
+        )
+
+    def test_token_is_shared_through_the_store(self):
+        """Test that processes using the same refresh token share tokens."""
+        self.assertEqual("access-1", self._provider().get_token()["access_token"])
+        # Another process would find the token in the store
+        self.assertEqual("access-1", self._provider().get_token()["access_token"])
+
+        self.assertEqual(1, self.iam.grants)
+        (path,) = [
+            f
+            for f in os.listdir(os.path.join(self.cache, "tokens"))
+            if f.endswith(".json")
+        ]
+        mode = os.stat(os.path.join(self.cache, "tokens", path)).st_mode
+        self.assertEqual(0o600, mode & 0o777)
+
+    def test_expired_token_is_renewed(self):
+        """Test that tokens about to expire are renewed."""
+        self.iam.lifetime = 30
+        provider = self._provider(validity=60, store=False)
+
+        provider.get_token()
+        self.assertEqual("access-2", provider.get_token()["access_token"])
+
+    def test_rotated_refresh_token(self):
+        """Test that rotated refresh tokens are stored and used."""
+        self.iam.rotate = True
+        provider = self._provider()
+
+        provider.get_token()
+        self.assertEqual("access-2", provider.refresh()["access_token"])
+        self.assertEqual("access-3", self._provider().refresh()["access_token"])
+
+    def test_invalid_refresh_token(self):
+        """Test that grant errors are raised as AuthError."""
+        provider = oidc.OpenIDConnectRefreshToken(
+            "wrong", "client", issuer=self.iam.url, store=False
+        )
+        self.assertRaises(exceptions.AuthError, provider.get_token)
+
+    def test_client(self):
+        """Test using the provider with the client."""
+        cli = client.OrpyClient(self.fake.url, oidc_agent=self._provider())
+        self.assertEqual(5, len(cli.deployments.list()))
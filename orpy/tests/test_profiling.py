@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the profiling of the phases of an execution."""
+
+import io
+import os
+
+import fixtures
+
+from orpy.client import client
+from orpy import profiling
+from orpy import shell
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestProfiler(base.TestCase):
+    """Test the phase timings recorded by the profiler."""
+
+    def setUp(self):
+        """Make sure the profiler is disabled after each test."""
+        super(TestProfiler, self).setUp()
+        self.addCleanup(profiling.disable)
+
+    def test_disabled(self):
+        """Test that phases are not recorded without a profiler."""
+        with profiling.phase("foo", bar=1) as details:
+            details["baz"] = 2
+        self.assertIsNone(profiling.get())
+
+    def test_nested_phases(self):
+        """Test recording nested phases and their totals."""
+        profiler = profiling.enable(profiling.Profiler())
+        with profiling.phase("outer"):
+            for i in range(3):
+                with profiling.phase("inner", number=i) as details:
+                    details["status"] = 200
+
+        self.assertEqual(4, len(profiler.records))
+        inner = [r for r in profiler.records if r.name == "inner"]
+        self.assertEqual([1, 1, 1], [r.depth for r in inner])
+        self.assertEqual({"number": 2, "status": 200}, inner[-1].details)
+
+        totals = profiler.totals()
+        self.assertEqual(["outer", "inner"], list(totals))
+        self.assertEqual(3, totals["inner"][0])
+
+        stream = io.StringIO()
+        profiler.report(stream, timeline=2)
+        report = stream.getvalue()
+        self.assertIn("Profile (total", report)
+        self.assertIn("[number=0, status=200]", report)
+        self.assertIn("... 2 more", report)
+
+    def test_client_phases(self):
+        """Test the phases recorded by the client."""
+        fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=25))
+        cli = client.OrpyClient(fake.url, token="token")
+        profiler = profiling.enable(profiling.Profiler())
+        self.assertEqual(25, len(cli.deployments.list()))
+
+        totals = profiler.totals()
+        self.assertEqual(3, totals["http"][0])
+        self.assertEqual(3, totals["decode"][0])
+        self.assertEqual(1, totals["models"][0])
+        http = [r for r in profiler.records if r.name == "http"]
+        self.assertEqual(
+            {"method": "GET", "url": fake.url + "/deployments", "status": 200},
+            http[0].details,
+        )
+
+
+class TestProfileOption(base.TestCase):
+    """Test the --profile option of the CLI."""
+
+    def setUp(self):
+        """Run the CLI against a fake orchestrator and oidc-agent."""
+        super(TestProfileOption, self).setUp()
+        self.addCleanup(profiling.disable)
+        self.fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=5))
+        self.agent = self.useFixture(fakes.FakeOIDCAgentFixture())
+        self.tmp = self.useFixture(fixtures.TempDir()).path
+
+    def _run(self, *args):
+        app = shell.OrpyApp()
+        app.stdout = io.StringIO()
+        app.stderr = io.StringIO()
+        argv = [
+            "--url",
+            self.fake.url,
+            "--oidc-agent-sock",
+            self.agent.socket_path,
+            "--oidc-agent-account",
+            "account",
+        ]
+        self.assertEqual(0, app.run(argv + list(args)))
+        return app
+
+    def test_profile(self):
+        """Test the --profile report."""
+        app = self._run("--profile", "deployment", "list")
+        report = app.stderr.getvalue()
+        for name in ("import", "options", "client init", "token", "http", "format"):
+            self.assertIn(name, report)
+        self.assertIsNone(profiling.get())
+
+    def test_profile_output_and_memory(self):
+        """Test dumping the cProfile statistics and tracing memory."""
+        path = os.path.join(self.tmp, "orpy.prof")
+        app = self._run(
+            "--profile-output", path, "--profile-memory", "deployment", "list"
+        )
+        report = app.stderr.getvalue()
+        self.assertIn("cProfile (by cumulative time)", report)
+        self.assertIn("top allocations", report)
+        self.assertTrue(os.path.getsize(path))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the client side rate limiter."""
+
+import os
+
+import fixtures
+
+from orpy.client import ratelimit
+from orpy.tests import base
+
+
+class TestRateLimiter(base.TestCase):
+    """Test the token buckets and the rate limiter."""
+
+    def setUp(self):
+        """Use a fake clock."""
+        super(TestRateLimiter, self).setUp()
+        self.now = 1000.0
+        m = self.useFixture(fixtures.MockPatch("orpy.client.ratelimit.time")).mock
+        m.time.side_effect = lambda: self.now
+        self.sleep = m.sleep
+
+    def test_bucket(self):
+        """Test that requests over the burst are spread at the given rate."""
+        bucket = ratelimit.TokenBucket(rate=2, burst=2)
+
+        waits = [bucket.acquire() for _ in range(4)]
+
+        self.assertEqual([0, 0, 0.5, 1.0], waits)
+        self.now += 10
+        self.assertEqual(0, bucket.acquire())
+
+    def test_classes(self):
+        """Test that class limits are applied on top of the global one."""
+        limiter = ratelimit.RateLimiter(rate=10, classes={"write": (1, 1)})
+
+        self.assertEqual(0, limiter.acquire(ratelimit.classify("POST")))
+        self.assertEqual(1.0, limiter.acquire(ratelimit.classify("DELETE")))
+        self.assertEqual(0, limiter.acquire(ratelimit.classify("GET")))
+
+    def test_shared_between_processes(self):
+        """Test that buckets using the same file share their tokens."""
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, "limit")
+        one = ratelimit.RateLimiter(rate=1, burst=1, path=path)
+        other = ratelimit.RateLimiter(rate=1, burst=1, path=path)
+
+        self.assertEqual(0, one.acquire())
+        self.assertEqual(1.0, other.acquire())
+        self.assertTrue(os.path.exists(path + ".global"))
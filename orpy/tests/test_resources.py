@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the resources interface."""
+
+import mock
+
+from orpy.client import resources
+from orpy import exceptions
+from orpy.tests import base
+
+
+class TestResources(base.TestCase):
+    """Test the resources interface."""
+
+    def setUp(self):
+        """Set up a fake client."""
+        super(TestResources, self).setUp()
+        self.client = mock.Mock()
+        self.resources = resources.Resources(self.client)
+
+    def _get(self, url, **kwargs):
+        uuid = url.split("/")[2]
+        if uuid == "gone":
+            raise exceptions.NotFoundError()
+        return None, [{"uuid": "%s-%d" % (uuid, i)} for i in range(2)]
+
+    def test_list_all(self):
+        """Test listing the resources of all the deployments."""
+        self.client.iter_pages.return_value = iter(
+            [
+                (None, [{"uuid": "a"}, {"uuid": "b"}], None),
+                (None, [{"uuid": "gone"}, {"uuid": "c"}], None),
+            ]
+        )
+        self.client.get.side_effect = self._get
+
+        ret = list(self.resources.list_all(concurrency=1))
+
+        self.assertEqual(6, len(ret))
+        self.assertEqual(
+            sorted(["a", "a", "b", "b", "c", "c"]),
+            sorted(r.deploymentUuid for r in ret),
+        )
+        self.assertTrue(all(r.uuid.startswith(r.deploymentUuid) for r in ret))
+
+    def test_list_all_given_deployments(self):
+        """Test listing the resources of some deployments."""
+        self.client.get.side_effect = self._get
+
+        ret = list(self.resources.list_all(["a", "b"], concurrency=4))
+
+        self.assertEqual(4, len(ret))
+        self.client.iter_pages.assert_not_called()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the coalescing of concurrent calls."""
+
+import threading
+import time
+
+from orpy.client import singleflight
+from orpy.tests import base
+
+
+class TestSingleFlight(base.TestCase):
+    """Test the SingleFlight object."""
+
+    def _run(self, sf, func, threads=5):
+        results = []
+
+        def _call():
+            try:
+                results.append(sf.do("key", func))
+            except Exception as e:
+                results.append(e)
+
+        ts = [threading.Thread(target=_call) for _ in range(threads)]
+        for t in ts:
+            t.start()
+        # Wait until all the threads but the leader are waiting
+        deadline = time.time() + 5
+        while sf.shared < threads - 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.release.set()
+        for t in ts:
+            t.join()
+        return results
+
+    def setUp(self):
+        """Set up the object under test."""
+        super(TestSingleFlight, self).setUp()
+        self.sf = singleflight.SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def _func(self):
+        self.calls += 1
+        self.release.wait()
+        return self.calls
+
+    def test_concurrent_calls_are_merged(self):
+        """Test that concurrent calls are done only once."""
+        results = self._run(self.sf, self._func)
+
+        self.assertEqual(1, self.calls)
+        self.assertEqual([(1, True)] * 5, results)
+
+    def test_errors_are_shared(self):
+        """Test that all the callers get the exception."""
+
+        def _func():
+            self._func()
+            raise ValueError("boom")
+
+        results = self._run(self.sf, _func)
+
+        self.assertEqual(1, self.calls)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test that results are not reused once the call is done."""
+        self.release.set()
+
+        self.assertEqual((1, False), self.sf.do("key", self._func))
+        self.assertEqual((2, False), self.sf.do("key", self._func))
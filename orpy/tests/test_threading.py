@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Stress tests sharing a single client across many threads."""
+
+from concurrent import futures
+
+from orpy.client import client
+from orpy import oidc
+from orpy.tests import base
+from orpy.tests import fakes
+
+THREADS = 16
+
+
+class TestThreadSafety(base.TestCase):
+    """Hammer a single client from many threads."""
+
+    def setUp(self):
+        """Start a fake orchestrator and a fake oidc-agent."""
+        super(TestThreadSafety, self).setUp()
+        self.fake = self.useFixture(
+            fakes.FakeOrchestratorFixture(deployments=40, page_size=10)
+        )
+        self.agent = self.useFixture(fakes.FakeOIDCAgentFixture())
+        self.oidc_agent = oidc.OpenIDConnectAgent(
+            "account", socket_path=self.agent.socket_path
+        )
+        self.client = client.OrpyClient(self.fake.url, oidc_agent=self.oidc_agent)
+
+    def _run(self, func, n=THREADS * 4):
+        with futures.ThreadPoolExecutor(max_workers=THREADS) as ex:
+            return list(ex.map(func, range(n)))
+
+    def test_token_cache(self):
+        """Test that the agent is only contacted once."""
+        tokens = self._run(lambda i: self.oidc_agent.get_token()["access_token"])
+
+        self.assertEqual({"account-token-1"}, set(tokens))
+        self.assertEqual(1, self.agent.agent.requests)
+
+    def test_expired_token_is_renewed(self):
+        """Test that tokens about to expire are not reused."""
+        self.agent.agent.lifetime = self.oidc_agent.validity - 1
+
+        self.oidc_agent.get_token()
+        self.oidc_agent.get_token()
+
+        self.assertEqual(2, self.agent.agent.requests)
+
+    def test_concurrent_reads(self):
+        """Test listing and showing deployments from many threads."""
+        uuids = list(self.fake.orchestrator.deployments)
+
+        def _work(i):
+            listing = self.client.deployments.list()
+            d = self.client.deployments.show(uuids[i % len(uuids)])
+            return len(listing), d.uuid
+
+        results = self._run(_work)
+
+        self.assertEqual({40}, set(r[0] for r in results))
+        self.assertEqual(
+            [uuids[i % len(uuids)] for i in range(len(results))],
+            [r[1] for r in results],
+        )
+        self.assertEqual(1, self.agent.agent.requests)
+
+    def test_concurrent_writes(self):
+        """Test creating and deleting deployments from many threads."""
+
+        def _work(i):
+            d = self.client.deployments.create("template-%d" % i)
+            self.client.deployments.delete(d.uuid)
+            return d.uuid
+
+        uuids = self._run(_work)
+
+        self.assertEqual(len(uuids), len(set(uuids)))
+        self.assertEqual(40, len(self.client.deployments.list()))
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the local checks of TOSCA templates."""
+
+import mock
+
+from orpy.client import deployments
+from orpy.client import tosca
+from orpy.client import tracing
+from orpy import exceptions
+from orpy.tests import base
+from orpy.tests import fakes
+
+TEMPLATE = """tosca_definitions_version: tosca_simple_yaml_1_0
+
+topology_template:
+  inputs:
+    num_cpus:
+      type: integer
+      default: 1
+    flavor:
+      type: string
+      constraints:
+        - valid_values: [small, large]
+    public:
+      type: boolean
+      required: false
+    ports:
+      type: map
+      default: {}
+"""
+
+
+class TestTemplate(base.TestCase):
+    """Test the local validation of templates and parameters."""
+
+    def test_valid_parameters(self):
+        """Test parameters given as strings and as native values."""
+        t = tosca.validate(TEMPLATE, {"flavor": "small", "num_cpus": "2"})
+        self.assertEqual(tosca.digest(TEMPLATE), t.sha256)
+        self.assertEqual([], t.errors({"flavor": "large", "public": True}))
+        self.assertEqual([], t.errors({"flavor": "small", "ports": '{"http": 80}'}))
+
+    def test_invalid_parameters(self):
+        """Test that all the errors are reported at once."""
+        e = self.assertRaises(
+            exceptions.TemplateValidationError,
+            tosca.validate,
+            TEMPLATE,
+            {"num_cpus": "two", "public": "maybe", "ports": "[80]", "foo": 1},
+        )
+        self.assertEqual(
+            [
+                "parameter 'foo' is not an input of the template",
+                "required input 'flavor' has no value",
+                "value 'two' of input 'num_cpus' is not of type integer",
+                "value '[80]' of input 'ports' is not of type map",
+                "value 'maybe' of input 'public' is not of type boolean",
+            ],
+            e.errors,
+        )
+        self.assertEqual(
+            ["value 'medium' of input 'flavor' is not one of small, large"],
+            tosca.parse(TEMPLATE).errors({"flavor": "medium"}),
+        )
+
+    def test_invalid_templates(self):
+        """Test templates that cannot be parsed."""
+        for template in (
+            "foo: [",
+            "template",
+            "tosca_definitions_version: 1\n" "topology_template: [1]",
+        ):
+            self.assertRaises(exceptions.TemplateValidationError, tosca.parse, template)
+
+    def test_cache(self):
+        """Test that templates are parsed only once."""
+        with mock.patch("yaml.safe_load", wraps=tosca.yaml.safe_load) as m:
+            template = TEMPLATE + "# cached\n"
+            self.assertIs(tosca.parse(template), tosca.parse(template))
+            self.assertEqual(1, m.call_count)
+
+
+class TestDeploymentsPreflight(base.TestCase):
+    """Test the validation of deployments before sending them."""
+
+    def setUp(self):
+        """Set up a fake client."""
+        super(TestDeploymentsPreflight, self).setUp()
+        self.client = mock.Mock(tracer=tracing.NOOP)
+        self.client.post.return_value = (None, {"uuid": "foo"})
+        self.deployments = deployments.Deployments(self.client)
+
+    def test_create(self):
+        """Test that invalid templates are not sent."""
+        self.assertRaises(
+            exceptions.TemplateValidationError,
+            self.deployments.create,
+            TEMPLATE,
+            validate=True,
+        )
+        self.client.post.assert_not_called()
+
+        d = self.deployments.create(
+            fakes.TEMPLATE, parameters={"num_cpus": 2}, validate=True
+        )
+        self.assertEqual("foo", d.uuid)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the tracing of the client operations."""
+
+import json
+import os
+
+import fixtures
+import mock
+import requests
+
+from orpy.client import client
+from orpy.client import tracing
+from orpy import exceptions
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestJSONFileTracer(base.TestCase):
+    """Test the spans written by the JSON file tracer."""
+
+    def setUp(self):
+        """Set up a tracer writing to a temporary file."""
+        super(TestJSONFileTracer, self).setUp()
+        self.path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, "spans.jsonl"
+        )
+        self.tracer = tracing.JSONFileTracer(self.path)
+        self.addCleanup(self.tracer.close)
+
+    def _spans(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_operation_spans(self):
+        """Test the spans of a paginated listing, with token fetches."""
+        fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=25))
+        cli = client.OrpyClient(
+            fake.url,
+            oidc_agent=mock.Mock(get_token=lambda: {"access_token": "t"}),
+            tracer=self.tracer,
+        )
+        self.assertEqual(25, len(cli.deployments.list()))
+
+        spans = self._spans()
+        parent = spans[-1]
+        self.assertEqual("deployments.list", parent["name"])
+        self.assertIsNone(parent["parent_id"])
+        children = spans[:-1]
+        for span in children:
+            self.assertEqual(parent["trace_id"], span["trace_id"])
+            self.assertEqual(parent["span_id"], span["parent_id"])
+
+        # The token is fetched once, the same headers are used for all pages
+        self.assertEqual(
+            ["token", "HTTP GET", "HTTP GET", "HTTP GET"], [s["name"] for s in children]
+        )
+        http = children[1:]
+        self.assertEqual([0, 1, 2], [s["attributes"]["orpy.page"] for s in http])
+        for span in http:
+            self.assertEqual(200, span["attributes"]["http.status_code"])
+            self.assertLess(0, span["attributes"]["http.response_content_length"])
+
+    def test_errors_and_retries(self):
+        """Test the spans of failed requests and of failovers."""
+        cli = client.OrpyClient(
+            ["http://down/orchestrator", "http://up/orchestrator"],
+            token="token",
+            tracer=self.tracer,
+        )
+        cli.endpoints.probe = None
+        cli.session = mock.Mock()
+
+        def _request(method, url, **kwargs):
+            if url.startswith("http://down"):
+                raise requests.exceptions.ConnectionError("down")
+            resp = requests.Response()
+            resp.status_code = 404
+            resp._content = b'{"message": "Not found"}'
+            return resp
+
+        cli.session.request.side_effect = _request
+        self.assertRaises(exceptions.NotFoundError, cli.deployments.show, "foo")
+
+        attempt1, attempt2, parent = self._spans()
+        self.assertEqual("deployments.show", parent["name"])
+        self.assertIn("NotFoundError", parent["error"])
+        self.assertEqual("ConnectionError: down", attempt1["error"])
+        self.assertEqual(1, attempt1["attributes"]["orpy.attempt"])
+        self.assertEqual(2, attempt2["attributes"]["orpy.attempt"])
+        self.assertEqual(404, attempt2["attributes"]["http.status_code"])
+
+
+class TestOpenTelemetryTracer(base.TestCase):
+    """Test the spans sent to OpenTelemetry."""
+
+    def setUp(self):
+        """Skip the tests if OpenTelemetry is not available."""
+        super(TestOpenTelemetryTracer, self).setUp()
+        try:
+            from opentelemetry.sdk import trace as sdk_trace
+            from opentelemetry.sdk.trace import export
+            from opentelemetry.sdk.trace.export import in_memory_span_exporter
+        except ImportError:
+            self.skipTest("OpenTelemetry SDK not installed")
+
+        self.exporter = in_memory_span_exporter.InMemorySpanExporter()
+        provider = sdk_trace.TracerProvider()
+        provider.add_span_processor(export.SimpleSpanProcessor(self.exporter))
+        self.tracer = tracing.OpenTelemetryTracer(provider.get_tracer("test"))
+
+    def test_spans(self):
+        """Test that the spans are nested within the OpenTelemetry trace."""
+        fake = self.useFixture(fakes.FakeOrchestratorFixture(deployments=5))
+        cli = client.OrpyClient(fake.url, token="token", tracer=self.tracer)
+        with self.tracer.span("application") as span:
+            cli.deployments.list()
+
+        spans = {s.name: s for s in self.exporter.get_finished_spans()}
+        app = span.span.get_span_context().span_id
+        self.assertEqual(app, spans["deployments.list"].parent.span_id)
+        self.assertEqual(
+            spans["deployments.list"].context.span_id,
+            spans["HTTP GET"].parent.span_id,
+        )
+        self.assertEqual(200, spans["HTTP GET"].attributes["http.status_code"])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the record and replay transports."""
+
+import os
+
+import fixtures
+
+from orpy.client import client
+from orpy.client import metrics
+from orpy.client import transport
+from orpy import exceptions
+from orpy.tests import base
+from orpy.tests import fakes
+
+
+class TestTransport(base.TestCase):
+    """Test recording interactions and replaying them."""
+
+    def setUp(self):
+        """Record a listing and a show against a fake orchestrator."""
+        super(TestTransport, self).setUp()
+        self.path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, "cassette.gz"
+        )
+
+        with fakes.FakeOrchestrator(deployments=25, page_size=10) as fake:
+            with transport.RecordingTransport(self.path) as recorder:
+                cli = client.OrpyClient(fake.url, token="secret", transport=recorder)
+                self.deployments = cli.deployments.list()
+                self.first = cli.deployments.show(self.deployments[0].uuid)
+            self.assertEqual(4, recorder.recorded)
+
+    def test_cassette(self):
+        """Test that the cassette is complete and has no credentials."""
+        header, interactions = transport.load(self.path)
+
+        self.assertEqual(transport.CASSETTE_VERSION, header["version"])
+        self.assertEqual(4, len(interactions))
+        for i in interactions:
+            self.assertNotIn("Authorization", i["request"]["headers"])
+            self.assertGreaterEqual(i["elapsed"], 0)
+
+    def test_replay(self):
+        """Test that replayed results are the same, whatever the URL."""
+        replay = transport.ReplayTransport(self.path)
+        cli = client.OrpyClient(
+            "http://replay/orchestrator", token="x", transport=replay
+        )
+
+        deployments = cli.deployments.list()
+        self.assertEqual(
+            [d.uuid for d in self.deployments], [d.uuid for d in deployments]
+        )
+        self.assertEqual(self.first.uuid, cli.deployments.show(self.first.uuid).uuid)
+        self.assertEqual(4, replay.replayed)
+        self.assertRaises(
+            exceptions.CassetteMissError,
+            cli.deployments.show,
+            self.deployments[1].uuid,
+        )
+
+    def test_replay_other_base_path(self):
+        """Test replaying under URLs with a different base path."""
+        for url in ("http://replay", "http://replay/paas/api/"):
+            replay = transport.ReplayTransport(self.path)
+            cli = client.OrpyClient(url, token="x", transport=replay)
+            self.assertEqual(
+                [d.uuid for d in self.deployments],
+                [d.uuid for d in cli.deployments.list()],
+            )
+
+    def test_miss_is_recorded(self):
+        """Test that replay misses are recorded as errors."""
+        m = metrics.ClientMetrics()
+        replay = transport.ReplayTransport(self.path)
+        cli = client.OrpyClient(
+            "http://replay/orchestrator", token="x", transport=replay, metrics=m
+        )
+        self.assertRaises(exceptions.CassetteMissError, cli.deployments.show, "missing")
+        self.assertEqual(1, m.requests.get(("show", "GET", "error")))
+
+    def test_replay_speed(self):
+        """Test that the recorded timings are scaled."""
+        sleep = self.useFixture(
+            fixtures.MockPatch("orpy.client.transport.time.sleep")
+        ).mock
+        _, interactions = transport.load(self.path)
+        replay = transport.ReplayTransport(self.path, speed=2)
+        cli = client.OrpyClient(
+            "http://replay/orchestrator", token="x", transport=replay
+        )
+
+        cli.deployments.list()
+
+        self.assertEqual(
+            [i["elapsed"] / 2 for i in interactions[:3]],
+            [c[0][0] for c in sleep.call_args_list],
+        )
@@ -16,10 +16,26 @@
 
 """Miscelaneous utilities."""
 
+import datetime
 import os
+import re
 
 import six
 
+_RELATIVE_TIME_RE = re.compile(r"^(\d+)([smhdw])$")
+_RELATIVE_TIME_UNITS = {
+    "s": "seconds",
+    "m": "minutes",
+    "h": "hours",
+    "d": "days",
+    "w": "weeks",
+}
+_TIME_FORMATS = (
+    "%Y-%m-%dT%H:%M%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+)
+
 
 def env(*vars, **kwargs):
     """Search for the first defined of possibly many env vars.
@@ -81,3 +97,120 @@ def format_dict(data):
     for s in sorted(data):
         output = output + s + ": " + six.text_type(data[s]) + "\n"
     return output[:-2]
+
+
+def cache_dir(*parts):
+    """Return (and create) a directory for orpy cached data.
+
+    The base directory is taken from ``ORPY_CACHE_DIR``, ``XDG_CACHE_HOME``
+    or ``~/.cache``, in this order.
+
+    :param parts: Path components to append to the base cache directory.
+    :returns: The path to the directory.
+    :rtype: str
+    """
+    base = env("ORPY_CACHE_DIR")
+    if not base:
+        base = os.path.join(
+            env("XDG_CACHE_HOME", default=os.path.expanduser("~/.cache")), "orpy"
+        )
+    path = os.path.join(base, *parts)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def parse_time(value):
+    """Parse a timestamp as returned by the orchestrator.
+
+    Besides the orchestrator format (e.g. ``2019-05-27T11:31+0000``) ISO 8601
+    dates and times are accepted, as well as relative times in the past
+    expressed as ``<number><unit>`` where unit is one of ``s``, ``m``, ``h``,
+    ``d`` or ``w`` (e.g. ``7d`` for "seven days ago"). Times without timezone
+    are considered to be UTC.
+
+    :param str value: The string to parse.
+    :returns: A timezone aware datetime, or None if value is empty.
+    :rtype: datetime.datetime
+    """
+    if not value:
+        return None
+
+    match = _RELATIVE_TIME_RE.match(value)
+    if match:
+        delta = datetime.timedelta(
+            **{_RELATIVE_TIME_UNITS[match.group(2)]: int(match.group(1))}
+        )
+        return datetime.datetime.now(datetime.timezone.utc) - delta
+
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+
+    try:
+        ret = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("Cannot parse time '%s'" % value)
+    if ret.tzinfo is None:
+        ret = ret.replace(tzinfo=datetime.timezone.utc)
+    return ret
+
+
+def timestamp(value):
+    """Convert an orchestrator time string into a POSIX timestamp.
+
+    :param str value: The string to convert, see :func:`parse_time`.
+    :returns: The timestamp, or None if value is empty.
+    :rtype: float
+    """
+    ret = parse_time(value)
+    if ret is None:
+        return None
+    return ret.timestamp()
+
+
+def add_pagination_arguments(parser):
+    """Add the arguments to control the pagination of a listing to a parser.
+
+    :param parser: The argparse.ArgumentParser object.
+    """
+    parser.add_argument(
+        "--limit",
+        metavar="<items>",
+        type=int,
+        default=None,
+        help="Maximum number of items to list. Only the pages needed to get "
+        "them are requested.",
+    )
+    parser.add_argument(
+        "--page-size",
+        metavar="<items>",
+        type=int,
+        default=None,
+        help="Number of items to request per page (Default: the "
+        "orchestrator default, or --limit if set). Larger pages mean less "
+        "round trips for large listings.",
+    )
+    parser.add_argument(
+        "--start-page",
+        metavar="<page>",
+        type=int,
+        default=None,
+        help="Number of the first page to request, starting at 0.",
+    )
+    return parser
+
+
+def pagination_kwargs(parsed_args):
+    """Get the pagination arguments to pass to a listing method.
+
+    :param parsed_args: The parsed arguments, as added by
+                        :py:func:`add_pagination_arguments`.
+    :rtype: dict
+    """
+    return {
+        "page_size": parsed_args.page_size,
+        "max_items": parsed_args.limit,
+        "start_page": parsed_args.start_page,
+    }